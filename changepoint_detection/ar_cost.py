@@ -0,0 +1,100 @@
+# Imports
+import numpy as np
+from numpy.linalg import LinAlgError
+from ruptures.base import BaseCost
+from ruptures.exceptions import NotEnoughPoints
+
+"""
+ar_cost.py contains an autoregressive cost for the ruptures methods that answers each segment query in O(p^2) (plus a
+(p + 1) x (p + 1) solve) instead of refitting a regression on the segment. The 2-back/2-forward mean smoothing makes the
+time series strongly autocorrelated, which the l1/l2 costs ignore; the AR cost models each segment as an AR(p) process,
+so a changepoint is a change in the autoregressive coefficients rather than a change in mean.
+
+The cost of a segment is the residual sum of squares of its least-squares AR(p) fit (with intercept). With z_t the row
+[y_{t-1}, ..., y_{t-p}, 1, y_t], the cross-product matrix of a segment is the difference of two prefix sums of z_t z_t',
+and the residual sum of squares follows from it:
+
+    RSS = M_yy - M_yX (M_XX)^-1 M_Xy
+
+The lagged covariates, edge padding and minimum segment length are the same as ruptures' CostAR ("ar"), so the
+segmentations are the same as with model="ar". Unlike CostAR, multivariate signals are allowed: each feature gets its
+own AR fit and the cost is the sum over features.
+"""
+
+"""
+lagged_cross_products() computes the prefix sums of the lagged cross-product matrices.
+
+Inputs:
+        - ndarray of shape (n_samples,) or (n_samples, n_features)
+        - AR order
+Outputs:
+        - ndarray of shape (n_samples + 1, n_features, order + 2, order + 2), where entry i sums z_t z_t' over the first
+          i samples
+"""
+def lagged_cross_products(signal, order):
+    signal = np.asarray(signal, dtype=float).reshape(len(signal), -1)
+    n_samples, n_feats = signal.shape
+    # The intercept absorbs a constant shift, so centring each feature does not change the cost but keeps the
+    # cross-products well-conditioned
+    signal = signal - signal.mean(axis=0)
+
+    # Lag j of sample t is y_{t-j}; the first 'order' rows repeat the first full row of lags (edge padding, as in
+    # ruptures), and their targets are set to y_order
+    t = np.maximum(np.arange(n_samples), order)
+    lags = np.stack([signal[t - j] for j in range(order, 0, -1)], axis=-1)
+    target = signal[t]
+
+    z = np.concatenate([lags, np.ones((n_samples, n_feats, 1)), target[..., None]], axis=-1)
+    products = z[..., :, None]*z[..., None, :]
+    cum = np.zeros((n_samples + 1, n_feats, order + 2, order + 2))
+    cum[1:] = np.cumsum(products, axis=0)
+    return cum
+
+"""
+CostCachedAR is the ruptures cost class. Use it through the custom_cost argument, e.g.
+rpt.Pelt(custom_cost=CostCachedAR(order=4), min_size=5).
+"""
+class CostCachedAR(BaseCost):
+
+    model = "ar_cached"
+
+    def __init__(self, order=4):
+        self.order = order
+        self.min_size = max(5, order + 1)
+        self.signal = None
+        self.cum = None
+
+    def fit(self, signal):
+        if signal.ndim == 1:
+            self.signal = signal.reshape(-1, 1)
+        else:
+            self.signal = signal
+        self.cum = lagged_cross_products(self.signal, self.order)
+        return self
+
+    def error(self, start, end):
+        if end - start < self.min_size:
+            raise NotEnoughPoints
+        # Like numpy's lstsq (used by ruptures), there are no residuals when the segment has no more rows than
+        # regressors
+        if end - start <= self.order + 1:
+            return 0.0
+        M = self.cum[end] - self.cum[start]
+        M_xx, M_xy, M_yy = M[:, :-1, :-1], M[:, :-1, -1], M[:, -1, -1]
+        try:
+            coef = np.linalg.solve(M_xx, M_xy[..., None])[..., 0]
+        except LinAlgError:
+            # Exactly collinear lags (e.g. a constant segment): no residuals, as with lstsq
+            return 0.0
+        return float(np.maximum(M_yy - (M_xy*coef).sum(axis=-1), 0).sum())
+
+"""
+ar_cost_name() gives the sweep's cost function name for an AR order, and ar_order() reads the order back from it.
+"""
+def ar_cost_name(order):
+    return 'ar (order=' + str(order) + ')'
+
+def ar_order(cost):
+    if cost.startswith('ar (order='):
+        return int(cost[len('ar (order='):-1])
+    return None
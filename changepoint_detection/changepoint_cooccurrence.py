@@ -0,0 +1,116 @@
+# Imports
+import numpy as np
+
+"""
+changepoint_cooccurrence.py contains the engine for the revolution analysis (revolution_analysis.py): finding years in
+which many features change together, from the complete table of changepoints of the sweep.
+
+The changepoints are first counted into a (feature x year) tally matrix (see changepoint_tally.py), so the size of the
+sweep table only matters for that one bincount. Each feature's tallies are turned into a changepoint density: its share
+of the feature's changepoints that fall within 'tolerance' years of each year. Two features co-occur at a year when both
+have density there:
+
+    C[f, g, y] = D[f, y] * D[g, y]   (f != g)
+
+and the revolution score of a year is the sum over all pairs of features, sum_{f < g} C[f, g, y]. The score of a year is
+high only if several features have many changepoints near it.
+
+Significance comes from a circular-shift permutation null: each feature's tally row is rotated by an independent random
+number of years, which keeps the number and spacing of every feature's changepoints but breaks their alignment across
+features. Two p-values are given per year: against the null scores of that year, and against the maximum null score over
+all years (which controls for looking at every year).
+"""
+
+"""
+window_counts() sums tallies over a window of +- tolerance years (along the last axis; windows are cut off at the ends).
+"""
+def window_counts(tallies, tolerance=1):
+    n_years = tallies.shape[-1]
+    padded = np.zeros(tallies.shape[:-1] + (n_years + 1,))
+    padded[..., 1:] = np.cumsum(tallies, axis=-1)
+    years = np.arange(n_years)
+    upper = np.minimum(years + tolerance + 1, n_years)
+    lower = np.maximum(years - tolerance, 0)
+    return padded[..., upper] - padded[..., lower]
+
+"""
+changepoint_density() gives each feature's share of changepoints within +- tolerance years of each year.
+
+Inputs:
+        - ndarray of shape (..., features, years) with the tallies
+        - tolerance, in years
+Outputs:
+        - ndarray of the same shape with the densities
+"""
+def changepoint_density(tallies, tolerance=1):
+    totals = tallies.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(totals > 0, window_counts(tallies, tolerance)/totals, 0)
+
+"""
+cooccurrence_tensor() computes the (feature x feature x year) co-occurrence tensor from the densities. The diagonal
+(a feature with itself) is 0.
+"""
+def cooccurrence_tensor(density):
+    tensor = np.einsum('fy,gy->fgy', density, density)
+    tensor[np.arange(len(density)), np.arange(len(density))] = 0
+    return tensor
+
+"""
+revolution_scores() sums the co-occurrences of all pairs of features, for each year. Works for any number of leading
+(e.g. permutation) dimensions, without building the tensor:
+
+    sum_{f < g} D_f D_g = ((sum_f D_f)^2 - sum_f D_f^2) / 2
+"""
+def revolution_scores(density):
+    return (density.sum(axis=-2)**2 - (density**2).sum(axis=-2))/2
+
+"""
+shift_null() computes revolution scores for circularly shifted tallies.
+
+Inputs:
+        - ndarray of shape (features, years) with the tallies
+        - tolerance, in years
+        - number of permutations
+        - numpy random Generator
+        - number of permutations computed at once (limits the memory used)
+Outputs:
+        - ndarray of shape (permutations, years) with the null scores
+"""
+def shift_null(tallies, tolerance, n_perm, rng, batch_size=1000):
+    n_feats, n_years = tallies.shape
+    years = np.arange(n_years)
+    null = np.empty((n_perm, n_years))
+    for start in range(0, n_perm, batch_size):
+        size = min(batch_size, n_perm - start)
+        shifts = rng.integers(0, n_years, size=(size, n_feats))
+        # Row f of permutation b is tallies[f] rotated by shifts[b, f]
+        shifted = tallies[np.arange(n_feats)[None, :, None], (years[None, None, :] - shifts[:, :, None]) % n_years]
+        null[start:start + size] = revolution_scores(changepoint_density(shifted, tolerance))
+    return null
+
+"""
+revolution_analysis() computes the revolution score of every year and its p-values.
+
+Inputs:
+        - ndarray of shape (features, years) with the tallies
+        - tolerance, in years
+        - number of permutations
+        - seed of the random number generator
+Outputs:
+        - ndarray of shape (features, features, years) with the co-occurrence tensor
+        - ndarray of shape (years,) with the revolution scores
+        - ndarray of shape (years,) with the p-values against the null of the same year
+        - ndarray of shape (years,) with the p-values against the maximum of the null over the years
+"""
+def revolution_analysis(tallies, tolerance=1, n_perm=10000, seed=0):
+    tallies = np.asarray(tallies, dtype=float)
+    density = changepoint_density(tallies, tolerance)
+    scores = revolution_scores(density)
+    null = shift_null(tallies, tolerance, n_perm, np.random.default_rng(seed))
+
+    # Add-one p-values, so that no p-value is 0
+    p_values = (1 + (null >= scores[None, :]).sum(axis=0))/(1 + n_perm)
+    max_null = null.max(axis=1)
+    p_values_max = (1 + (max_null[:, None] >= scores[None, :]).sum(axis=0))/(1 + n_perm)
+    return cooccurrence_tensor(density), scores, p_values, p_values_max
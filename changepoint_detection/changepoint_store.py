@@ -0,0 +1,196 @@
+# Imports
+import hashlib
+import sqlite3
+import numpy as np
+import pandas as pd
+
+"""
+changepoint_store.py contains functions for a persistent, indexed store of changepoint results (an SQLite file). Each
+run of a changepoint method is stored once under the key
+
+    (series hash, feature, method, cost, k, min_size, penalty, window)
+
+where the series hash identifies the exact time series the method was run on. A parameter sweep can therefore ask the
+store which combinations are missing and only compute those, and results for different versions of the time series
+(e.g. the '_four' variants) live side by side instead of in separate hand-managed .csv's. Lookups by feature, method or
+parameter use indexes, so they do not need to load the whole table.
+
+Parameter values are stored as text in the form they appear in python_changepoints.csv ('N/A' when a parameter does
+not apply), so exported tables look the same as before.
+"""
+
+# Column names of python_changepoints.csv, in the order of the store key (after the series hash)
+KEY_COLUMNS = ['Feature', 'Method', 'Cost Function', 'Number of Changepoints', 'Minimum Gap Between Changepoints',
+               'Penalty', 'Window Size']
+STORE_COLUMNS = ['feature', 'method', 'cost', 'k', 'min_size', 'penalty', 'window']
+
+"""
+series_hash() computes a hash of a time series DataFrame (column names and values).
+"""
+def series_hash(ts_df):
+    h = hashlib.sha1()
+    h.update(",".join(str(c) for c in ts_df.columns).encode())
+    h.update(np.ascontiguousarray(ts_df.to_numpy(dtype=float)).tobytes())
+    return h.hexdigest()
+
+"""
+open_store() opens (and if needed creates) a store.
+
+Input: filename of the store
+Output: sqlite3 connection
+"""
+def open_store(filename):
+    conn = sqlite3.connect(filename)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id INTEGER PRIMARY KEY,
+            series_hash TEXT NOT NULL,
+            feature TEXT NOT NULL,
+            method TEXT NOT NULL,
+            cost TEXT NOT NULL,
+            k TEXT NOT NULL,
+            min_size TEXT NOT NULL,
+            penalty TEXT NOT NULL,
+            window TEXT NOT NULL,
+            UNIQUE (series_hash, feature, method, cost, k, min_size, penalty, window)
+        );
+        CREATE TABLE IF NOT EXISTS changepoints (
+            run_id INTEGER NOT NULL REFERENCES runs(run_id),
+            position INTEGER NOT NULL,
+            p_value REAL
+        );
+        CREATE INDEX IF NOT EXISTS runs_feature ON runs (series_hash, feature);
+        CREATE INDEX IF NOT EXISTS runs_method ON runs (series_hash, method, cost);
+        CREATE INDEX IF NOT EXISTS changepoints_run ON changepoints (run_id);
+    """)
+    return conn
+
+"""
+param_text() converts a parameter value to the text stored in the key. Counts (k, min_size, window) read back from a
+.csv with missing values come in as floats, so integral values can be stored as integers.
+"""
+def param_text(value, integer=False):
+    if value is None or (isinstance(value, (float, np.floating)) and np.isnan(value)):
+        return 'N/A'
+    if isinstance(value, (float, np.floating)):
+        if integer and float(value).is_integer():
+            return str(int(value))
+        return repr(float(value))
+    return str(value)
+
+# Which key columns hold counts
+INTEGER_COLUMNS = ['k', 'min_size', 'window']
+
+"""
+key_text() converts a tuple of parameters (feature, method, cost, k, min_size, penalty, window) to the stored key.
+"""
+def key_text(combo):
+    return tuple(param_text(v, c in INTEGER_COLUMNS) for c, v in zip(STORE_COLUMNS, combo))
+
+"""
+missing_runs() returns the parameter combinations that are not in the store yet for a series.
+
+Inputs:
+        - sqlite3 connection
+        - series hash
+        - list of parameter tuples (feature, method, cost, k, min_size, penalty, window)
+Output: list of the parameter tuples that still need to be computed
+"""
+def missing_runs(conn, ts_hash, combos):
+    stored = set(conn.execute("SELECT " + ", ".join(STORE_COLUMNS) + " FROM runs WHERE series_hash = ?", (ts_hash,)))
+    return [combo for combo in combos if key_text(combo) not in stored]
+
+"""
+add_runs() stores the results of new runs.
+
+Inputs:
+        - sqlite3 connection
+        - series hash
+        - DataFrame in the python_changepoints.csv layout (optionally with a 'p-value' column). Consecutive rows with the
+          same parameters are one run
+"""
+def add_runs(conn, ts_hash, cpt_df):
+    if len(cpt_df) == 0:
+        return
+    keys = pd.DataFrame([key_text(combo) for combo in cpt_df[KEY_COLUMNS].itertuples(index=False)], columns=STORE_COLUMNS)
+    positions = cpt_df['Position'].astype(int).to_numpy()
+    # A new run starts when the parameters change or the positions stop increasing
+    new_run = (keys != keys.shift()).any(axis=1).to_numpy().copy()
+    new_run[1:] |= positions[1:] <= positions[:-1]
+    p_values = cpt_df['p-value'] if 'p-value' in cpt_df.columns else pd.Series(np.nan, index=cpt_df.index)
+
+    with conn:
+        run_id = None
+        for i, (key, position, p_value) in enumerate(zip(keys.itertuples(index=False), positions, p_values)):
+            if new_run[i]:
+                # Re-running a combination replaces its old result
+                old = conn.execute("SELECT run_id FROM runs WHERE series_hash = ? AND " +
+                                   " AND ".join(c + " = ?" for c in STORE_COLUMNS), (ts_hash,) + tuple(key)).fetchone()
+                if old is not None:
+                    conn.execute("DELETE FROM changepoints WHERE run_id = ?", old)
+                    conn.execute("DELETE FROM runs WHERE run_id = ?", old)
+                run_id = conn.execute("INSERT INTO runs (series_hash, " + ", ".join(STORE_COLUMNS) + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                      (ts_hash,) + tuple(key)).lastrowid
+            p_value = None if pd.isna(p_value) else float(p_value)
+            conn.execute("INSERT INTO changepoints (run_id, position, p_value) VALUES (?, ?, ?)", (run_id, int(position), p_value))
+
+"""
+query_changepoints() reads changepoints from the store, optionally filtered by series and parameters.
+
+Inputs:
+        - sqlite3 connection
+        - series hash (optional)
+        - filters as keyword arguments named after the store columns, e.g. feature='PIC', method='PELT', min_size=5
+Output: DataFrame in the python_changepoints.csv layout, with a 'p-value' column
+"""
+def query_changepoints(conn, ts_hash=None, **filters):
+    conditions, values = [], []
+    if ts_hash is not None:
+        conditions.append("r.series_hash = ?")
+        values.append(ts_hash)
+    for column, value in filters.items():
+        if column not in STORE_COLUMNS:
+            raise ValueError("Unknown store column: " + column)
+        conditions.append("r." + column + " = ?")
+        values.append(param_text(value, column in INTEGER_COLUMNS))
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    query = ("SELECT " + ", ".join("r." + c for c in STORE_COLUMNS) + ", c.position, c.p_value "
+             "FROM runs r JOIN changepoints c ON c.run_id = r.run_id" + where + " ORDER BY r.run_id, c.rowid")
+    return pd.read_sql_query(query, conn, params=values).set_axis(KEY_COLUMNS + ['Position', 'p-value'], axis=1)
+
+"""
+select_runs() reads the changepoints of a list of parameter combinations for a series, in the order of the list. This
+is used to export the current parameter space only, even if the store holds results for other parameter values.
+
+Inputs:
+        - sqlite3 connection
+        - series hash
+        - list of parameter tuples (feature, method, cost, k, min_size, penalty, window)
+Output: DataFrame in the python_changepoints.csv layout, with a 'p-value' column
+"""
+def select_runs(conn, ts_hash, combos):
+    order = {key_text(combo): i for i, combo in enumerate(combos)}
+    cpt_df = query_changepoints(conn, ts_hash)
+    rank = pd.Series([order.get(tuple(key), -1) for key in cpt_df[KEY_COLUMNS].itertuples(index=False)], index=cpt_df.index)
+    # Stable sort keeps the positions of each run in order
+    return cpt_df[rank >= 0].iloc[np.argsort(rank[rank >= 0].to_numpy(), kind='stable')].reset_index(drop=True)
+
+"""
+import_r_changepoints() adds the changepoints of R_changepoint_analysis.R (r_changepoints.csv) to the store. The
+e.divisive parameter alpha is stored as the cost, k as the number of changepoints.
+
+Inputs:
+        - sqlite3 connection
+        - series hash of the time series R was run on
+        - DataFrame read from r_changepoints.csv
+"""
+def import_r_changepoints(conn, ts_hash, r_df):
+    cpt_df = pd.DataFrame({'Feature': r_df['feature'],
+                           'Method': 'Top-down',
+                           'Cost Function': ['alpha=' + param_text(a, True) for a in r_df['alpha']],
+                           'Number of Changepoints': [param_text(k, True) if pd.notna(k) else 'NULL' for k in pd.to_numeric(r_df['k'], errors='coerce')],
+                           'Minimum Gap Between Changepoints': r_df['min_size'],
+                           'Penalty': 'N/A',
+                           'Window Size': 'N/A',
+                           'Position': r_df['pos']})
+    add_runs(conn, ts_hash, cpt_df)
@@ -0,0 +1,157 @@
+# Imports
+import numpy as np
+import pandas as pd
+
+"""
+changepoint_tally.py contains the array-based engine used by tally_changepoints.py and visualize_changepoint_tallies.py.
+Changepoint positions are counted into a dense (feature x year) tally matrix in one step, and the aggregation rules
+from the supplementary materials are applied to all features at once:
+
+    - Three consecutive years: aggregate into the median year [2006, 2007, 2008] --> 2007
+    - Two consecutive years: aggregate into the earlier year [2000, 2001] --> 2000
+    - Two years two years apart: aggregate into the mean year [1961, 1963] --> 1962
+
+Years are scanned from earliest to latest and a year that has been merged into another one is skipped, as in the
+original list-based implementation. As there, merging is only attempted while at least two more years with
+changepoints follow the current one. In the original implementation, the later year of a two-years-apart pair was
+not skipped (its tally is 0 after the merge, but it can still absorb the years that follow it); the published
+aggregated tallies depend on this, so it is the default.
+
+Time series positions are converted to years with year = year_origin + position. Column j of a tally matrix is
+position j + 1, so with the default origin of 1951 and 69 positions the columns are the years 1952 - 2020.
+"""
+
+"""
+tally_matrix() counts changepoints per feature and position.
+
+Inputs:
+        - array of feature names, one per changepoint
+        - array of positions, one per changepoint
+        - list of feature names (the row order of the matrix)
+        - number of positions (length of the time series)
+        - whether to drop the changepoints at the end of the series (position == number of positions), which ruptures
+          always returns
+        - array of weights, one per changepoint (optional; by default every changepoint counts once)
+Outputs:
+        - ndarray of shape (features, positions) with the tallies (floats if weights are given)
+"""
+def tally_matrix(cpt_features, positions, feature_names, n_positions=69, drop_end=True, weights=None):
+    feature_index = pd.Index(feature_names).get_indexer(cpt_features)
+    positions = np.asarray(positions, dtype=int)
+    keep = (feature_index >= 0) & (positions >= 1) & (positions <= n_positions)
+    if drop_end:
+        keep &= positions != n_positions
+    cells = feature_index[keep]*n_positions + positions[keep] - 1
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)[keep]
+    counts = np.bincount(cells, weights=weights, minlength=len(feature_names)*n_positions)
+    return counts.reshape(len(feature_names), n_positions)
+
+"""
+tally_years() gives the year of each column of a tally matrix.
+"""
+def tally_years(n_positions=69, year_origin=1951):
+    return year_origin + np.arange(1, n_positions + 1)
+
+"""
+aggregate_tallies() applies the aggregation rules to a tally matrix.
+
+Inputs:
+        - ndarray of shape (features, years) with the raw tallies
+        - whether the later year of a two-years-apart pair is skipped (False reproduces the published tallies)
+Outputs:
+        - ndarray of the same shape with the aggregated tallies
+        - boolean ndarray marking the years that were skipped because they were merged into another year
+        - boolean ndarray marking the midpoint years created by the two-years-apart rule
+"""
+def aggregate_tallies(tallies, skip_after_apart=False):
+    n_feats, n_years = tallies.shape
+    # Pad two empty years so that y + 1 and y + 2 are always valid columns
+    raw = np.hstack([tallies, np.zeros((n_feats, 2), dtype=tallies.dtype)])
+    nonzero = raw > 0
+    # Number of years with changepoints after each year
+    later = np.cumsum(nonzero[:, ::-1], axis=1)[:, ::-1] - nonzero
+
+    aggregated = raw.copy()
+    merged = np.zeros_like(nonzero)
+    midpoints = np.zeros_like(nonzero)
+    rows = np.arange(n_feats)
+
+    for y in range(n_years):
+        active = nonzero[:, y] & ~merged[:, y] & (later[:, y] >= 2)
+        three = active & nonzero[:, y+1] & nonzero[:, y+2]
+        two = active & ~three & nonzero[:, y+1]
+        apart = active & ~three & ~two & nonzero[:, y+2]
+
+        # Three consecutive years: into the median year
+        r = rows[three]
+        aggregated[r, y+1] = aggregated[r, y] + aggregated[r, y+1] + aggregated[r, y+2]
+        aggregated[r, y] = 0
+        aggregated[r, y+2] = 0
+        merged[r, y+1] = True
+        merged[r, y+2] = True
+
+        # Two consecutive years: into the earlier year
+        r = rows[two]
+        aggregated[r, y] = aggregated[r, y] + aggregated[r, y+1]
+        aggregated[r, y+1] = 0
+        merged[r, y+1] = True
+
+        # Two years apart: into the year in between
+        r = rows[apart]
+        aggregated[r, y+1] = aggregated[r, y] + aggregated[r, y+2]
+        aggregated[r, y] = 0
+        aggregated[r, y+2] = 0
+        merged[r, y+2] = skip_after_apart
+        midpoints[r, y+1] = True
+
+    return aggregated[:, :n_years], merged[:, :n_years], midpoints[:, :n_years]
+
+"""
+true_changepoints() lists, for each feature, the years whose tally is at least the threshold.
+
+Inputs:
+        - tally matrix
+        - list of feature names
+        - ndarray of years (columns of the matrix)
+        - threshold
+Output: dictionary {feature: list of years}
+"""
+def true_changepoints(tallies, feature_names, years, threshold=120):
+    return {feature_names[i]: [int(y) for y in years[tallies[i] >= threshold]] for i in range(len(feature_names))}
+
+"""
+tallies_to_lists() converts tally matrices to the DataFrame layout of the tally .csv's: one row per feature, with the
+list of years that had changepoints and the list of their tallies. For aggregated tallies, merged years are kept with a
+tally of 0, and a year moved by the two-years-apart rule is listed as its midpoint.
+
+Inputs:
+        - raw tally matrix
+        - list of feature names
+        - ndarray of years (columns of the matrix)
+        - aggregated tally matrix and midpoint mask from aggregate_tallies() (optional)
+Output: DataFrame with columns 'Feature', 'Positions', 'Tallies'
+"""
+def tallies_to_lists(raw, feature_names, years, aggregated=None, midpoints=None):
+    rows = []
+    for i in range(len(feature_names)):
+        listed = raw[i] > 0
+        values = raw[i]
+        if aggregated is not None:
+            # The earlier year of a two-years-apart pair is listed at the midpoint instead
+            moved = np.roll(midpoints[i], -1) & listed
+            listed = (listed & ~moved) | midpoints[i]
+            values = aggregated[i]
+        rows.append({'Feature': feature_names[i],
+                     'Positions': [int(y) for y in years[listed]],
+                     'Tallies': [int(t) for t in values[listed]]})
+    return pd.DataFrame(rows, columns=['Feature', 'Positions', 'Tallies'])
+
+"""
+tally_matrix_frame() converts a tally matrix to a DataFrame with one row per feature and one column per year, the
+layout that is saved for visualize_changepoint_tallies.py.
+"""
+def tally_matrix_frame(tallies, feature_names, years):
+    df = pd.DataFrame(tallies, columns=[str(y) for y in years])
+    df.insert(0, 'Feature', feature_names)
+    return df
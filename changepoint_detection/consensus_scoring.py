@@ -0,0 +1,141 @@
+# Imports
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+from changepoint_tally import aggregate_tallies, true_changepoints
+
+"""
+consensus_scoring.py contains a kernel-density alternative to the rule-based aggregation of changepoint tallies. Instead
+of merging nearby years with fixed rules and applying a hard threshold, each feature's (weighted) tallies are smoothed
+with a kernel, and the consensus changepoints are the peaks of the smoothed curve that stand out from their
+surroundings by at least a minimum prominence. Nearby years then support each other in proportion to the kernel, however
+many of them there are.
+
+Each changepoint can be weighted by the method and parameters that found it, e.g. to give the four methods the same
+influence although they contribute different numbers of runs, or to down-weight small penalties.
+
+Modes of consensus_changepoints():
+        - 'kernel': kernel smoothing and prominence-based peak selection
+        - 'rules': the aggregation rules and threshold of the supplementary materials (see changepoint_tally.py), which
+          reproduce the published changepoints
+"""
+
+"""
+changepoint_weights() computes a weight for every changepoint from its method and parameters.
+
+Inputs:
+        - DataFrame of changepoints
+        - dictionary {method: weight} (methods that are not listed get weight 1)
+        - dictionary {column: {value: weight}} for parameter columns of the DataFrame (values that are not listed get
+          weight 1)
+        - name of the method column
+Outputs:
+        - ndarray of weights, the product of the method weight and the parameter weights
+"""
+def changepoint_weights(cpt_df, method_weights=None, parameter_weights=None, method_column='method'):
+    weights = np.ones(len(cpt_df))
+    if method_weights:
+        weights *= cpt_df[method_column].map(method_weights).fillna(1).to_numpy(dtype=float)
+    for column, column_weights in (parameter_weights or {}).items():
+        weights *= cpt_df[column].map(column_weights).fillna(1).to_numpy(dtype=float)
+    return weights
+
+"""
+kernel_weights() gives the kernel on the integer offsets -radius ... radius, scaled so that the centre weight is 1. The
+smoothed score of a year is then its own tally plus the kernel-weighted tallies of the years around it, in the same
+units as the (aggregated) tallies.
+
+Inputs:
+        - kernel: 'gaussian', 'epanechnikov', 'triangular' or 'boxcar'
+        - bandwidth, in years (the standard deviation for the gaussian kernel, the half-width for the others)
+Outputs:
+        - ndarray of the kernel weights
+"""
+def kernel_weights(kernel='gaussian', bandwidth=1.0):
+    if kernel == 'gaussian':
+        radius = int(np.ceil(4*bandwidth))
+        u = np.arange(-radius, radius + 1)/bandwidth
+        k = np.exp(-u**2/2)
+    else:
+        radius = int(np.floor(bandwidth))
+        u = np.arange(-radius, radius + 1)/(bandwidth + 1)
+        if kernel == 'epanechnikov':
+            k = 1 - u**2
+        elif kernel == 'triangular':
+            k = 1 - np.abs(u)
+        elif kernel == 'boxcar':
+            k = np.ones(len(u))
+        else:
+            raise ValueError("Unknown kernel: " + str(kernel))
+    return k/k.max()
+
+"""
+smooth_tallies() convolves every row of a (feature x year) tally matrix with a kernel at once. Mass that the kernel
+spreads beyond the first and last year is lost.
+"""
+def smooth_tallies(tallies, kernel='gaussian', bandwidth=1.0):
+    k = kernel_weights(kernel, bandwidth)
+    radius = len(k)//2
+    n_years = tallies.shape[-1]
+    padded = np.pad(np.asarray(tallies, dtype=float), [(0, 0)]*(tallies.ndim - 1) + [(radius, radius)])
+    # Sliding windows of the padded rows, weighted by the (symmetric) kernel
+    windows = np.lib.stride_tricks.sliding_window_view(padded, len(k), axis=-1)[..., :n_years, :]
+    return windows @ k
+
+"""
+consensus_peaks() finds the peaks of each feature's smoothed tallies.
+
+Inputs:
+        - ndarray of shape (features, years) with the smoothed tallies
+        - minimum prominence of a peak, in the units of the tallies
+        - minimum distance between peaks, in years
+Outputs:
+        - list (one entry per feature) of ndarrays with the column indices of the peaks
+        - list (one entry per feature) of ndarrays with the prominences of the peaks
+"""
+def consensus_peaks(scores, prominence, distance=1):
+    peaks, prominences = [], []
+    for row in scores:
+        # Pad with zeros so that peaks in the first and last year can be found
+        idx, props = find_peaks(np.concatenate([[0], row, [0]]), prominence=prominence, distance=distance)
+        peaks.append(idx - 1)
+        prominences.append(props['prominences'])
+    return peaks, prominences
+
+"""
+consensus_changepoints() lists the consensus changepoints of each feature.
+
+Inputs:
+        - raw (optionally weighted) tally matrix
+        - list of feature names
+        - ndarray of years (columns of the matrix)
+        - mode: 'kernel' or 'rules'
+        - for 'kernel': kernel, bandwidth, minimum prominence and minimum distance between peaks
+        - for 'rules': threshold on the aggregated tallies
+Outputs:
+        - dictionary {feature: list of years}
+        - ndarray of shape (features, years) with the scores the changepoints were selected from (smoothed or aggregated
+          tallies)
+"""
+def consensus_changepoints(tallies, feature_names, years, mode='kernel', kernel='gaussian', bandwidth=1.0,
+                           prominence=120, distance=3, threshold=120):
+    if mode == 'rules':
+        aggregated = aggregate_tallies(tallies)[0]
+        return true_changepoints(aggregated, feature_names, years, threshold), aggregated
+    if mode != 'kernel':
+        raise ValueError("Unknown consensus mode: " + str(mode))
+
+    scores = smooth_tallies(tallies, kernel, bandwidth)
+    peaks, _ = consensus_peaks(scores, prominence, distance)
+    return {feature_names[i]: [int(y) for y in years[peaks[i]]] for i in range(len(feature_names))}, scores
+
+"""
+consensus_table() lists every consensus changepoint with its score and prominence, for the 'kernel' mode.
+"""
+def consensus_table(scores, feature_names, years, prominence=120, distance=3):
+    peaks, prominences = consensus_peaks(scores, prominence, distance)
+    rows = []
+    for i in range(len(feature_names)):
+        for p, prom in zip(peaks[i], prominences[i]):
+            rows.append({'Feature': feature_names[i], 'Year': int(years[p]), 'Score': scores[i, p], 'Prominence': prom})
+    return pd.DataFrame(rows, columns=['Feature', 'Year', 'Score', 'Prominence'])
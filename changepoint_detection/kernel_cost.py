@@ -0,0 +1,100 @@
+# Imports
+import hashlib
+import numpy as np
+from ruptures.base import BaseCost
+from ruptures.exceptions import NotEnoughPoints
+from scipy.spatial.distance import pdist, squareform
+
+"""
+kernel_cost.py contains a kernel (RBF) cost for the ruptures methods that shares its Gram matrix across the parameter
+sweep. ruptures' own "rbf" cost builds the Gram matrix for every fitted algorithm and sums a sub-block of it for every
+segment. Here the Gram matrix and its 2D cumulative sums are computed once per (signal, gamma) and cached, so every
+PELT/bottom-up/window/dynamic programming run on the same target reuses them and each segment cost is O(1).
+
+The cost is the same as ruptures' CostRbf, including the median heuristic for gamma and the clipping of the scaled
+distances.
+"""
+
+# Cache of Gram matrix sums, keyed by (signal hash, gamma)
+_gram_cache = {}
+
+"""
+gram_cumsums() computes (or fetches from the cache) the cumulative sums needed for the kernel cost of a signal.
+
+Inputs:
+        - ndarray of shape (n_samples, n_features)
+        - gamma of the RBF kernel, or None for the median heuristic
+Outputs:
+        - gamma that was used
+        - ndarray of shape (n_samples + 1,) with the cumulative sums of the diagonal of the Gram matrix
+        - ndarray of shape (n_samples + 1, n_samples + 1) with the 2D cumulative sums of the Gram matrix
+"""
+def gram_cumsums(signal, gamma=None):
+    signal = np.ascontiguousarray(signal, dtype=float)
+    key = (hashlib.sha1(signal.tobytes()).hexdigest(), signal.shape, gamma)
+    if key not in _gram_cache:
+        distances = pdist(signal, metric="sqeuclidean")
+        used_gamma = gamma
+        if used_gamma is None:
+            # Median heuristic, as in ruptures
+            median = np.median(distances)
+            used_gamma = 1/median if median != 0 else 1.0
+        scaled = np.clip(distances*used_gamma, 1e-2, 1e2)
+        gram = np.exp(squareform(-scaled))
+
+        diag_cumsum = np.concatenate([[0], np.cumsum(np.diagonal(gram))])
+        block_cumsum = np.zeros((len(signal) + 1, len(signal) + 1))
+        block_cumsum[1:, 1:] = gram.cumsum(axis=0).cumsum(axis=1)
+        _gram_cache[key] = (used_gamma, diag_cumsum, block_cumsum)
+    return _gram_cache[key]
+
+"""
+clear_gram_cache() empties the cache (e.g. between targets of a long sweep, to free memory).
+"""
+def clear_gram_cache():
+    _gram_cache.clear()
+
+"""
+CostCachedRbf is the ruptures cost class. Use it through the custom_cost argument, e.g.
+rpt.Pelt(custom_cost=CostCachedRbf(), min_size=5).
+"""
+class CostCachedRbf(BaseCost):
+
+    model = "rbf_cached"
+
+    def __init__(self, gamma=None):
+        self.min_size = 1
+        self.gamma = gamma
+        self.signal = None
+
+    def fit(self, signal):
+        if signal.ndim == 1:
+            self.signal = signal.reshape(-1, 1)
+        else:
+            self.signal = signal
+        self.used_gamma, self.diag_cumsum, self.block_cumsum = gram_cumsums(self.signal, self.gamma)
+        return self
+
+    def error(self, start, end):
+        if end - start < self.min_size:
+            raise NotEnoughPoints
+        S = self.block_cumsum
+        block = S[end, end] - S[start, end] - S[end, start] + S[start, start]
+        return (self.diag_cumsum[end] - self.diag_cumsum[start]) - block/(end - start)
+
+"""
+cost_arguments() turns a cost function name of the sweep into keyword arguments for the ruptures methods. Kernel costs
+are named 'rbf (gamma=median)' or 'rbf (gamma=<value>)'; any other name is passed to ruptures as the model.
+"""
+def cost_arguments(cost):
+    if cost.startswith('rbf (gamma='):
+        gamma = cost[len('rbf (gamma='):-1]
+        gamma = None if gamma == 'median' else float(gamma)
+        return {'custom_cost': CostCachedRbf(gamma)}
+    return {'model': cost}
+
+"""
+kernel_cost_name() gives the sweep's cost function name for a kernel bandwidth (a gamma value or 'median').
+"""
+def kernel_cost_name(gamma):
+    return 'rbf (gamma=' + str(gamma) + ')'
@@ -0,0 +1,139 @@
+# Imports
+from melody_changepoints import year_statistics, rff_year_statistics, pelt, optimal_partition, mmd_split_scores
+import pandas as pd
+import numpy as np
+import os
+
+"""
+melody_changepoint_analysis.py performs changepoint detection on the per-melody feature values instead of the smoothed
+yearly averages, so the within-year spread of the melodies is used. Melodies are ordered by year and changepoints can
+only fall between years (see melody_changepoints.py). Two methods are used: PELT over a range of penalties, and
+optimal partitioning (dynamic programming) for a fixed number of changepoints.
+
+The 'mmd' cost looks for changes in the distribution of the melodies (spread, shape) rather than just the mean: the
+melodies are embedded with random Fourier features of a Gaussian kernel, and the l2 cost of the embeddings is the
+kernel cost whose split gains are MMD's (see melody_changepoints.py). The MMD between the blocks of years before and
+after every year boundary is also saved, for a few block widths.
+
+Features are z-scored over all melodies first, so that the multivariate cost weights each feature equally. Penalties
+are given as multiples of log(number of melodies) per feature (BIC-style), since the costs grow with the number of
+melodies (for the 'mmd' cost, the multiplier times log(number of melodies), whatever the number of features).
+
+The output has the same columns as python_changepoints.csv, plus a 'Year' column. 'Position' is the index of the first
+year of the new segment in the list of years (0 = 1950), and 'Year' is that year. The last position of each
+segmentation is the end of the series, as with the ruptures methods.
+
+You need to specify the root directory.
+
+Input: .csv with the feature values of every melody
+Outputs:
+        - .csv with the changepoints found at every parameter setting
+        - .csv with the MMD split scores of every feature, block width and year
+"""
+
+"""
+DIRECTORIES
+"""
+# SPECIFY ROOT DIRECTORY
+base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
+# Per-melody features
+features_dir = os.path.join(base_dir, "output_data/features/all_features.csv")
+# Desired directory of the changepoint table
+cpt_table_name = os.path.join(base_dir, "output_data/changepoints/melody_changepoints.csv")
+# Desired directory of the MMD split scores
+mmd_table_name = os.path.join(base_dir, "output_data/changepoints/melody_mmd_scores.csv")
+
+"""
+DATA PREPARATION
+"""
+# Read in the features; only use the years covered by the time series
+df = pd.read_csv(features_dir)
+df = df.loc[df['Year'] <= 2022]
+features = [c for c in df.columns if c not in ['ID', 'Year']]
+
+# z-score each feature over all melodies
+values = np.array(df[features], dtype=float)
+values = (values - values.mean(axis=0))/values.std(axis=0)
+melody_years = np.array(df['Year'])
+
+"""
+Parameter spaces for changepoint detection
+"""
+# Features to analyze
+to_analyze = features + ['Multivariate']
+# Cost functions
+cost_functions = ["l2", "normal", "mmd"]
+# MMD: number of random Fourier frequencies, kernel bandwidth (None: median heuristic), seed, and the block widths (in
+# years) of the split scores
+rff_size = 256
+rff_bandwidth = None
+rff_seed = 0
+mmd_widths = [5, 10]
+# Minimum number of years between changepoints
+minimum_gaps = [5, 6, 7, 8, 9, 10]
+# Number of changepoints (optimal partitioning)
+num_cpts_vals = [1, 2, 3, 4]
+# Penalty multipliers (PELT)
+pen_multipliers = [0.5, 1, 2, 4, 8]
+
+"""
+ANALYSIS
+"""
+all_info = []
+mmd_info = []
+n_melodies = len(values)
+
+for var in to_analyze:
+    # Per-year statistics are computed once per feature (or once for all features)
+    if var == 'Multivariate':
+        var_values = values
+    else:
+        var_values = values[:, features.index(var)]
+    years, feature_stats = year_statistics(melody_years, var_values)
+    n_dims = var_values.reshape(n_melodies, -1).shape[1]
+
+    if 'mmd' in cost_functions:
+        # Each melody is embedded once; the split scores and the segmentations use the cumulative embedding sums
+        _, rff_stats, _ = rff_year_statistics(melody_years, var_values, rff_size, rff_bandwidth, rff_seed)
+        scores = mmd_split_scores(rff_stats, mmd_widths)
+        for w, width in enumerate(mmd_widths):
+            for t in range(len(years)):
+                mmd_info.append([var, width, years[t], scores[w, t]])
+
+    for cost in cost_functions:
+        # The MMD cost is the l2 cost of the embeddings
+        if cost == 'mmd':
+            cum_stats, segment_cost, pen_dims = rff_stats, 'l2', 1
+        else:
+            cum_stats, segment_cost, pen_dims = feature_stats, cost, n_dims
+        for gap in minimum_gaps:
+            # PELT
+            for mult in pen_multipliers:
+                pen = mult*pen_dims*np.log(n_melodies)
+                cpts = pelt(cum_stats, pen, min_size=gap, cost=segment_cost)
+                for cpt in cpts:
+                    all_info.append([var, 'PELT', cost, 'N/A', gap, pen, 'N/A', cpt])
+
+            # Optimal partitioning with a known number of changepoints
+            for num in num_cpts_vals:
+                try:
+                    cpts = optimal_partition(cum_stats, num, min_size=gap, cost=segment_cost)
+                except ValueError:
+                    # Too many changepoints for this minimum gap
+                    continue
+                for cpt in cpts:
+                    all_info.append([var, 'Optimal partition', cost, num, gap, 'N/A', 'N/A', cpt])
+
+"""
+Compile data into a DataFrame and save
+"""
+info_df = pd.DataFrame(all_info, columns = ['Feature', 'Method', 'Cost Function', 'Number of Changepoints', 'Minimum Gap Between Changepoints', 'Penalty', 'Window Size', 'Position'])
+# First year of the new segment (N/A for the end of the series)
+all_years = list(years) + [np.nan]
+info_df['Year'] = [all_years[p] for p in info_df['Position']]
+
+info_df.to_csv(cpt_table_name, index=False)
+
+# MMD between the blocks of years before and after each year (N/A where a block does not fit)
+mmd_df = pd.DataFrame(mmd_info, columns=['Feature', 'Block Width', 'Year', 'MMD^2'])
+mmd_df.to_csv(mmd_table_name, index=False)
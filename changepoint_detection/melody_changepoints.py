@@ -0,0 +1,263 @@
+# Imports
+import numpy as np
+
+"""
+melody_changepoints.py contains functions for changepoint detection on the per-melody feature values (all_features.csv)
+instead of the yearly averages. Melodies are ordered by year and breakpoints can only fall on year boundaries, so a
+segment is a run of whole years.
+
+The melodies are only read once, to compute per-year sufficient statistics (number of melodies, sum and sum of squares
+of each feature). Cumulative sums of these give the cost of any run of years in O(1), so the search itself scales with
+the number of years, not the number of melodies.
+
+Cost functions:
+        - 'l2': sum of squared deviations from the segment mean (changes in mean)
+        - 'normal': Gaussian negative log-likelihood, N * log(variance) (changes in mean and/or spread)
+"""
+
+"""
+year_statistics() computes the per-year sufficient statistics.
+
+Inputs:
+        - ndarray of shape (melodies,) with the year of each melody
+        - ndarray of shape (melodies, features) with the feature values
+Outputs:
+        - ndarray of the sorted unique years
+        - cumulative statistics: a tuple (N, S1, S2) of arrays with a leading 0 row, where row i sums the first i years
+"""
+def year_statistics(melody_years, values):
+    values = values.reshape(len(values), -1)
+    years, year_index = np.unique(melody_years, return_inverse=True)
+    n_years, n_feats = len(years), values.shape[1]
+
+    counts = np.bincount(year_index, minlength=n_years).astype(float)
+    # One bincount over (year, feature) cells for the sums and the sums of squares
+    cells = (year_index[:, None]*n_feats + np.arange(n_feats)[None, :]).ravel()
+    sums = np.bincount(cells, weights=values.ravel(), minlength=n_years*n_feats).reshape(n_years, n_feats)
+    sq_sums = np.bincount(cells, weights=(values**2).ravel(), minlength=n_years*n_feats).reshape(n_years, n_feats)
+
+    cum_n = np.concatenate([[0], np.cumsum(counts)])
+    cum_s1 = np.vstack([np.zeros(n_feats), np.cumsum(sums, axis=0)])
+    cum_s2 = np.vstack([np.zeros(n_feats), np.cumsum(sq_sums, axis=0)])
+    return years, (cum_n, cum_s1, cum_s2)
+
+"""
+segment_cost() computes the cost of the runs of years [start, end), for arrays of starts and ends.
+
+Inputs:
+        - cumulative statistics from year_statistics()
+        - ndarray of start indices
+        - ndarray of end indices (same shape as starts, or broadcastable)
+        - cost function ('l2' or 'normal')
+Outputs:
+        - ndarray of costs
+"""
+def segment_cost(cum_stats, starts, ends, cost='l2'):
+    cum_n, cum_s1, cum_s2 = cum_stats
+    starts, ends = np.broadcast_arrays(np.asarray(starts), np.asarray(ends))
+    n = (cum_n[ends] - cum_n[starts])[..., None]
+    s1 = cum_s1[ends] - cum_s1[starts]
+    s2 = cum_s2[ends] - cum_s2[starts]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if cost == 'l2':
+            costs = s2 - s1**2/n
+        elif cost == 'normal':
+            var = np.maximum(s2/n - (s1/n)**2, 1e-12)
+            costs = n*np.log(var)
+        else:
+            raise ValueError("Unknown cost function: " + str(cost))
+    # Empty runs of years have no cost
+    return np.where(n > 0, costs, 0).sum(axis=-1)
+
+"""
+pelt() finds the optimal segmentation for a penalty with the PELT algorithm (Killick et al., 2012).
+
+Inputs:
+        - cumulative statistics from year_statistics()
+        - penalty per changepoint
+        - minimum segment length, in years
+        - cost function
+Outputs:
+        - list of breakpoints (year indices, ruptures-style: the last one is the number of years)
+"""
+def pelt(cum_stats, pen, min_size=5, cost='l2'):
+    n_years = len(cum_stats[0]) - 1
+    best = np.full(n_years + 1, np.inf)
+    best[0] = -pen
+    last_bkp = np.zeros(n_years + 1, dtype=int)
+    candidates = np.array([0])
+
+    for t in range(min_size, n_years + 1):
+        admissible = candidates[t - candidates >= min_size]
+        if len(admissible) == 0:
+            continue
+        totals = best[admissible] + segment_cost(cum_stats, admissible, t, cost) + pen
+        i = np.argmin(totals)
+        best[t], last_bkp[t] = totals[i], admissible[i]
+        # Prune candidates that can never be optimal again; keep the ones that are still too recent to be evaluated
+        keep = totals - pen <= best[t]
+        candidates = np.concatenate([candidates[t - candidates < min_size], admissible[keep], [t]])
+
+    return backtrack(last_bkp, n_years)
+
+"""
+optimal_partition() finds the segmentation with a fixed number of breakpoints that minimizes the total cost, by
+dynamic programming over a precomputed (start x end) cost matrix.
+
+Inputs:
+        - cumulative statistics from year_statistics()
+        - number of breakpoints
+        - minimum segment length, in years
+        - cost function
+Outputs:
+        - list of breakpoints (year indices, ruptures-style: the last one is the number of years)
+"""
+def optimal_partition(cum_stats, n_bkps, min_size=5, cost='l2'):
+    n_years = len(cum_stats[0]) - 1
+    bounds = np.arange(n_years + 1)
+    costs = segment_cost(cum_stats, bounds[:, None], bounds[None, :], cost)
+    # Segments shorter than min_size (or with end <= start) are not allowed
+    costs[bounds[None, :] - bounds[:, None] < min_size] = np.inf
+
+    # best[k, t]: cost of splitting the first t years into k + 1 segments
+    best = costs[0][None, :].copy()
+    parents = []
+    for k in range(n_bkps):
+        totals = best[-1][:, None] + costs
+        parents.append(np.argmin(totals, axis=0))
+        best = np.vstack([best, totals.min(axis=0)])
+
+    if not np.isfinite(best[-1, n_years]):
+        raise ValueError("No segmentation with " + str(n_bkps) + " breakpoints and min_size " + str(min_size))
+
+    bkps = [n_years]
+    for k in range(n_bkps - 1, -1, -1):
+        bkps.insert(0, parents[k][bkps[0]])
+    return [int(b) for b in bkps]
+
+"""
+backtrack() recovers the breakpoint list from the last-breakpoint array of pelt().
+"""
+def backtrack(last_bkp, end):
+    bkps = [end]
+    while last_bkp[bkps[0]] > 0:
+        bkps.insert(0, int(last_bkp[bkps[0]]))
+    return bkps
+
+"""
+Distribution changes: maximum mean discrepancy (MMD) with random Fourier features
+
+A change in the spread or shape of a feature's distribution can leave its yearly mean unchanged. The MMD between two
+blocks of melodies compares their whole distributions: it is the distance between the blocks' mean embeddings in the
+feature space of a Gaussian kernel. With random Fourier features (Rahimi & Recht, 2007), the embedding of a melody is an
+explicit vector phi(x) of length 2D, so
+
+    MMD^2(A, B) ~ || mean(phi(A)) - mean(phi(B)) ||^2
+
+Each melody is embedded once and summed into its year (rff_year_statistics()); the cumulative embedding sums then give
+the MMD between any two runs of years in O(D). As ||phi(x)|| = 1, the 'l2' cost of the embeddings is the kernel cost
+N - ||sum(phi)||^2 / N, and the decrease in cost from splitting a segment into A and B is
+N_A * N_B / (N_A + N_B) * MMD^2(A, B). pelt() and optimal_partition() on the embeddings therefore find distribution
+changes.
+"""
+
+"""
+rff_frequencies() draws the random frequencies of the Gaussian kernel exp(-||x - y||^2 / (2 bandwidth^2)).
+
+Inputs:
+        - ndarray of shape (melodies, features) with the (z-scored) feature values
+        - D, the number of random frequencies (the embedding has 2D dimensions)
+        - bandwidth of the kernel, or None for the median heuristic (median distance between melodies, on a random
+          subsample of at most 1000 melodies)
+        - seed of the random number generator
+Outputs:
+        - ndarray of shape (features, D) with the frequencies
+        - bandwidth that was used
+"""
+def rff_frequencies(values, n_frequencies=256, bandwidth=None, seed=0):
+    rng = np.random.default_rng(seed)
+    if bandwidth is None:
+        sample = values[rng.choice(len(values), size=min(len(values), 1000), replace=False)]
+        distances = np.sqrt(((sample[:, None, :] - sample[None, :, :])**2).sum(axis=-1))
+        bandwidth = np.median(distances[np.triu_indices(len(sample), k=1)])
+        if bandwidth == 0:
+            bandwidth = 1.0
+    return rng.normal(scale=1/bandwidth, size=(values.shape[1], n_frequencies)), bandwidth
+
+"""
+rff_features() embeds melodies with the random frequencies: phi(x) = [cos(xW), sin(xW)] / sqrt(D).
+"""
+def rff_features(values, frequencies):
+    projection = values @ frequencies
+    return np.hstack([np.cos(projection), np.sin(projection)])/np.sqrt(frequencies.shape[1])
+
+"""
+rff_year_statistics() is year_statistics() of the random Fourier features of the melodies. The melodies are embedded in
+chunks and summed per year straight away, so the embeddings of the whole corpus are never held in memory at once.
+
+Inputs:
+        - ndarray of shape (melodies,) with the year of each melody
+        - ndarray of shape (melodies,) or (melodies, features) with the (z-scored) feature values
+        - number of random frequencies, bandwidth and seed (see rff_frequencies())
+        - number of melodies embedded at once
+Outputs:
+        - ndarray of the sorted unique years
+        - cumulative statistics (N, S1, S2) of the embeddings
+        - bandwidth that was used
+"""
+def rff_year_statistics(melody_years, values, n_frequencies=256, bandwidth=None, seed=0, chunk_size=100000):
+    values = np.asarray(values, dtype=float).reshape(len(values), -1)
+    frequencies, bandwidth = rff_frequencies(values, n_frequencies, bandwidth, seed)
+    years, year_index = np.unique(melody_years, return_inverse=True)
+    n_years = len(years)
+
+    # Sorting by year lets every chunk be summed per year with one reduceat
+    order = np.argsort(year_index, kind='stable')
+    counts = np.bincount(year_index, minlength=n_years).astype(float)
+    sums = np.zeros((n_years, 2*n_frequencies))
+    sq_sums = np.zeros((n_years, 2*n_frequencies))
+    for start in range(0, len(order), chunk_size):
+        chunk = order[start:start + chunk_size]
+        chunk_years = year_index[chunk]
+        phi = rff_features(values[chunk], frequencies)
+        bounds = np.flatnonzero(np.concatenate([[True], chunk_years[1:] != chunk_years[:-1]]))
+        sums[chunk_years[bounds]] += np.add.reduceat(phi, bounds, axis=0)
+        sq_sums[chunk_years[bounds]] += np.add.reduceat(phi**2, bounds, axis=0)
+
+    cum_n = np.concatenate([[0], np.cumsum(counts)])
+    cum_s1 = np.vstack([np.zeros(2*n_frequencies), np.cumsum(sums, axis=0)])
+    cum_s2 = np.vstack([np.zeros(2*n_frequencies), np.cumsum(sq_sums, axis=0)])
+    return years, (cum_n, cum_s1, cum_s2), bandwidth
+
+"""
+mmd_between() computes the squared MMD between the runs of years [start_a, end_a) and [start_b, end_b), for arrays of
+starts and ends, from the cumulative statistics of the embeddings.
+"""
+def mmd_between(cum_stats, start_a, end_a, start_b, end_b):
+    cum_n, cum_s1, _ = cum_stats
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_a = (cum_s1[end_a] - cum_s1[start_a])/(cum_n[end_a] - cum_n[start_a])[..., None]
+        mean_b = (cum_s1[end_b] - cum_s1[start_b])/(cum_n[end_b] - cum_n[start_b])[..., None]
+    return ((mean_a - mean_b)**2).sum(axis=-1)
+
+"""
+mmd_split_scores() computes, for every year boundary and every block width, the squared MMD between the block of years
+before the boundary and the block after it. All boundaries and widths take one vectorized pass over the cumulative
+embedding sums.
+
+Inputs:
+        - cumulative statistics of the embeddings from year_statistics()
+        - list of block widths, in years
+Outputs:
+        - ndarray of shape (widths, years) where entry [w, t] compares years [t - width, t) and [t, t + width); N/A where
+          a block would not fit in the series (or holds no melodies)
+"""
+def mmd_split_scores(cum_stats, widths):
+    n_years = len(cum_stats[0]) - 1
+    widths = np.asarray(widths)[:, None]
+    t = np.arange(n_years)[None, :]
+    fits = (t - widths >= 0) & (t + widths <= n_years)
+    before = np.clip(t - widths, 0, n_years)
+    after = np.clip(t + widths, 0, n_years)
+    scores = mmd_between(cum_stats, before, np.broadcast_to(t, before.shape), np.broadcast_to(t, after.shape), after)
+    return np.where(fits, scores, np.nan)
@@ -0,0 +1,65 @@
+# Imports
+from online_changepoints import update_from_series, run_start_probabilities
+import pandas as pd
+import os
+
+"""
+online_changepoint_analysis.py runs online Bayesian changepoint detection (see online_changepoints.py) on the
+normalized time series. The detector's state is saved, so when a new year is added to the time series, running this
+script again only processes the new year instead of repeating the whole changepoint analysis.
+
+For each year, the changepoint probability is the posterior probability (computed 'lag' years later) that a new
+segment started in that year. The "Multivariate" column is the probability that all features changed together, which
+serves as a continuously updated "revolution" signal.
+
+You need to specify the root directory.
+
+Input: .csv with the (normalized) smoothed time series
+Outputs:
+        - .npz with the detector state
+        - .csv with the changepoint probability of each year for each feature (the last 'lag' years are N/A until enough
+          later years have been observed)
+        - .csv with the current posterior probability that the most recent segment started in each year
+"""
+
+"""
+DIRECTORIES
+"""
+# SPECIFY ROOT DIRECTORY
+base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
+# Normalized time series
+ts_dir = os.path.join(base_dir, "output_data/time_series/norm_time_series.csv")
+# Detector state
+state_name = os.path.join(base_dir, "output_data/changepoints/online_changepoint_state.npz")
+# Output .csv's
+cpt_prob_name = os.path.join(base_dir, "output_data/changepoints/online_changepoint_probabilities.csv")
+run_start_name = os.path.join(base_dir, "output_data/changepoints/online_run_start_probabilities.csv")
+
+"""
+Model settings
+"""
+# Expected number of years between changepoints
+expected_run_length = 25
+# Normal-Gamma prior (mean, kappa, alpha, beta); the series are normalized to [0, 1]
+prior = (0.5, 1.0, 1.0, 0.01)
+# Number of later years used to judge whether a year was a changepoint
+lag = 3
+
+"""
+ANALYSIS
+"""
+ts_norm = pd.read_csv(ts_dir)
+state = update_from_series(ts_norm, state_name, expected_run_length=expected_run_length, prior=prior, lag=lag)
+
+# Changepoint probabilities per year
+cpt_prob_df = pd.DataFrame(state['cp_prob'], columns=state['features'])
+cpt_prob_df.insert(0, 'Year', state['years'])
+cpt_prob_df.to_csv(cpt_prob_name, index=False)
+
+# Where did the current segment start?
+run_start_df = pd.DataFrame(run_start_probabilities(state), columns=state['features'])
+run_start_df.insert(0, 'Year', state['years'])
+run_start_df.to_csv(run_start_name, index=False)
+
+print("Years with a multivariate changepoint probability above 0.5:",
+      list(cpt_prob_df.loc[cpt_prob_df['Multivariate'] > 0.5, 'Year']))
@@ -0,0 +1,171 @@
+# Imports
+import numpy as np
+import os
+from scipy.special import gammaln, logsumexp
+
+"""
+online_changepoints.py contains functions for online Bayesian changepoint detection (Adams & MacKay, 2007). Each
+feature is modelled as Gaussian with unknown mean and variance (Normal-Gamma prior), and a run-length posterior is
+updated every time a new year is observed. Besides one posterior per feature, a "Multivariate" posterior is kept in which
+all features share the same run length, so its changepoints are years where the features change together.
+
+The state is a dictionary of numpy arrays that can be saved to and loaded from a .npz file, so a new year only costs one
+O(run length) update instead of re-running the offline methods.
+
+State contents:
+        - 'features': feature names (the last row of the run-length posterior is 'Multivariate')
+        - 'years': years observed so far
+        - 'data': observed values, shape (years, features)
+        - 'log_r': log run-length posterior, shape (features + 1, run lengths)
+        - 'mu', 'kappa', 'alpha', 'beta': Normal-Gamma parameters per run length, shape (features, run lengths)
+        - 'cp_prob': delayed changepoint probability per year, shape (years, features + 1)
+        - 'prior', 'hazard', 'lag': model settings
+"""
+
+"""
+init_state() creates an empty state.
+
+Inputs:
+        - list of feature names
+        - expected run length (1/hazard), in years
+        - prior (mu, kappa, alpha, beta) of the Normal-Gamma model
+        - lag (in years, at least 1) after which the changepoint probability of a year is reported
+Outputs:
+        - state dictionary
+"""
+def init_state(features, expected_run_length=25, prior=(0.5, 1.0, 1.0, 0.01), lag=3):
+    n_feats = len(features)
+    mu0, kappa0, alpha0, beta0 = prior
+    return {'features': np.array(features + ['Multivariate']),
+            'years': np.zeros(0, dtype=int),
+            'data': np.zeros((0, n_feats)),
+            'log_r': np.zeros((n_feats + 1, 1)),
+            'mu': np.full((n_feats, 1), mu0),
+            'kappa': np.full((n_feats, 1), kappa0),
+            'alpha': np.full((n_feats, 1), alpha0),
+            'beta': np.full((n_feats, 1), beta0),
+            'cp_prob': np.zeros((0, n_feats + 1)),
+            'prior': np.array(prior, dtype=float),
+            'hazard': np.array(1/expected_run_length),
+            'lag': np.array(lag)}
+
+"""
+student_t_logpdf() is the posterior predictive log density of the Normal-Gamma model, for every feature and run
+length at once.
+"""
+def student_t_logpdf(x, mu, kappa, alpha, beta):
+    df = 2*alpha
+    scale2 = beta*(kappa + 1)/(alpha*kappa)
+    z2 = (x[:, None] - mu)**2/scale2
+    return (gammaln((df + 1)/2) - gammaln(df/2) - 0.5*np.log(np.pi*df*scale2)
+            - (df + 1)/2*np.log1p(z2/df))
+
+"""
+update_state() adds one year of observations to the state.
+
+Inputs:
+        - state dictionary
+        - year
+        - ndarray of shape (features,) with the observed values
+Outputs:
+        - the updated state dictionary
+"""
+def update_state(state, year, x):
+    log_h = np.log(state['hazard'])
+    log_1mh = np.log1p(-state['hazard'])
+    mu, kappa, alpha, beta = state['mu'], state['kappa'], state['alpha'], state['beta']
+
+    # Predictive probability of x under each run length; the multivariate model multiplies the features' predictives
+    log_pred = student_t_logpdf(x, mu, kappa, alpha, beta)
+    log_pred = np.vstack([log_pred, log_pred.sum(axis=0)])
+
+    # Growth (run continues) and changepoint (run resets to 0) probabilities
+    joint = state['log_r'] + log_pred
+    log_growth = joint + log_1mh
+    log_cp = logsumexp(joint, axis=1, keepdims=True) + log_h
+    log_r = np.hstack([log_cp, log_growth])
+    log_r -= logsumexp(log_r, axis=1, keepdims=True)
+
+    # Update the sufficient statistics, with the prior for the new run of length 0
+    mu0, kappa0, alpha0, beta0 = state['prior']
+    n_feats = mu.shape[0]
+    new_beta = beta + kappa*(x[:, None] - mu)**2/(2*(kappa + 1))
+    state['mu'] = np.hstack([np.full((n_feats, 1), mu0), (kappa*mu + x[:, None])/(kappa + 1)])
+    state['kappa'] = np.hstack([np.full((n_feats, 1), kappa0), kappa + 1])
+    state['alpha'] = np.hstack([np.full((n_feats, 1), alpha0), alpha + 0.5])
+    state['beta'] = np.hstack([np.full((n_feats, 1), beta0), new_beta])
+    state['log_r'] = log_r
+
+    state['years'] = np.append(state['years'], year)
+    state['data'] = np.vstack([state['data'], x])
+
+    # P(r_t = 0) is always the hazard, so a year's changepoint probability is read 'lag' years later:
+    # the posterior probability that the current run started at that year
+    lag = int(state['lag'])
+    state['cp_prob'] = np.vstack([state['cp_prob'], np.full((1, n_feats + 1), np.nan)])
+    # (run length r counts the last r observations, so r = lag means the run started 'lag' rows ago). The first year
+    # is the start of the series rather than a changepoint, so it stays N/A
+    if len(state['years']) > lag:
+        state['cp_prob'][-lag] = np.exp(log_r[:, lag])
+
+    return state
+
+"""
+run_start_probabilities() gives, for each year observed so far, the current posterior probability that the most
+recent run started in that year. Unlike 'cp_prob', this is available for the latest years too.
+
+Input: state dictionary
+Output: ndarray of shape (years, features + 1)
+"""
+def run_start_probabilities(state):
+    # Run length r means the run started with the r-th most recent year
+    return np.exp(state['log_r'][:, ::-1]).T[:-1]
+
+"""
+save_state() and load_state() write the state to, and read it from, a .npz file.
+"""
+def save_state(state, filename):
+    np.savez(filename, **state)
+
+def load_state(filename):
+    with np.load(filename, allow_pickle=False) as f:
+        return {key: f[key] for key in f.files}
+
+"""
+update_from_series() brings a saved state up to date with a time series DataFrame (Year column + one column per
+feature). Only years that are not in the state yet are processed. If the values of years that were already processed
+have changed (e.g. the series was re-normalized after a new year was added) or the model settings are different, the
+state is rebuilt from scratch.
+
+Inputs:
+        - DataFrame with the time series (rows with missing values are skipped)
+        - filename of the state .npz file
+        - keyword arguments for init_state() when a new state is needed
+Outputs:
+        - the updated state dictionary (also saved to the file)
+"""
+def update_from_series(ts_df, state_filename, **kwargs):
+    ts_df = ts_df.dropna()
+    features = [c for c in ts_df.columns if c != 'Year']
+    years = ts_df['Year'].to_numpy()
+    values = ts_df[features].to_numpy(dtype=float)
+
+    new_state = init_state(features, **kwargs)
+    state = None
+    if os.path.exists(state_filename):
+        state = load_state(state_filename)
+        n_seen = len(state['years'])
+        same_settings = all(np.array_equal(state[key], new_state[key]) for key in ['features', 'prior', 'hazard', 'lag'])
+        unchanged = (same_settings and n_seen <= len(years)
+                     and np.array_equal(state['years'], years[:n_seen])
+                     and np.allclose(state['data'], values[:n_seen]))
+        if not unchanged:
+            state = None
+    if state is None:
+        state = new_state
+
+    for i in range(len(state['years']), len(years)):
+        state = update_state(state, years[i], values[i])
+
+    save_state(state, state_filename)
+    return state
@@ -1,11 +1,13 @@
 # Imports
 import pandas as pd
+import numpy as np
 import os
 
 """
 per_era_averages.py computes feature averages per era. Changepoint detection should have identified
 a few changepoints for the time series. Segmenting the time series with these changepoints will create distinct eras.
-Eras are hard-coded, so if you have different changepoints, you need to edit this script to reflect that.
+The eras are derived from the era boundaries that tally_changepoints.py writes (era_boundaries.csv), so run
+tally_changepoints.py first.
 
 You need to specify the root directory.
 """
@@ -18,6 +20,9 @@ base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
 
 # All features .csv directory
 features_dir = os.path.join(base_dir, "output_data/features/all_features.csv")
+# Normalized time series (for the first and last years) and era boundaries (the first year of each new era)
+ts_dir = os.path.join(base_dir, "output_data/time_series/norm_time_series.csv")
+era_boundaries_dir = os.path.join(base_dir, "output_data/changepoints/era_boundaries.csv")
 
 """
 DATA PREPARATION
@@ -26,19 +31,17 @@ DATA PREPARATION
 df = pd.read_csv(features_dir)
 
 # Divide into eras: Era 1 is 1950 - 1974, Era 2 is 1975 - 1999, and Era 3 is 2000 - 2022.
-era_1_years = list(range(1950, 1975))
-era_2_years = list(range(1975, 2000))
-era_3_years = list(range(2000, 2023))
-
-era_1_df = df.loc[df['Year'].isin(era_1_years)]
-era_2_df = df.loc[df['Year'].isin(era_2_years)]
-era_3_df = df.loc[df['Year'].isin(era_3_years)]
+# The eras span the years of the time series (the features also cover the 2023 melodies used for the forecasts)
+ts_years = pd.read_csv(ts_dir)['Year']
+df = df.loc[df['Year'].between(ts_years.min(), ts_years.max())]
+boundaries = sorted(pd.read_csv(era_boundaries_dir)['Year'])
+era_index = np.searchsorted(boundaries, df['Year'].to_numpy(), side='right')
+eras = [df.loc[era_index == i] for i in range(len(boundaries) + 1)]
 
 """
 ANALYSIS
 """
 # For each era, print the MIS, Pitch SD, Onset Density, and TI-OD average
-eras = [era_1_df, era_2_df, era_3_df]
 
 for i in range(len(eras)):
     era = eras[i]
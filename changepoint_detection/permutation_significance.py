@@ -0,0 +1,229 @@
+# Imports
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+"""
+permutation_significance.py contains functions for attaching p-values to detected changepoints. Each breakpoint of a
+segmentation is tested inside the segment formed by its neighbouring breakpoints: the observed statistic is the
+reduction in the run's cost obtained by splitting that segment at the breakpoint, and the null distribution is the
+largest reduction obtainable at any admissible split of permuted (or block-permuted) copies of the segment. Taking
+the maximum over splits accounts for the fact that the breakpoint was chosen by a search, so the p-values are calibrated
+for the detection step.
+
+All surrogates of a segment are generated and scored at once as a (permutations x positions) array. Null distributions
+only depend on the segment's values, the cost and the minimum segment length, so they are cached and shared between the
+many segmentations of the parameter sweep that share a segment.
+
+The l2 (squared error around the mean) and l1 (absolute error around the median) costs are supported, as in ruptures.
+Changepoints found with other costs (the kernel and autoregressive costs, see kernel_cost.py and ar_cost.py) get N/A:
+an l2 test of them would test a different statistic from the one that detected them.
+"""
+
+# Costs whose changepoints can be tested
+testable_costs = ('l1', 'l2')
+
+"""
+split_gains() computes the cost reduction of splitting a segment at every position, for a batch of segments.
+
+Inputs:
+        - ndarray of shape (batch, length, dimensions) with the segment values
+        - cost: 'l2' or 'l1'
+Outputs:
+        - ndarray of shape (batch, length - 1), where entry t - 1 is the gain of splitting before index t
+"""
+def split_gains(segments, cost='l2'):
+    if cost == 'l1':
+        return l1_split_gains(segments)
+    if cost != 'l2':
+        raise ValueError("Unsupported cost for the permutation test: " + str(cost))
+    length = segments.shape[1]
+    # Cumulative sums over time give the left-hand segment sums for every split at once
+    left_sums = np.cumsum(segments, axis=1)[:, :-1, :]
+    total = left_sums[:, -1:, :] + segments[:, -1:, :]
+    right_sums = total - left_sums
+    n_left = np.arange(1, length)[None, :, None]
+    n_right = length - n_left
+    # cost(seg) - cost(left) - cost(right) only depends on the first moments
+    gains = left_sums**2/n_left + right_sums**2/n_right - total**2/length
+    return gains.sum(axis=2)
+
+"""
+l1_costs() computes the l1 cost (absolute error around the median, summed over the dimensions) of a batch of parts. Per
+dimension, this is the sum of the largest h values minus the sum of the smallest h values (h half the length, rounded
+down), so the median itself is not needed.
+
+Inputs:
+        - ndarray of shape (batch, dimensions, length)
+Outputs:
+        - ndarray of shape (batch,)
+"""
+def l1_costs(parts):
+    parts = np.sort(parts, axis=-1)
+    h = parts.shape[-1]//2
+    return (parts[..., parts.shape[-1] - h:].sum(axis=-1) - parts[..., :h].sum(axis=-1)).sum(axis=-1)
+
+"""
+l1_split_gains() computes the l1 cost reduction of splitting a segment at every position (see split_gains()). The parts
+of every split are sorted in turn, over the whole batch at once.
+"""
+def l1_split_gains(segments):
+    # (batch, dimensions, length), so the sorts run along contiguous memory
+    values = np.ascontiguousarray(np.swapaxes(segments, 1, 2))
+    length = values.shape[-1]
+    gains = np.empty(segments.shape[:1] + (length - 1,))
+    for t in range(1, length):
+        gains[:, t - 1] = -l1_costs(values[..., :t]) - l1_costs(values[..., t:])
+    return gains + l1_costs(values)[:, None]
+
+"""
+surrogate_indices() produces the index arrays used to shuffle a segment. With a block size of 1 this is an ordinary
+permutation; larger blocks keep runs of consecutive values together, which preserves the short-range autocorrelation
+introduced by smoothing.
+
+Inputs:
+        - length of the segment
+        - number of surrogates
+        - block size
+        - numpy random Generator
+Outputs:
+        - ndarray of shape (n_perm, length) of indices into the segment
+"""
+def surrogate_indices(length, n_perm, block_size, rng):
+    positions = np.arange(length)
+    block_ids = positions // block_size
+    n_blocks = block_ids[-1] + 1
+    # Random rank for each block in each surrogate
+    block_ranks = np.argsort(rng.random((n_perm, n_blocks)), axis=1)
+    # Sort positions by (block rank, position) to move whole blocks
+    keys = block_ranks[:, block_ids]*length + positions[None, :]
+    return np.argsort(keys, axis=1)
+
+"""
+null_max_gains() computes the null distribution of the maximum split gain of a segment.
+
+Inputs:
+        - ndarray of shape (length, dimensions) with the segment values
+        - minimum segment length on either side of a split
+        - number of surrogates
+        - block size for block permutation
+        - numpy random Generator
+        - cost: 'l2' or 'l1'
+Outputs:
+        - ndarray of shape (n_perm,) with the maximum gain of each surrogate
+"""
+def null_max_gains(segment, min_size, n_perm, block_size, rng, cost='l2'):
+    length = len(segment)
+    indices = surrogate_indices(length, n_perm, block_size, rng)
+    gains = split_gains(segment[indices], cost)
+    # Only splits that leave min_size points on both sides are admissible
+    admissible = gains[:, min_size - 1:length - min_size]
+    return admissible.max(axis=1)
+
+"""
+segmentation_p_values() tests every breakpoint of one segmentation.
+
+Inputs:
+        - ndarray with the series (n_samples,) or (n_samples, n_features)
+        - list of breakpoints, as returned by ruptures (the last one is the end of the series)
+        - minimum segment length
+        - number of surrogates
+        - block size for block permutation
+        - numpy random Generator
+        - dictionary used to cache null distributions between calls (optional)
+        - cost of the segmentation: 'l2' or 'l1'
+Outputs:
+        - list of p-values, one per breakpoint (NaN for the end of the series and for untestable segments)
+"""
+def segmentation_p_values(data, bkps, min_size=2, n_perm=2000, block_size=1, rng=None, cache=None, cost='l2'):
+    if rng is None:
+        rng = np.random.default_rng()
+    if cache is None:
+        cache = {}
+    signal = data.reshape(len(data), -1)
+    n = len(signal)
+    bounds = [0] + [b for b in bkps if b < n] + [n]
+
+    p_values = []
+    for i in range(1, len(bounds) - 1):
+        start, bkp, end = bounds[i-1], bounds[i], bounds[i+1]
+        length = end - start
+        # The breakpoint may sit closer to a neighbour than min_size (e.g. Window method); never exceed it
+        size = max(1, min(min_size, bkp - start, end - bkp))
+        if length < 2*size or length < 3:
+            p_values.append(np.nan)
+            continue
+        segment = signal[start:end]
+        observed = split_gains(segment[None], cost)[0, bkp - start - 1]
+
+        key = (start, end, size, cost)
+        if key not in cache:
+            cache[key] = null_max_gains(segment, size, n_perm, block_size, rng, cost)
+        null = cache[key]
+        # Add-one estimator, so a p-value is never exactly zero
+        p_values.append((1 + np.sum(null >= observed - 1e-12)) / (1 + len(null)))
+
+    # The final "breakpoint" is the end of the series and is not tested
+    p_values += [np.nan]*(len(bkps) - len(p_values))
+    return p_values
+
+"""
+add_p_values() adds a 'p-value' column to a changepoint table with the layout written by
+python_changepoint_analysis.py. Consecutive rows with the same feature and parameter settings make up one
+segmentation, which is tested with its own cost function; changepoints of costs other than those in testable_costs get
+N/A. Features are processed in parallel; each feature gets its own random stream so the results do not depend on
+scheduling.
+
+Inputs:
+        - DataFrame of changepoints (python_changepoints.csv layout)
+        - DataFrame of the time series the changepoints were detected on (one column per feature)
+        - number of surrogates
+        - block size for block permutation
+        - seed
+        - number of worker threads
+Outputs:
+        - the changepoint DataFrame with a 'p-value' column
+"""
+def add_p_values(cpt_df, ts_df, n_perm=2000, block_size=1, seed=0, n_jobs=None):
+    param_cols = ['Feature', 'Method', 'Cost Function', 'Number of Changepoints',
+                  'Minimum Gap Between Changepoints', 'Penalty', 'Window Size']
+    keys = cpt_df[param_cols].astype(str)
+    positions = cpt_df['Position'].astype(int).to_numpy()
+    # A new segmentation starts when the parameters change or the positions stop increasing
+    new_run = (keys != keys.shift()).any(axis=1).to_numpy().copy()
+    new_run[1:] |= positions[1:] <= positions[:-1]
+    run_ids = np.cumsum(new_run)
+
+    features = list(cpt_df['Feature'].unique())
+    seeds = np.random.SeedSequence(seed).spawn(len(features))
+
+    def feature_p_values(feature, seed_seq):
+        if feature == 'Multivariate':
+            data = np.array(ts_df)
+        else:
+            data = np.array(ts_df[feature])
+        rng = np.random.default_rng(seed_seq)
+        cache = {}
+        rows = np.flatnonzero(cpt_df['Feature'].to_numpy() == feature)
+        results = {}
+        for run in np.unique(run_ids[rows]):
+            run_rows = rows[run_ids[rows] == run]
+            cost = cpt_df['Cost Function'].iloc[run_rows[0]]
+            if cost not in testable_costs:
+                continue
+            gap = pd.to_numeric(cpt_df['Minimum Gap Between Changepoints'].iloc[run_rows[0]], errors='coerce')
+            # Runs without a minimum gap (Window method) use ruptures' default of 2
+            min_size = 2 if pd.isna(gap) else int(gap)
+            bkps = list(positions[run_rows])
+            p_vals = segmentation_p_values(data, bkps, min_size, n_perm, block_size, rng, cache, cost)
+            results.update(zip(run_rows, p_vals))
+        return results
+
+    p_values = np.full(len(cpt_df), np.nan)
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        for results in pool.map(feature_p_values, features, seeds):
+            p_values[list(results.keys())] = list(results.values())
+
+    cpt_df = cpt_df.copy()
+    cpt_df['p-value'] = p_values
+    return cpt_df
@@ -4,14 +4,29 @@ import matplotlib.pylab as plt
 import ruptures as rpt
 import numpy as np
 import os
+from permutation_significance import add_p_values
+from changepoint_store import open_store, series_hash, missing_runs, add_runs, select_runs
+from kernel_cost import cost_arguments, kernel_cost_name
+from window_discrepancy import window_changepoints
+from ar_cost import CostCachedAR, ar_cost_name, ar_order
 
 """
 python_changepoint_analysis.py applies three different Python-based changepoint detection methods to the smoothed time
 series using the ruptures library: the PELT, bottom-up, and window sliding methods. See
 Truong et al. (2020) for a review of offline changepoint detection methods.
 
-Inputs - .csv with the smoothed time series.
-Outputs - (Saved) A .csv with changepoints from all methods
+Every changepoint is given a p-value from a (block-)permutation test of its run's cost function (see
+permutation_significance.py). Only the l1 and l2 costs can be tested; kernel and AR changepoints get N/A.
+
+Results are kept in a result store (see changepoint_store.py), keyed by the time series and the parameters. Only the
+parameter combinations that have not been run on the current time series are computed, so values can be added to the
+parameter lists below without re-running the rest of the sweep. The full table for the current time series is then
+exported from the store.
+
+The AR cost (see ar_cost.py) can also be run on the unsmoothed time series, as the smoothing induces autocorrelation.
+
+Inputs - .csv with the smoothed (or unsmoothed) time series.
+Outputs - (Saved) A .csv with changepoints from all methods and their p-values, and the updated result store
 
 You need to specify the base directory.
 """
@@ -25,12 +40,26 @@ base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
 ts_dir = os.path.join(base_dir, "output_data/time_series/norm_time_series.csv")
 # Desired directory of full changepoint table
 cpt_table_name = os.path.join(base_dir, "output_data/changepoints/python_changepoints.csv")
+# Unsmoothed time series, and the changepoint table for it
+ts_unsmoothed_dir = os.path.join(base_dir, "output_data/time_series/unsmoothed_time_series.csv")
+cpt_table_unsmoothed_name = os.path.join(base_dir, "output_data/changepoints/python_changepoints_unsmoothed.csv")
+# Changepoint result store (keeps the results of all previous runs)
+store_name = os.path.join(base_dir, "output_data/changepoints/changepoint_store.sqlite")
+
+# Run the sweep on the unsmoothed time series instead of the smoothed one
+use_unsmoothed = False
 
 """
 DATA PREPARATION
 """
-# Read in the data, drop first and last two rows (N/A due to smoothing)
-ts_norm = pd.read_csv(ts_dir).dropna()
+if use_unsmoothed:
+    # Normalize the unsmoothed time series the same way as the smoothed one, (x - min) / (max - min). Position 0 is 1950
+    ts_norm = pd.read_csv(ts_unsmoothed_dir)
+    ts_norm = (ts_norm - ts_norm.min())/(ts_norm.max() - ts_norm.min())
+    cpt_table_name = cpt_table_unsmoothed_name
+else:
+    # Read in the data, drop first and last two rows (N/A due to smoothing)
+    ts_norm = pd.read_csv(ts_dir).dropna()
 # Drop the 'Year column'
 ts_norm = ts_norm.drop('Year', axis=1)
 
@@ -41,6 +70,14 @@ Parameter spaces for changepoint detection
 to_analyze = list(ts_norm.columns) + ['Multivariate']
 # Cost functions
 cost_functions = ["l1", "l2"]
+# Kernel (RBF) costs: values of gamma ('median' for the median heuristic), and the targets they are used for. The
+# kernel cost picks up changes in the joint distribution of the features, not just their means. It is not part of the
+# published analysis, so it is off by default; e.g. kernel_gammas = ['median', 1.0] turns it on
+kernel_gammas = []
+kernel_targets = ['Multivariate']
+# Autoregressive costs: AR orders. These are run with PELT and bottom-up only (the window method would need windows of
+# at least max(5, order + 1) years on either side). Off by default; e.g. ar_orders = [1, 2] turns them on
+ar_orders = []
 # Minimum space between changepoints
 minimum_gaps = [5, 6, 7, 8, 9, 10]
 # Number of changepoints
@@ -49,94 +86,112 @@ num_cpts_vals = [False, 1, 2, 3, 4]
 window_sizes = [4, 6, 8, 10, 12, 14]
 # Penalties
 pen_values = list(np.linspace(0.2, 2, 5))
+# Permutation tests: number of surrogate series, and block size (the 2-back/2-forward smoothing correlates
+# neighbouring years, so blocks of 5 years are shuffled rather than single years)
+num_permutations = 5000
+permutation_block_size = 5
 
 """
 ANALYSIS
 """
 
 """
-Traverse through the parameter space and get the changepoints from each method
+List every combination of feature and parameters in the parameter space. Each combination is stored as
+(feature, method, cost function, number of changepoints, minimum gap, penalty, window size), the key of the result store.
 """
 
-all_info = []
+n = len(ts_norm)
+combos = []
+for var in to_analyze:
+    var_costs = cost_functions
+    if var in kernel_targets:
+        var_costs = cost_functions + [kernel_cost_name(g) for g in kernel_gammas]
+    var_costs = var_costs + [ar_cost_name(order) for order in ar_orders]
+    for cost in var_costs:
+        for gap in minimum_gaps:
+            # PELT method: iterate through different penalty values
+            for pen in pen_values:
+                combos.append((var, 'PELT', cost, 'N/A', gap, pen, 'N/A'))
+            # Bottom-up method: iterate through different numbers of changepoints {NULL, 1, 2, 3, 4}
+            for num in num_cpts_vals:
+                combos.append((var, 'Bottom-up', cost, num, gap, 'N/A', 'N/A'))
+        if ar_order(cost) is not None:
+            continue
+        # Window method: iterate through window sizes {4, 6, 8, 10, 14} and numbers of changepoints {NULL, 1, 2, 3, 4}
+        for win in window_sizes:
+            for num in num_cpts_vals:
+                combos.append((var, 'Window', cost, num, 'N/A', np.log(n), win))
 
 """
-For each feature to analyze
+detect_changepoints() runs one changepoint method with one parameter combination and returns the changepoints.
+Kernel costs share one cached Gram matrix per (target, gamma) across all runs (see kernel_cost.py), and window runs
+with the l2 cost share one score surface per target (see window_discrepancy.py). AR costs answer segment queries from
+prefix sums of lagged cross-products (see ar_cost.py).
 """
-for var in to_analyze:
+def detect_changepoints(data, method, cost, num, gap, pen, win):
+    # Window method with the l2 cost: pick the peaks from the precomputed (width x position) score surface
+    if method == 'Window' and cost == 'l2':
+        if num:
+            return window_changepoints(data, win, n_bkps=num)
+        return window_changepoints(data, win, pen=np.log(len(data)))
+
+    if ar_order(cost) is not None:
+        cost_args = {'custom_cost': CostCachedAR(ar_order(cost))}
+    else:
+        cost_args = cost_arguments(cost)
+    if method == 'PELT':
+        algo = rpt.Pelt(min_size=gap, **cost_args).fit(data)
+        return algo.predict(pen=pen)
+
+    if method == 'Bottom-up':
+        algo = rpt.BottomUp(min_size=gap, **cost_args).fit(data)
+    else:
+        algo = rpt.Window(width=win, **cost_args).fit(data)
+    # If we know the number of breakpoints
+    if num:
+        return algo.predict(n_bkps=num)
+    # If we don't specify a number of changepoints, we need to modify the penalty
+    return algo.predict(pen=np.log(len(data)))
+
+"""
+Only the combinations that are not in the result store yet (for this exact time series) are computed
+"""
+
+store = open_store(store_name)
+ts_hash = series_hash(ts_norm)
+to_compute = missing_runs(store, ts_hash, combos)
+print("Computing", len(to_compute), "of", len(combos), "parameter combinations")
+
+all_info = []
+for combo in to_compute:
+    var = combo[0]
     # Get the correct feature data
-    data = 0
     if var == 'Multivariate':
         # ndarray with all features
         data = np.array(ts_norm)
     else:
         data = np.array(ts_norm[var])
 
-    """
-    For each cost function {"l1", "l2"}
-    """
-    for cost in cost_functions:
-        model = cost
-
-        """
-        For each changepoint gap {5, 6, 7, 8, 9, 10}
-        """
-        for gap in minimum_gaps:
-            """
-            PELT method: iterate through different penalty values
-            """
-            for pen in pen_values:
-                algo = rpt.Pelt(model=model, min_size=gap).fit(data)
-                cpts = algo.predict(pen=pen)
-                # Store information: feature, method, cost function, number of cpts, minimum gap, penalty, window size, cpt value
-                for cpt in cpts:
-                    all_info.append([var, 'PELT', cost, 'N/A', gap, pen, 'N/A', cpt])
-
-            """
-            Bottom-up method: iterate through different numbers of changepoints {NULL, 1, 2, 3, 4}
-            """
-            for num in num_cpts_vals:
-                algo = rpt.BottomUp(model=model, min_size=gap).fit(data)
-                cpts = 0
-                # If we know the number of breakpoints
-                if num:
-                    cpts = algo.predict(n_bkps=num)
-
-                # If we don't specify a number of changepoints, we need to modify the penalty
-                else:
-                    n = len(data)
-                    cpts = algo.predict(pen=np.log(n))
-
-                # Store information
-                for cpt in cpts:
-                    all_info.append([var, 'Bottom-up', cost, num, gap, 'N/A', 'N/A', cpt])
-        """
-        Window method: iterate through window sizes {4, 6, 8, 10, 14} and numbers of changepoints {NULL, 1, 2, 3, 4}
-        """
-        for win in window_sizes:
-            for num in num_cpts_vals:
-                algo = rpt.Window(width=win, model=model).fit(data)
-                cpts = 0
-
-                # If we know the number of breakpoints
-                if num:
-                    cpts = algo.predict(n_bkps=num)
-
-                # If we don't specify a number of changepoints, we need to modify the penalty
-                else:
-                    n = len(data)
-                    cpts = algo.predict(pen=np.log(n))
+    cpts = detect_changepoints(data, *combo[1:])
+    # Store information: feature, method, cost function, number of cpts, minimum gap, penalty, window size, cpt value
+    for cpt in cpts:
+        all_info.append(list(combo) + [cpt])
 
-                # Store information
-                for cpt in cpts:
-                    all_info.append([var, 'Window', cost, num, 'N/A', np.log(n), win, cpt])
+"""
+Compile the new results into a DataFrame
+"""
+new_df = pd.DataFrame(all_info, columns = ['Feature', 'Method', 'Cost Function', 'Number of Changepoints', 'Minimum Gap Between Changepoints', 'Penalty', 'Window Size', 'Position'])
 
 """
-Compile data into a DataFrame
+Permutation p-value for every changepoint (the final position of each segmentation is the end of the series and gets N/A)
 """
-info_df = pd.DataFrame(all_info, columns = ['Feature', 'Method', 'Cost Function', 'Number of Changepoints', 'Minimum Gap Between Changepoints', 'Penalty', 'Window Size', 'Position'])
+if len(new_df) > 0:
+    new_df = add_p_values(new_df, ts_norm, n_perm=num_permutations, block_size=permutation_block_size)
+add_runs(store, ts_hash, new_df)
 
 """
-Save table
+Save the table of the current parameter space for this time series (for tally_changepoints.py)
 """
+info_df = select_runs(store, ts_hash, combos)
 info_df.to_csv(cpt_table_name, index=False)
+store.close()
@@ -0,0 +1,83 @@
+# Imports
+import numpy as np
+import pandas as pd
+import os
+from changepoint_tally import tally_matrix, tally_years
+from changepoint_cooccurrence import revolution_analysis
+
+"""
+revolution_analysis.py looks for "revolutions", years where many features change together, using the complete tables of
+changepoints from the sweep (all methods and parameter settings) rather than judging the per-feature tallies by eye.
+See changepoint_cooccurrence.py for the co-occurrence tensor, the revolution score and the circular-shift permutation
+null.
+
+Inputs
+        - directory of the changepoints from the R method (top-down)
+        - directory of the changepoints from the Python methods (window-sliding, bottom-up, PELT)
+Outputs
+        - .csv with the revolution score and p-values of every year
+        - .csv with the co-occurrence of every pair of features in every year
+
+You need to specify the root directory.
+"""
+
+"""
+DIRECTORIES
+"""
+# SPECIFY BASE DIRECTORY
+base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
+
+# R changepoints
+r_changepoints_table_name = os.path.join(base_dir, "output_data/changepoints/r_changepoints.csv")
+# Python changepoints
+python_changepoints_table_name = os.path.join(base_dir, "output_data/changepoints/python_changepoints.csv")
+# Output .csv's
+revolution_csv_name = os.path.join(base_dir, "output_data/changepoints/revolution_scores.csv")
+cooccurrence_csv_name = os.path.join(base_dir, "output_data/changepoints/changepoint_cooccurrence.csv")
+
+"""
+PARAMETERS
+"""
+# Length of the time series the changepoints were detected on; year = year_origin + position
+n_positions = 69
+year_origin = 1951
+# Changepoints within this many years of each other count as co-occurring
+tolerance = 1
+# Number of circular-shift permutations
+num_permutations = 10000
+# Targets that are not individual features
+exclude = ['Multivariate']
+
+"""
+DATA PREPARATION
+"""
+# Only the feature and position of each changepoint are needed
+r_changept_df = pd.read_csv(r_changepoints_table_name, usecols=['feature', 'pos'])
+python_changept_df = pd.read_csv(python_changepoints_table_name, usecols=['Feature', 'Position'])
+python_changept_df.columns = ['feature', 'pos']
+full_table = pd.concat([r_changept_df, python_changept_df], ignore_index=True)
+full_table = full_table[~full_table['feature'].isin(exclude)]
+
+"""
+ANALYSIS
+"""
+feature_names = list(full_table['feature'].unique())
+tallies = tally_matrix(full_table['feature'].to_numpy(), full_table['pos'].to_numpy(), feature_names, n_positions)
+years = tally_years(n_positions, year_origin)
+
+tensor, scores, p_values, p_values_max = revolution_analysis(tallies, tolerance, num_permutations)
+
+revolution_df = pd.DataFrame({'Year': years, 'Revolution Score': scores, 'p-value': p_values,
+                              'p-value (max over years)': p_values_max})
+revolution_df.to_csv(revolution_csv_name, index=False)
+
+# Long format: one row per pair of features and year
+first, second = np.triu_indices(len(feature_names), k=1)
+cooccurrence_df = pd.DataFrame({'Year': np.tile(years, len(first)),
+                                'Feature 1': np.repeat(np.array(feature_names)[first], len(years)),
+                                'Feature 2': np.repeat(np.array(feature_names)[second], len(years)),
+                                'Co-occurrence': tensor[first, second].ravel()})
+cooccurrence_df.to_csv(cooccurrence_csv_name, index=False)
+
+print("Years with significant revolution scores (max over years p < 0.05):",
+      list(revolution_df.loc[revolution_df['p-value (max over years)'] < 0.05, 'Year']))
@@ -1,20 +1,18 @@
 # Imports
 import pandas as pd
 import os
-import json
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.gridspec import GridSpec
 import seaborn as sns
 
 """
-visualize_changepoint_tallies.py produces Fig S1. in the supplementary materials. It requires the changepoint tally .csv
-produced by tally_changepoints.py, which give the changepoints for each feature found by changepoint detection and
-their tallies.
+visualize_changepoint_tallies.py produces Fig S1. in the supplementary materials. It requires the aggregated changepoint
+tally matrix produced by tally_changepoints.py, which gives the changepoint tally of every year for each feature.
 
 You need to specify the root directory.
 
-Input: changepoint tally .csv produced by tally_changepoints.py, which give the changepoints for each feature found by changepoint detection and their tallies.
+Input: (feature x year) changepoint tally matrix .csv produced by tally_changepoints.py
 Output: A .png with Figure S1.
 """
 
@@ -25,47 +23,17 @@ DIRECTORIES
 # SPECIFY ROOT DIRECTORY
 base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
 
-# Changepoint tally directory
-changepoint_tally_filename = os.path.join(base_dir, "output_data/changepoints/aggregated_changepoint_tallies.csv")
+# Changepoint tally matrix directory
+changepoint_tally_filename = os.path.join(base_dir, "output_data/changepoints/aggregated_changepoint_matrix.csv")
 
 # Output directory for visualization
 figure_filename = os.path.join(base_dir, "output_data/visualizations/aggregated_changepoint_tallies.png")
 
-"""
-HELPER FUNCTIONS
-"""
-
-"""
-get_full_tallies takes changepoint position + tally lists and adds in all possible positions, with corresponding tallies
-of 0.
-
-Example: position list [1977, 2000, 2010] with tally list [33, 48, 60]
---> [1952, 1953, ... 1977, 1978, ... 2000, ... 2010 ... 2019] with tally list [0, 0, ... 33, 0, ... 48, ..., 60, ... 0]
-
-Input: list of positions of the changepoints, in years, and its tally list of the same length, giving the tally of each
-       changepoint.
-Output: modified position and tally lists (see example)
-"""
-def get_full_tallies(positions, non_zero_tallies):
-
-    # Initialize dictionary of tallies: {1952: 0, 1953: 0, ... 2020: 0}
-    full_pos = list(range(1952, 2021))
-    tallies = [0]*69
-    tally_dict = dict(zip(full_pos, tallies))
-
-    # Iterate through the input positions list, updating the tally dictionary by filling in the non-zero tallies
-    for i in range(len(positions)):
-        tally_dict[positions[i]] = non_zero_tallies[i]
-
-    keys = list(tally_dict.keys())
-    values = list(tally_dict.values())
-    return keys, values
-
 """
 tally_visualization() produces Figure S1 and saves it as a .png
 
 Inputs:
-    - name of the file with the changepoint tallies
+    - name of the file with the changepoint tally matrix
     - desired directory of the visualization
     - changepoint tally threshold
 Outputs:
@@ -75,18 +43,9 @@ def tally_visualization(filename, viz_filename, thres):
 
     threshold = thres
 
-    # Read in changepoint tally DataFrame, get the full tallies for each feature
-    df = pd.read_csv(filename)
-
-    feat_list = list(df['Feature'])
-    tally_list = [0]*len(feat_list)
-    features = dict(zip(feat_list, tally_list))
-    for f in features.keys():
-        row = df.loc[df['Feature'] == f]
-        positions = json.loads(list(row['Positions'])[0])
-        tallies = json.loads(list(row['Tallies'])[0])
-        _, full_tallies = get_full_tallies(positions, tallies)
-        features[f] = full_tallies
+    # Read in the changepoint tally matrix: one row of tallies per feature, one column per year
+    df = pd.read_csv(filename, index_col='Feature')
+    features = {f: list(df.loc[f]) for f in df.index}
 
     # Matplotlib/sns settings
     plt.style.use('default')
@@ -99,7 +58,7 @@ def tally_visualization(filename, viz_filename, thres):
 
     # "years" will be the x axis for every subplot
     # "ys" are the y ticks we want
-    years = list(range(1952, 2021))
+    years = [int(y) for y in df.columns]
     ys = list(np.arange(0, 241, 40))
 
     # Initialize figure; grid with 3 rows 3 columns
@@ -0,0 +1,149 @@
+# Imports
+import hashlib
+import numpy as np
+from scipy.signal import argrelmax
+
+"""
+window_discrepancy.py contains a sliding-window discrepancy engine for the l2 cost. ruptures' Window method recomputes
+the left/right window costs at every position each time it is fitted, i.e. once per window size and number of
+changepoints in the sweep. Here the discrepancy curves of all window widths are computed at once from the cumulative
+sums of the signal, giving a (width x position) score surface. Picking the peaks for a window size and a number of
+changepoints (or a penalty) is then a cheap post-processing step over one row of the surface.
+
+The discrepancy at position k for window width w = 2h is
+
+    d(h, k) = c(k - h, k + h) - c(k - h, k) - c(k, k + h)
+
+where c(a, b) is the l2 cost (sum of squared deviations from the mean) of the signal on [a, b). The peak picking is the
+same as ruptures' Window (version 1.1): scores are only evaluated every 'jump' samples, peaks are local maxima over
+max(w, 2 * min_size) // (2 * jump) neighbours on either side (wrapping around), and peaks are added in order of
+decreasing score until the number of changepoints is reached or the gain in total cost falls below the penalty. The
+breakpoints are therefore the same as rpt.Window(width=w, model="l2") gives.
+"""
+
+# Cache of score surfaces, keyed by signal hash
+_surface_cache = {}
+
+"""
+cumulative_stats() computes the cumulative sums used by the l2 cost.
+
+Input: ndarray of shape (n_samples,) or (n_samples, n_features)
+Outputs:
+        - tuple (S1, S2) of arrays of shape (n_samples + 1, n_features), where row i sums the first i samples (and their
+          squares)
+"""
+def cumulative_stats(signal):
+    signal = np.asarray(signal, dtype=float).reshape(len(signal), -1)
+    zeros = np.zeros((1, signal.shape[1]))
+    return np.vstack([zeros, np.cumsum(signal, axis=0)]), np.vstack([zeros, np.cumsum(signal**2, axis=0)])
+
+"""
+l2_cost() computes the l2 cost of the segments [start, end), for arrays of starts and ends.
+"""
+def l2_cost(cum_stats, starts, ends):
+    cum_s1, cum_s2 = cum_stats
+    starts, ends = np.broadcast_arrays(np.asarray(starts), np.asarray(ends))
+    n = (ends - starts)[..., None]
+    s1 = cum_s1[ends] - cum_s1[starts]
+    s2 = cum_s2[ends] - cum_s2[starts]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        costs = np.where(n > 0, s2 - s1**2/n, 0)
+    # Rounding can make the cost of a constant segment slightly negative
+    return np.maximum(costs, 0).sum(axis=-1)
+
+"""
+discrepancy_surface() computes the discrepancy of every window width at every position.
+
+Inputs:
+        - ndarray of shape (n_samples,) or (n_samples, n_features)
+Outputs:
+        - cumulative statistics of the signal (for the penalty stopping rule of window_breakpoints())
+        - ndarray of shape (n_samples // 2, n_samples): row h - 1 holds the scores of the window of width 2h. Positions
+          where the window does not fit in the signal (k < h or k >= n_samples - h, as in ruptures) are N/A
+"""
+def discrepancy_surface(signal):
+    cum_stats = cumulative_stats(signal)
+    n_samples = len(cum_stats[0]) - 1
+    h = np.arange(1, n_samples//2 + 1)[:, None]
+    k = np.arange(n_samples)[None, :]
+    fits = (k >= h) & (k < n_samples - h)
+    # Clip the window ends so that every (h, k) cell can be evaluated; the cells that do not fit are masked afterwards
+    start = np.clip(k - h, 0, n_samples)
+    end = np.clip(k + h, 0, n_samples)
+    scores = l2_cost(cum_stats, start, end) - l2_cost(cum_stats, start, k) - l2_cost(cum_stats, k, end)
+    return cum_stats, np.where(fits, scores, np.nan)
+
+"""
+cached_surface() returns discrepancy_surface() of a signal, computed once per signal.
+"""
+def cached_surface(signal):
+    signal = np.ascontiguousarray(signal, dtype=float)
+    key = (hashlib.sha1(signal.tobytes()).hexdigest(), signal.shape)
+    if key not in _surface_cache:
+        _surface_cache[key] = discrepancy_surface(signal)
+    return _surface_cache[key]
+
+"""
+window_peaks() lists the candidate breakpoints of one window width, in the order they are added.
+
+Inputs:
+        - score surface from discrepancy_surface()
+        - window width (rounded down to an even number, as in ruptures)
+        - jump: scores are only evaluated every 'jump' samples
+        - minimum segment length
+Outputs:
+        - ndarray of candidate positions, by decreasing score (ties: later position first)
+"""
+def window_peaks(surface, width, jump=5, min_size=2):
+    half = width//2
+    n_samples = surface.shape[1]
+    inds = np.arange(n_samples, step=jump)
+    inds = inds[(inds >= half) & (inds < n_samples - half)]
+    if len(inds) == 0:
+        return inds
+    score = surface[half - 1, inds]
+
+    order = max(max(2*half, 2*min_size)//(2*jump), 1)
+    peaks = argrelmax(score, order=order, mode="wrap")[0]
+    # Sort by score, then position, and take them from the top
+    ranking = np.lexsort((inds[peaks], score[peaks]))[::-1]
+    return inds[peaks][ranking]
+
+"""
+window_breakpoints() picks the breakpoints of one window width from the score surface.
+
+Inputs:
+        - cumulative statistics and score surface from discrepancy_surface()
+        - window width
+        - number of changepoints, or
+        - penalty: candidates are added while the decrease in total cost is larger than the penalty
+        - jump and minimum segment length (see window_peaks())
+Outputs:
+        - list of breakpoints (ruptures-style: the last one is the number of samples)
+"""
+def window_breakpoints(cum_stats, surface, width, n_bkps=None, pen=None, jump=5, min_size=2):
+    if n_bkps is None and pen is None:
+        raise ValueError("Give a number of changepoints or a penalty")
+    n_samples = surface.shape[1]
+    bkps = [n_samples]
+    for bkp in window_peaks(surface, width, jump, min_size):
+        if n_bkps is not None:
+            if len(bkps) - 1 >= n_bkps:
+                break
+        else:
+            # The new breakpoint splits the segment [before, after) that contains it
+            after = min(b for b in bkps if b > bkp)
+            before = max([0] + [b for b in bkps if b < bkp])
+            gain = l2_cost(cum_stats, before, after) - l2_cost(cum_stats, before, bkp) - l2_cost(cum_stats, bkp, after)
+            if not gain > pen:
+                break
+        bkps = sorted(bkps + [int(bkp)])
+    return bkps
+
+"""
+window_changepoints() is the equivalent of rpt.Window(width=width, model="l2").fit(signal).predict(...). The score
+surface is shared by all calls on the same signal.
+"""
+def window_changepoints(signal, width, n_bkps=None, pen=None, jump=5, min_size=2):
+    cum_stats, surface = cached_surface(signal)
+    return window_breakpoints(cum_stats, surface, width, n_bkps, pen, jump, min_size)
@@ -0,0 +1,110 @@
+# Imports
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+"""
+batched_autoregression.py contains a batched least-squares engine for the autoregressions of
+autoregression_residuals.py. Instead of fitting a statsmodels AutoReg model for every feature and lag (and refitting
+the best lag to get its residuals), the lag design matrices of all features are built from sliding-window views of the
+era, and the least-squares problems of every (feature, lag) pair are solved together in one stacked pseudo-inverse.
+
+To stack problems with different lags, every design matrix is padded to max_lag + 1 columns and n - 1 rows with zeros.
+Zero rows do not change a least-squares fit, and the coefficient of a zero column is 0 in the minimum-norm solution, so
+each fit is the same as AutoReg(series, lags=lag) (constant + lags 1 ... lag, fitted on observations lag ... n - 1).
+"""
+
+"""
+ar_design() builds the padded design matrices and targets of all (feature, lag) problems.
+
+Inputs:
+        - ndarray of shape (n, features) with the era's time series
+        - maximum lag
+Outputs:
+        - ndarray of shape (features, max_lag, n - 1, max_lag + 1): column 0 is the constant, column j is lag j
+        - ndarray of shape (features, max_lag, n - 1) with the targets
+        - boolean ndarray of shape (max_lag, n - 1): which rows are observations (not padding) for each lag
+"""
+def ar_design(values, max_lag):
+    n, n_feats = values.shape
+    X = np.zeros((n_feats, max_lag, n - 1, max_lag + 1))
+    y = np.zeros((n_feats, max_lag, n - 1))
+    rows = np.zeros((max_lag, n - 1), dtype=bool)
+    for l in range(1, max_lag + 1):
+        # Observations t = l ... n - 1 go in the last n - l rows; lagged[s, f, :] = values[s:s + l + 1, f]
+        lagged = sliding_window_view(values, l + 1, axis=0)
+        X[:, l-1, l-1:, 0] = 1
+        # Column j holds y_{t-j}: the window [y_{t-l}, ..., y_t] read backwards, without y_t
+        X[:, l-1, l-1:, 1:l+1] = lagged[:, :, -2::-1].transpose(1, 0, 2)
+        y[:, l-1, l-1:] = lagged[:, :, -1].T
+        rows[l-1, l-1:] = True
+    return X, y, rows
+
+"""
+ar_fits() fits the autoregressions of every feature at every lag 1 ... max_lag.
+
+Inputs:
+        - ndarray of shape (n, features) with the era's time series
+        - maximum lag
+Outputs:
+        - ndarray of shape (features, max_lag, max_lag + 1) with the coefficients (constant first; 0 beyond the lag)
+        - ndarray of shape (features, max_lag, n) with the fitted values (N/A for the first 'lag' observations)
+        - ndarray of shape (features, max_lag, n) with the residuals (N/A for the first 'lag' observations)
+"""
+def ar_fits(values, max_lag):
+    values = np.asarray(values, dtype=float)
+    n, n_feats = values.shape
+    X, y, rows = ar_design(values, max_lag)
+    # One stacked minimum-norm least-squares solve for all (feature, lag) problems
+    coefs = (np.linalg.pinv(X) @ y[..., None])[..., 0]
+
+    fitted = np.full((n_feats, max_lag, n), np.nan)
+    fitted[..., 1:] = np.where(rows, (X @ coefs[..., None])[..., 0], np.nan)
+    residuals = values.T[:, None, :] - fitted
+    return coefs, fitted, residuals
+
+"""
+table_2_nrmse() computes the nRMSE of every (feature, lag) fit in the same way as the original AutoReg-based
+autoregression_residuals.py, so that Table 2 is reproduced exactly. There, the fitted values were prefixed with the
+first lag + 1 observations and compared with the series by nrmse_range() (which skips the first value). The model value
+compared with observation i is therefore observation i for i <= lag, and the fitted value of observation i - 1 after
+that.
+
+Inputs:
+        - ndarray of shape (n, features) with the era's time series
+        - fitted values from ar_fits()
+Outputs:
+        - ndarray of shape (features, max_lag) with the nRMSEs (not rounded)
+"""
+def table_2_nrmse(values, fitted):
+    values = np.asarray(values, dtype=float)
+    n, n_feats = values.shape
+    max_lag = fitted.shape[1]
+    series = values.T[:, None, :]
+    lags = np.arange(1, max_lag + 1)[:, None]
+    i = np.arange(1, n)[None, :]
+
+    # Model values for observations 1 ... n - 1
+    shifted = np.concatenate([np.full((n_feats, max_lag, 1), np.nan), fitted[..., :-1]], axis=-1)
+    model = np.where(i <= lags, series[..., 1:], shifted[..., 1:])
+    rmse = np.sqrt(((series[..., 1:] - model)**2).mean(axis=-1))
+    return rmse/(values.max(axis=0) - values.min(axis=0))[:, None]
+
+"""
+ar_lag_search() chooses the lag of each feature with the lowest (rounded) nRMSE, and keeps the residuals of that fit.
+
+Inputs:
+        - ndarray of shape (n, features) with the era's time series
+        - maximum lag
+        - number of decimals the nRMSEs are rounded to before comparing them (the first lowest lag wins ties)
+Outputs:
+        - ndarray of shape (features,) with the best lags
+        - ndarray of shape (features,) with the rounded nRMSEs of the best lags
+        - ndarray of shape (n, features) with the residuals of the best fits (N/A for the first 'lag' observations)
+"""
+def ar_lag_search(values, max_lag, decimals=2):
+    _, fitted, residuals = ar_fits(values, max_lag)
+    # Python's round() (not np.round) so that values on a rounding boundary go the same way as before
+    nrmses = np.array([[round(x, decimals) for x in row] for row in table_2_nrmse(values, fitted)])
+    best = np.argmin(nrmses, axis=1)
+    features = np.arange(len(best))
+    return best + 1, nrmses[features, best], residuals[features, best].T
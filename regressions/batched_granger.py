@@ -0,0 +1,90 @@
+# Imports
+import numpy as np
+import pandas as pd
+import scipy.stats
+
+"""
+batched_granger.py contains a batched engine for the Granger causality tests of vector_autoregression.py. Instead of
+calling statsmodels' grangercausalitytests() for every ordered pair of variables (which refits both models for every
+lag), the lag block of each variable is built once per lag, and the residual sums of squares of all pairs are computed
+together:
+
+        - restricted model of response r (constant + lags 1 ... p of r): one QR decomposition per response
+        - unrestricted model (+ lags 1 ... p of predictor c): the predictor's lag block is projected off the restricted
+          model, and the drop in the residual sum of squares is the squared norm of the projection of the restricted
+          residuals onto it (one batched least-squares solve for all pairs)
+
+The test statistic is the same as statsmodels' 'ssr_chi2test': nobs * (RSS_r - RSS_u) / RSS_u ~ chi2(p), where the
+models of lag p are fitted on observations p ... n - 1. A variable cannot Granger-cause itself, so the diagonal is set to
+a statistic of 0 (p-value 1), which is what statsmodels returns up to rounding.
+"""
+
+"""
+lag_blocks() builds the lag block of every variable for one lag.
+
+Inputs:
+        - ndarray of shape (n, variables)
+        - lag p
+Outputs:
+        - ndarray of shape (variables, n - p, p): column j is lag j + 1 of the variable, for observations p ... n - 1
+        - ndarray of shape (variables, n - p) with the observations p ... n - 1 (the targets)
+"""
+def lag_blocks(values, lag):
+    n = values.shape[0]
+    blocks = np.stack([values[lag - j:n - j] for j in range(1, lag + 1)], axis=-1)
+    return blocks.transpose(1, 0, 2), values[lag:].T
+
+"""
+granger_statistics() computes the Granger causality chi2 statistics and p-values of all ordered pairs of variables.
+
+Inputs:
+        - ndarray of shape (n, variables)
+        - maximum lag
+Outputs:
+        - ndarray of shape (max_lag, responses, predictors) with the chi2 statistics of lags 1 ... max_lag
+        - ndarray of shape (max_lag, responses, predictors) with the p-values
+"""
+def granger_statistics(values, max_lag):
+    values = np.asarray(values, dtype=float)
+    n, n_vars = values.shape
+    stats = np.zeros((max_lag, n_vars, n_vars))
+    for lag in range(1, max_lag + 1):
+        blocks, y = lag_blocks(values, lag)
+        nobs = n - lag
+
+        # Restricted models: own lags + constant, one QR per response
+        own = np.concatenate([blocks, np.ones((n_vars, nobs, 1))], axis=-1)
+        q, _ = np.linalg.qr(own)
+        resid = y - (q @ (q.transpose(0, 2, 1) @ y[..., None]))[..., 0]
+        rss_r = (resid**2).sum(axis=-1)
+
+        # Predictor lag blocks with the restricted model of each response projected out: (responses, predictors, nobs, p)
+        z = blocks[None] - q[:, None] @ (q.transpose(0, 2, 1)[:, None] @ blocks[None])
+        # Projection of the restricted residuals onto them
+        coefs = np.linalg.pinv(z) @ resid[:, None, :, None]
+        gain = ((z @ coefs)[..., 0]**2).sum(axis=-1)
+        rss_u = rss_r[:, None] - gain
+
+        stat = nobs*(rss_r[:, None] - rss_u)/rss_u
+        np.fill_diagonal(stat, 0)
+        stats[lag-1] = stat
+    p_values = scipy.stats.chi2.sf(stats, np.arange(1, max_lag + 1)[:, None, None])
+    return stats, p_values
+
+"""
+granger_matrix() gives the Granger causality matrix of vector_autoregression.py: for every response (row) and predictor
+(column), the lowest p-value over lags 1 ... max_lag, after rounding.
+
+Inputs:
+        - DataFrame of time series
+        - list of the variables to test
+        - maximum lag
+        - number of decimals the p-values are rounded to
+Outputs:
+        - DataFrame with rows '<variable>_y' (responses) and columns '<variable>_x' (predictors)
+"""
+def granger_matrix(data, variables, max_lag=3, decimals=4):
+    variables = list(variables)
+    _, p_values = granger_statistics(data[variables].to_numpy(), max_lag)
+    min_p = np.round(p_values, decimals).min(axis=0)
+    return pd.DataFrame(min_p, columns=[var + '_x' for var in variables], index=[var + '_y' for var in variables])
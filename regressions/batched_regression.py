@@ -0,0 +1,94 @@
+# Imports
+import numpy as np
+import scipy.stats
+from statsmodels.stats.multitest import multipletests
+
+"""
+batched_regression.py contains a closed-form engine for the univariate regressions of residual_reg.py. Instead of
+fitting an OLS model for every (dependent, independent) pair, the slope, intercept, t-statistic, p-value and R^2 of all
+pairs of an era come from a few matrix products of centred cross-products:
+
+    slope = Sxy / Sxx,   intercept = mean(y) - slope * mean(x),   R^2 = Sxy^2 / (Sxx * Syy)
+    t = slope / sqrt(SSE / ((n - 2) * Sxx)),   SSE = Syy * (1 - R^2)
+
+where Sxx, Syy and Sxy are the centred sums of squares and cross-products. Each dependent (an autoregression residual)
+has its own rows, as the first 'lag' residuals are N/A; masked sums give every dependent's statistics at once. The work
+is a handful of (features x observations) @ (observations x features) products, so hundreds of features are no problem.
+
+The p-values can be adjusted for the number of regressions (Benjamini-Hochberg false discovery rate, or Holm's
+family-wise error rate).
+"""
+
+"""
+pairwise_regressions() regresses every dependent on every independent, each with an intercept.
+
+Inputs:
+        - ndarray of shape (n, dependents) with the dependents; rows with N/A are left out of that dependent's
+          regressions
+        - ndarray of shape (n, independents) with the independents (no N/A)
+Outputs:
+        - dictionary of ndarrays of shape (dependents, independents): 'slope', 'intercept', 't', 'p-value', 'R^2',
+          'n' (number of observations)
+"""
+def pairwise_regressions(y, x):
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    # Centring the independents first does not change any statistic, but keeps the sums well-conditioned
+    x_mean = x.mean(axis=0)
+    x = x - x_mean
+
+    mask = ~np.isnan(y)
+    m = mask.astype(float).T
+    y0 = np.where(mask, y, 0).T
+
+    # Raw sums over each dependent's rows: dependents in rows, independents in columns
+    n = m.sum(axis=1)[:, None]
+    sx = m @ x
+    sxx = m @ x**2
+    sy = y0.sum(axis=1)[:, None]
+    syy = (y0**2).sum(axis=1)[:, None]
+    sxy = y0 @ x
+
+    stats = regression_from_sums(n, sx, sxx, sy, syy, sxy)
+    stats['intercept'] = stats['intercept'] - stats['slope']*x_mean
+    return stats
+
+"""
+regression_from_sums() computes the statistics of simple regressions (with an intercept) from their sums. All inputs
+must broadcast together.
+
+Inputs:
+        - number of observations, and the sums of x, x^2, y, y^2 and x*y
+Outputs:
+        - dictionary of ndarrays: 'slope', 'intercept', 't', 'p-value', 'R^2', 'n'
+"""
+def regression_from_sums(n, sx, sxx, sy, syy, sxy):
+    # Centred cross-products
+    cxx = sxx - sx**2/n
+    cyy = syy - sy**2/n
+    cxy = sxy - sx*sy/n
+
+    slope = cxy/cxx
+    intercept = sy/n - slope*sx/n
+    r_squared = cxy**2/(cxx*cyy)
+    df = n - 2
+    sse = np.maximum(cyy*(1 - r_squared), 0)
+    with np.errstate(divide='ignore'):
+        t = slope/np.sqrt(sse/(df*cxx))
+    p_values = 2*scipy.stats.t.sf(np.abs(t), df)
+    return {'slope': slope, 'intercept': intercept, 't': t, 'p-value': p_values, 'R^2': r_squared,
+            'n': np.broadcast_to(n, slope.shape)}
+
+"""
+adjust_p_values() adjusts a set of p-values for multiple comparisons.
+
+Inputs:
+        - array of p-values (any shape)
+        - method: 'bh' (Benjamini-Hochberg) or 'holm'
+Output: ndarray of adjusted p-values, same shape
+"""
+def adjust_p_values(p_values, method='bh'):
+    methods = {'bh': 'fdr_bh', 'holm': 'holm'}
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = multipletests(p_values.ravel(), method=methods[method])[1]
+    return adjusted.reshape(p_values.shape)
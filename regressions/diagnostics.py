@@ -0,0 +1,164 @@
+# Imports
+from var_order_selection import series_hash
+from statsmodels.tsa.stattools import adfuller, kpss
+from statsmodels.stats.diagnostic import acorr_ljungbox
+from statsmodels.stats.stattools import jarque_bera
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import warnings
+import os
+
+"""
+diagnostics.py runs a battery of time series diagnostics on many series at once, so the AR and VAR fits can be checked
+automatically:
+
+        - ADF (augmented Dickey-Fuller, lag by AIC): null of a unit root, i.e. rejecting it supports stationarity
+        - KPSS (level): null of stationarity
+        - Ljung-Box: null of no autocorrelation (up to min(10, n/5) lags by default)
+        - Jarque-Bera: null of normality
+
+Each test is a short statsmodels call, but there are hundreds of them (features x eras x variants of the series), so the
+series are spread over a process pool. The results of each series are cached on disk, keyed by a hash of the series and
+the settings, so only new or changed series are tested again.
+
+The results are returned as one tidy table, one row per series and test. A test "fails" (the 'Violation' column) when
+it contradicts what a valid fit needs: ADF does not reject a unit root, or KPSS, Ljung-Box or Jarque-Bera reject their
+null (p-values below alpha).
+"""
+
+# Tests of the battery, in the order of the results arrays
+test_names = ['ADF', 'KPSS', 'Ljung-Box', 'Jarque-Bera']
+
+"""
+series_diagnostics() runs the battery on one series. Missing values (e.g. the first autoregression residuals) are
+dropped. A test that cannot be computed (e.g. a series too short for the ADF regression) is N/A.
+
+Inputs:
+        - 1D ndarray
+        - number of Ljung-Box lags (None for min(10, n/5))
+Outputs:
+        - ndarray of shape (2, tests): the statistics and the p-values
+"""
+def series_diagnostics(x, lb_lags=None):
+    x = np.asarray(x, dtype=float)
+    x = x[~np.isnan(x)]
+    if lb_lags is None:
+        lb_lags = max(1, min(10, len(x)//5))
+    results = np.full((2, len(test_names)), np.nan)
+
+    # KPSS warns when the statistic is outside its p-value table, and statsmodels about its return types
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        try:
+            results[:, 0] = adfuller(x, autolag='AIC')[:2]
+        except (ValueError, np.linalg.LinAlgError):
+            pass
+        try:
+            results[:, 1] = kpss(x, regression='c', nlags='auto')[:2]
+        except (ValueError, np.linalg.LinAlgError):
+            pass
+        lb = acorr_ljungbox(x, lags=[lb_lags])
+        results[:, 2] = lb['lb_stat'].iloc[0], lb['lb_pvalue'].iloc[0]
+        results[:, 3] = jarque_bera(x)[:2]
+    return results
+
+"""
+run_diagnostics() runs the battery on many series, in a process pool, with an optional disk cache.
+
+When the pool is used (n_jobs other than 1), the calling script must create it under an
+if __name__ == "__main__": guard, because the worker processes import the script on macOS and Windows.
+
+Inputs:
+        - list of 1D ndarrays
+        - number of worker processes (None for one per CPU, 1 to run in this process)
+        - directory of the cache (None for no cache)
+        - number of Ljung-Box lags (None for min(10, n/5))
+Outputs:
+        - ndarray of shape (series, 2, tests), see series_diagnostics()
+"""
+def run_diagnostics(series, n_jobs=None, cache_dir=None, lb_lags=None):
+    results = np.full((len(series), 2, len(test_names)), np.nan)
+    cache_filenames = [None]*len(series)
+    todo = []
+    for i in range(len(series)):
+        if cache_dir is not None:
+            cache_filenames[i] = os.path.join(cache_dir, "diagnostics_" + series_hash(series[i], lb_lags) + ".npz")
+            if os.path.exists(cache_filenames[i]):
+                with np.load(cache_filenames[i]) as cached:
+                    results[i] = cached['results']
+                continue
+        todo.append(i)
+
+    if n_jobs == 1 or len(todo) < 2:
+        new_results = [series_diagnostics(series[i], lb_lags) for i in todo]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            new_results = list(executor.map(series_diagnostics, [series[i] for i in todo], [lb_lags]*len(todo),
+                                            chunksize=max(1, len(todo)//(4*(n_jobs or os.cpu_count() or 1)))))
+
+    if cache_dir is not None and todo:
+        os.makedirs(cache_dir, exist_ok=True)
+    for i, result in zip(todo, new_results):
+        results[i] = result
+        if cache_dir is not None:
+            np.savez(cache_filenames[i], results=result)
+    return results
+
+"""
+era_series() collects the series of every feature of every era, with their labels.
+
+Inputs:
+        - list of DataFrames, one per era (one column per feature)
+        - name of the variant of the series (e.g. 'smoothed', 'AR residual')
+Outputs:
+        - list of dictionaries with the 'Variant', 'Era' and 'Feature' of each series
+        - list of 1D ndarrays
+"""
+def era_series(eras, variant):
+    labels, series = [], []
+    for i in range(len(eras)):
+        for feature in eras[i].columns:
+            labels.append({'Variant': variant, 'Era': i+1, 'Feature': feature})
+            series.append(eras[i][feature].to_numpy(dtype=float))
+    return labels, series
+
+"""
+diagnostic_table() runs the battery on labelled series and returns the tidy table.
+
+Inputs:
+        - list of dictionaries with the labels of each series (see era_series())
+        - list of 1D ndarrays
+        - significance level
+        - number of worker processes, cache directory and number of Ljung-Box lags (see run_diagnostics())
+Outputs:
+        - DataFrame with the labels, 'n' (observations without N/A), 'Test', 'Statistic', 'p-value' and 'Violation'
+"""
+def diagnostic_table(labels, series, alpha=0.05, n_jobs=None, cache_dir=None, lb_lags=None):
+    results = run_diagnostics(series, n_jobs, cache_dir, lb_lags)
+    rows = []
+    for i in range(len(series)):
+        n = int((~np.isnan(np.asarray(series[i], dtype=float))).sum())
+        for j in range(len(test_names)):
+            statistic, p_value = results[i, :, j]
+            # ADF has a unit root as its null, the other tests the property a valid fit needs
+            violation = p_value >= alpha if test_names[j] == 'ADF' else p_value < alpha
+            rows.append(dict(labels[i], **{'n': n, 'Test': test_names[j], 'Statistic': statistic,
+                                           'p-value': p_value, 'Violation': bool(violation)}))
+    return pd.DataFrame(rows)
+
+"""
+flagged_fits() lists the series that fail any of the given tests.
+
+Inputs:
+        - DataFrame from diagnostic_table()
+        - list of the tests to check (None for all)
+Outputs:
+        - DataFrame with the labels of the flagged series and 'Violations' (the names of the failed tests)
+"""
+def flagged_fits(table, tests=None):
+    if tests is not None:
+        table = table[table['Test'].isin(tests)]
+    label_columns = [c for c in table.columns if c not in ['n', 'Test', 'Statistic', 'p-value', 'Violation']]
+    failed = table[table['Violation']]
+    return failed.groupby(label_columns, sort=False)['Test'].agg(', '.join).reset_index(name='Violations')
@@ -0,0 +1,75 @@
+# Imports
+import numpy as np
+import pandas as pd
+
+"""
+era_segmentation.py divides the time series into eras. Instead of hard-coding the eras, the era boundaries are read from
+the output of the changepoint analysis: era_boundaries.csv, which tally_changepoints.py writes with the "true"
+changepoints of the Multivariate time series. Each true changepoint is the first year of a new era.
+
+With the published changepoints (1975 and 2000), the eras are 1950 - 1974, 1975 - 1999 and 2000 - 2022, which are rows
+[0:25], [25:50] and [50:] of the time series. If the changepoint results change, every script that uses this module
+picks up the new eras.
+
+The segmented time series are views of one array (rows with missing values, which only occur at the ends of the series
+because of the smoothing, are dropped first), so no era is copied.
+"""
+
+"""
+era_boundaries() reads the first years of the new eras.
+
+Inputs:
+        - filename of era_boundaries.csv
+Outputs:
+        - sorted list of years
+"""
+def era_boundaries(boundaries_filename):
+    return sorted(int(year) for year in pd.read_csv(boundaries_filename)['Year'])
+
+"""
+segment_eras() divides a time series DataFrame into eras.
+
+Inputs:
+        - DataFrame with a 'Year' column and one column per feature
+        - list of the first years of the new eras
+Outputs:
+        - list of DataFrames, one per era, without the 'Year' column and without missing values, indexed from 0. Each is
+          a view of the same array
+        - list of (first year, last year) of each era, over the years of the DataFrame (including years with missing
+          values)
+"""
+def segment_eras(ts_df, boundaries):
+    years = ts_df['Year'].to_numpy()
+    features = [c for c in ts_df.columns if c != 'Year']
+    complete = ts_df[features].notna().all(axis=1).to_numpy()
+    values = np.ascontiguousarray(ts_df.loc[complete, features].to_numpy(dtype=float))
+    complete_years = years[complete]
+
+    edges = [years[0]] + list(boundaries) + [years[-1] + 1]
+    eras, ranges = [], []
+    for start_year, end_year in zip(edges[:-1], edges[1:]):
+        # The complete rows are contiguous, so each era is a slice (a view) of the array
+        start, stop = np.searchsorted(complete_years, [start_year, end_year])
+        eras.append(pd.DataFrame(values[start:stop], columns=features, copy=False))
+        ranges.append((int(start_year), int(end_year) - 1))
+    return eras, ranges
+
+"""
+load_eras() reads a time series .csv and divides it into the eras found by the changepoint analysis.
+
+Inputs:
+        - filename of the time series .csv
+        - filename of era_boundaries.csv
+Outputs:
+        - list of DataFrames, one per era (see segment_eras())
+        - list of (first year, last year) of each era
+"""
+def load_eras(ts_filename, boundaries_filename):
+    return segment_eras(pd.read_csv(ts_filename), era_boundaries(boundaries_filename))
+
+"""
+era_max_lag() gives the maximum autoregressive lag of an era: one lag per five observations, to encourage parsimony
+(5, 5 and 4 for the published eras).
+"""
+def era_max_lag(era):
+    return max(1, round(len(era)/5))
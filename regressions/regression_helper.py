@@ -1,5 +1,6 @@
 import numpy as np
 import pandas as pd
+from var_coefficients import var_fitted_values
 
 """
 regression_helper.py contains helper functions for the autoregressions, regressions, and vector autoregressions.
@@ -52,72 +53,19 @@ the error between the model values and the actual feature values (nMRSE).
 
 Again, statsmodels probably has a function that gives back the fitted values. I wanted to compute them manually
 to study them (which didn't end up producing any meaningful insights because VAR coefficients are difficult to interpret).
+The fitted values of all equations are computed at once from a coefficient tensor (see var_fitted_values() in
+var_coefficients.py).
 
 Inputs:
         - a DataFrame with the original (normalized) time series
         - a DataFrame with VAR model coefficient data
 
 Outputs:
-        - a list of lists with
+        - a dictionary {dependent: (list of original values, list of fitted values, nRMSE)}
 """
 def compute_model_values(ts_data, coef_data):
-    # Get all dependent names
-    dependent_names = list(coef_data['Dependent'].unique())
-    # Dictionary to hold information
+    dependents, original, fitted, nrmses = var_fitted_values(ts_data, coef_data)
     fitted_values_dict = {}
-    # Length of predictor data
-    data_length = len(list(ts_data['RIC']))
-    # Iterate through the dependents
-    for i in range(len(dependent_names)):
-        const = 0
-        dependent_name = dependent_names[i]
-        # Get the original time series
-        ts = list(ts_data[dependent_name])
-        # Get the coefficient data
-        coefs = coef_data[coef_data['Dependent'] == dependent_name]
-        # Which predictors do we have with this dependent?
-        predictor_names = list(coefs['Predictor'].unique())
-        # Iterate through all the predictors in this equation
-        reg_values = []
-        for i2 in range(len(predictor_names)):
-            predictor = predictor_names[i2]
-            coef_info = coefs[coefs['Predictor'] == predictor]
-            # We might have multiple coefficients per predictor
-            # Because of the different lags
-            # So, iterate through the different lags of the same predictor
-            for i3 in range(len(coef_info.index)):
-                lag = list(coef_info['Lag'])[i3]
-                coefficient = list(coef_info['Coefficient'])[i3]
-                # For lag L, take off the last L elements, and add L nans to the beginning
-                x_data = 0
-                if lag == 0:
-                    x_data = [1]*data_length
-                else:
-                    x_data = list(ts_data[predictor])
-                lagged_x = [np.nan]*lag
-                lagged_x = lagged_x + x_data[:len(x_data)-lag]
-                # Multiply the lagged predictor by the coefficient
-                lagged_x = [coefficient*x for x in lagged_x]
-                reg_values.append(lagged_x)
-
-
-        # reg_values is a list of lists. Each list corresponds to one relevant predictor
-        # Each component list has the lagged values of the relevant time series multiplied by their appropriate coefficient
-        # Add values together (add first value of each list, second value of each list, etc.)
-        ys = list(map(sum, zip(*reg_values)))
-
-        # Replace the first couple of nan values in the predicted value list with the original values
-        # This is for nRMSE purposes. When a VAR (or AR) of lag L produces fitted values, it can't produce
-        # The first L values. So we need to fill these in.
-        nans = [0]*len(ys)
-        for i in range(len(ys)):
-            nans[i] = np.isnan(ys[i])
-        number_of_nans = sum(nans)
-        ys[:number_of_nans] = ts[:number_of_nans]
-
-        # Error between the original and model values
-        error = nrmse_range(ts, ys)
-        # Store results
-        fitted_values_dict[dependent_name] = (ts, ys, error)
-
+    for i in range(len(dependents)):
+        fitted_values_dict[dependents[i]] = (list(original[:, i]), list(fitted[:, i]), nrmses[i])
     return fitted_values_dict
@@ -0,0 +1,90 @@
+# Imports
+from batched_autoregression import ar_lag_search
+from regression_surface import window_regressions
+import numpy as np
+import pandas as pd
+import os
+
+"""
+regression_sensitivity.py checks how sensitive the residual regressions of residual_reg.py are to where the era
+boundaries fall. Instead of the three fixed eras, every (dependent, independent) regression is computed on every
+contiguous window of years of a minimum length (see regression_surface.py).
+
+As in residual_reg.py, the dependents are autoregression residuals and the independents the (normalized) time series.
+Here, the autoregressions are fitted once over the whole series (lag chosen by nRMSE, as in autoregression_residuals.py),
+so that the residuals do not depend on the window.
+
+You need to specify the root directory.
+
+Inputs:
+        - .csv of the (normalized) smoothed time series
+Outputs:
+        - .npz with the slope, R^2, p-value and number of observations of every pair and window, as arrays (dependent x
+          independent x first year x last year)
+        - .csv with, per pair, the share of windows where the regression is significant (p < 0.05 and R^2 >= 0.25), and
+          the window with the lowest p-value
+"""
+
+"""
+DIRECTORIES
+"""
+
+# SPECIFY ROOT DIRECTORY
+base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
+
+# Directory of the (normalized) smoothed time series
+ts_filename = os.path.join(base_dir, "output_data/time_series/norm_time_series.csv")
+
+# Directories for the results
+surface_filename = os.path.join(base_dir, "output_data/reg_results/regression_surface.npz")
+summary_filename = os.path.join(base_dir, "output_data/reg_results/regression_sensitivity.csv")
+
+"""
+PARAMETERS
+"""
+
+# Minimum window length, in years
+min_length = 10
+# Maximum autoregressive lag (as in the eras)
+max_lag = 5
+
+"""
+DATA PREPARATION
+"""
+
+ts_df = pd.read_csv(ts_filename).dropna().reset_index(drop=True)
+features = list(ts_df.columns[1:])
+values = ts_df[features].to_numpy()
+years = ts_df['Year'].to_numpy()
+
+"""
+ANALYSIS
+"""
+
+# Autoregression residuals over the whole series
+_, _, residuals = ar_lag_search(values, max_lag)
+
+surfaces = window_regressions(residuals, values, min_length)
+np.savez(surface_filename, slope=surfaces['slope'], r_squared=surfaces['R^2'], p_value=surfaces['p-value'],
+         n=surfaces['n'], features=np.array(features), years=years)
+
+# Summary per pair (all features except the dependent itself)
+significant = (surfaces['p-value'] < 0.05) & (surfaces['R^2'] >= 0.25)
+n_windows = (~np.isnan(surfaces['slope'])).sum(axis=(2, 3))
+summary = []
+for i in range(len(features)):
+    for j in range(len(features)):
+        if i == j:
+            continue
+        p_surface = np.where(np.isnan(surfaces['p-value'][i, j]), np.inf, surfaces['p-value'][i, j])
+        start, end = np.unravel_index(np.argmin(p_surface), p_surface.shape)
+        summary.append([features[i], features[j], n_windows[i, j], significant[i, j].sum()/n_windows[i, j],
+                        years[start], years[end], surfaces['slope'][i, j, start, end], p_surface[start, end],
+                        surfaces['R^2'][i, j, start, end]])
+
+summary_df = pd.DataFrame(summary, columns = ['Dependent', 'Independent', 'Windows', 'Share Significant',
+                                              'Best First Year', 'Best Last Year', 'Best Estimate', 'Best p-value',
+                                              'Best R^2'])
+summary_df = summary_df.sort_values('Share Significant', ascending = False)
+print(summary_df.head(10))
+summary_df.to_csv(summary_filename, index = False)
@@ -0,0 +1,70 @@
+# Imports
+import numpy as np
+from batched_regression import regression_from_sums
+
+"""
+regression_surface.py computes the univariate regressions of every (dependent, independent) pair on every contiguous
+window of the time series, to see how sensitive a relationship is to where the era boundaries fall.
+
+The sums a simple regression needs (number of observations, sums of x, x^2, y, y^2 and x*y) of any window are differences
+of cumulative sums, so every window takes O(1) work once the cumulative sums are built. Observations where the dependent
+is N/A (e.g. the first autoregression residuals) are left out of that dependent's sums.
+
+The surfaces are indexed (dependent, independent, start, end), with start and end the row indices of the first and last
+observation of the window (inclusive). Windows shorter than the minimum length are N/A.
+"""
+
+"""
+cumulative_moments() builds the cumulative sums of the regression moments of every pair.
+
+Inputs:
+        - ndarray of shape (n, dependents), may contain N/A
+        - ndarray of shape (n, independents), no N/A
+Outputs:
+        - dictionary of ndarrays of shape (n + 1, dependents, independents) (or (n + 1, dependents, 1) for the sums of y
+          and y^2); row i holds the sums over the first i observations
+"""
+def cumulative_moments(y, x):
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    # Centring does not change the statistics (except the intercept), but keeps the differences well-conditioned
+    x = x - x.mean(axis=0)
+    mask = ~np.isnan(y)
+    y = np.where(mask, y - np.nanmean(y, axis=0), 0)
+    m = mask.astype(float)
+
+    moments = {'n': m[:, :, None]*np.ones(x.shape[1]), 'sx': m[:, :, None]*x[:, None, :],
+               'sxx': m[:, :, None]*x[:, None, :]**2, 'sy': y[:, :, None], 'syy': y[:, :, None]**2,
+               'sxy': y[:, :, None]*x[:, None, :]}
+    return {key: np.concatenate([np.zeros((1,) + value.shape[1:]), np.cumsum(value, axis=0)])
+            for key, value in moments.items()}
+
+"""
+window_regressions() computes the regression surfaces.
+
+Inputs:
+        - ndarray of shape (n, dependents), may contain N/A
+        - ndarray of shape (n, independents), no N/A
+        - minimum window length (observations, counting N/A)
+Outputs:
+        - dictionary of ndarrays of shape (dependents, independents, n, n): 'slope', 't', 'p-value', 'R^2' and 'n'
+          (number of observations in the window, without N/A), indexed by (start, end)
+"""
+def window_regressions(y, x, min_length=10):
+    cumulative = cumulative_moments(y, x)
+    n = np.shape(x)[0]
+    start, end = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    valid = end - start + 1 >= min_length
+    starts, ends = start[valid], end[valid]
+
+    # Sums over each window: cumulative sum up to the end minus cumulative sum before the start
+    sums = {key: value[ends + 1] - value[starts] for key, value in cumulative.items()}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats = regression_from_sums(sums['n'], sums['sx'], sums['sxx'], sums['sy'], sums['syy'], sums['sxy'])
+
+    surfaces = {}
+    for key in ['slope', 't', 'p-value', 'R^2', 'n']:
+        surface = np.full((n, n) + stats['slope'].shape[1:], np.nan)
+        surface[starts, ends] = stats[key]
+        surfaces[key] = surface.transpose(2, 3, 0, 1)
+    return surfaces
@@ -1,9 +1,12 @@
 # Imports
 from regression_helper import normalize, nrmse_range
+from era_segmentation import load_eras
+from batched_regression import pairwise_regressions, adjust_p_values
 from sklearn.linear_model import LinearRegression
 import warnings
 warnings.simplefilter(action='ignore', category=FutureWarning)
 import math
+import numpy as np
 import os
 import pandas as pd
 import statsmodels.api as sm
@@ -22,17 +25,18 @@ However, I would exercise caution with the multilinear regression: I figured out
 uncorrelated overall, they are pretty correlated within eras, leading to multicollinearity when I try to do multilinear
 regression the vast majority of the time.
 
-As with autoregression_residuals.py, segmentation of the time series into eras is hard-coded. If you want to segment them differently, you must manually
-input the desired eras.
+As with autoregression_residuals.py, the eras are derived from the changepoint analysis (see era_segmentation.py).
 
-You need to specify the root directory. If you get changepoint results that indicate different eras, you will need to
-segment the time series manually.
+You need to specify the root directory.
 
 Inputs:
        - a .csv of (normalized) smoothed time series
+       - .csv with the era boundaries (see tally_changepoints.py)
        - .csv's of autoregression residuals for each era
 
-Output: a .csv containing Table 3 in the paper: results of significant regressions (estimates, p-values, etc.)
+Outputs:
+       - a .csv containing Table 3 in the paper: results of significant regressions (estimates, p-values, etc.)
+       - a .csv with the results of all univariate regressions, including p-values adjusted for multiple comparisons
 """
 
 # SPECIFY ROOT DIRECTORY
@@ -41,43 +45,43 @@ base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
 # Directory of (normalized) smoothed time series
 ts_filename = os.path.join(base_dir, "output_data/time_series/norm_time_series.csv")
 
-# Directories of autoregression residuals
-resid_1_filename = os.path.join(base_dir, "output_data/reg_results/residuals/era_1_residuals.csv")
-resid_2_filename = os.path.join(base_dir, "output_data/reg_results/residuals/era_2_residuals.csv")
-resid_3_filename = os.path.join(base_dir, "output_data/reg_results/residuals/era_3_residuals.csv")
+# Directory of the era boundaries (the changepoints found by the changepoint analysis)
+era_boundaries_filename = os.path.join(base_dir, "output_data/changepoints/era_boundaries.csv")
+
+# Directories of autoregression residuals ({} is the era number)
+resid_filename = os.path.join(base_dir, "output_data/reg_results/residuals/era_{}_residuals.csv")
 
 # Directory for Table 3 .csv
 table_3_filename = os.path.join(base_dir, "output_data/reg_results/tables_for_paper/table_3.csv")
 
+# Directory for the results of all univariate regressions
+all_regressions_filename = os.path.join(base_dir, "output_data/reg_results/univariate_regressions.csv")
+
 """
 DATA PREPARATION
 """
 
 # The original time series need to be normalized and segmented
-original_ts_df = pd.read_csv(ts_filename)
-# Drop the 'Year column'
-original_ts_df = original_ts_df.drop('Year', axis=1)
-
-seg1 = original_ts_df.iloc[0:25].dropna().reset_index(drop=True)
-seg2 = original_ts_df.iloc[25:50].dropna().reset_index(drop=True)
-seg3 = original_ts_df.iloc[50:].dropna().reset_index(drop=True)
-
-original_eras = [seg1, seg2, seg3]
+original_eras, _ = load_eras(ts_filename, era_boundaries_filename)
 
 # Autoregression residuals for each era
-era_1_residuals = pd.read_csv(resid_1_filename)
-era_2_residuals = pd.read_csv(resid_2_filename)
-era_3_residuals = pd.read_csv(resid_3_filename)
-
-new_eras = [era_1_residuals, era_2_residuals, era_3_residuals]
+new_eras = [pd.read_csv(resid_filename.format(i+1)) for i in range(len(original_eras))]
 
 """
-For each era, regress the residuals of one feature against the other 6 features. Keep regressions with R^2 values more
-than 0.25 and p-values less than 0.05, and store the model info for Table 3.
+For each era, regress the residuals of one feature against the other 6 features. All regressions of an era are computed
+at once (see batched_regression.py). Keep regressions with R^2 values more than 0.25 and p-values less than 0.05, and
+store the model info for Table 3.
+
+The p-values of all regressions (all eras) are also adjusted for multiple comparisons, with the Benjamini-Hochberg and
+Holm procedures. Every regression, significant or not, is saved with its raw and adjusted p-values. Set p_adjust to
+'bh' or 'holm' to select the Table 3 regressions on the adjusted p-values instead of the raw ones.
 """
 
-# This will store the regression results
-reg_info = []
+# Which p-values to select on: None (raw, as in the paper), 'bh' or 'holm'
+p_adjust = None
+
+# This will store the results of all regressions
+all_regressions = []
 # Iterate through the eras
 for i in range(len(new_eras)):
     # Get original time series and residuals for the era
@@ -85,37 +89,26 @@ for i in range(len(new_eras)):
     old_df = original_eras[i]
     features = list(new_era_df.columns)
 
-    # Iterate through each autoregression residual
-    for dep in features:
-        y_data = new_era_df[dep]
-
-        # Remove NA values. Keep count of them so we know how to adjust the predictor data
-        nan_count = sum([math.isnan(x) for x in list(y_data)])
-        y_data = y_data.dropna()
-
-        # Iterate through all possible predictors (all features except itself)
-        for indep in features:
-            if dep == indep:
-                continue
-            else:
-                # Predictor
-                x = old_df[indep][nan_count:]
-
-                # Regression
-                X2 = sm.add_constant(x)
-                est = sm.OLS(list(y_data), X2)
-                est2 = est.fit()
-                # Get model info
-                p_vals = est2.pvalues.to_dict()
-                r_squared = est2.rsquared
-                coefficient = est2.params[indep]
-
-                # If p < 0.05
-                if p_vals[indep] < 0.05:
-                    # If R^2 >= 0.25
-                    if r_squared >= 0.25:
-                        # If the regression is significant, store its info
-                        reg_info.append([i+1, dep, indep, round(coefficient, 3), round(p_vals[indep], 4), round(r_squared, 3)])
+    # Regress every residual (the first 'lag' of which are N/A) on every original time series
+    stats = pairwise_regressions(new_era_df[features].to_numpy(), old_df[features].to_numpy())
+    # All predictors except the feature itself
+    deps, indeps = np.nonzero(~np.eye(len(features), dtype=bool))
+    era_df = pd.DataFrame({'Era': i+1, 'Dependent': np.array(features)[deps], 'Independent': np.array(features)[indeps],
+                           'Estimate': stats['slope'][deps, indeps], 'Intercept': stats['intercept'][deps, indeps],
+                           't': stats['t'][deps, indeps], 'p-value': stats['p-value'][deps, indeps],
+                           'R^2': stats['R^2'][deps, indeps], 'n': stats['n'][deps, indeps].astype(int)})
+    all_regressions.append(era_df)
+
+all_regressions_df = pd.concat(all_regressions, ignore_index=True)
+all_regressions_df['p-value (BH)'] = adjust_p_values(all_regressions_df['p-value'], 'bh')
+all_regressions_df['p-value (Holm)'] = adjust_p_values(all_regressions_df['p-value'], 'holm')
+all_regressions_df.to_csv(all_regressions_filename, index = False)
+
+# If p < 0.05 and R^2 >= 0.25, the regression is significant
+p_column = {None: 'p-value', 'bh': 'p-value (BH)', 'holm': 'p-value (Holm)'}[p_adjust]
+significant = all_regressions_df[(all_regressions_df[p_column] < 0.05) & (all_regressions_df['R^2'] >= 0.25)]
+reg_info = [[row['Era'], row['Dependent'], row['Independent'], round(row['Estimate'], 3), round(float(row['p-value']), 4),
+             round(row['R^2'], 3)] for _, row in significant.iterrows()]
 
 results_df = pd.DataFrame(reg_info, columns = ['Era', 'Dependent', 'Independent', 'Estimate', 'p-value', 'R^2'])
 
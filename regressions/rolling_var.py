@@ -0,0 +1,160 @@
+# Imports
+import numpy as np
+import pandas as pd
+
+"""
+rolling_var.py contains a rolling-origin backtest of VAR forecasts. From every origin (the last year the model may use),
+a VAR is fitted on the observations up to the origin (all of them, an expanding window, or only the last 'window', a
+rolling window) and iterated forward to forecast the next 1 ... horizon years, which are compared with the actual values.
+
+Instead of refitting a statsmodels VAR at every origin, the least-squares fit is updated with recursive least squares:
+moving the origin forward adds one observation (a rank-one update of the inverse cross-product matrix and of the
+coefficients) and, for a rolling window, removes the oldest one (a rank-one downdate). The model is the same as
+statsmodels' VAR(lag) with a constant: the regressors of observation t are [1, y_{t-1}, ..., y_{t-lag}].
+
+All origins are backtested in one sequential pass. The updates are tiny NumPy operations that hold the GIL, so a thread
+pool would not run them in parallel, and for a few dozen origins a process pool costs more to start than the whole pass.
+"""
+
+"""
+var_regressors() builds the regressors and targets of a VAR.
+
+Inputs:
+        - ndarray of shape (n, variables)
+        - lag
+Outputs:
+        - ndarray of shape (n - lag, 1 + lag*variables): row i holds [1, y_{t-1}, ..., y_{t-lag}] for t = i + lag
+        - ndarray of shape (n - lag, variables) with y_t
+"""
+def var_regressors(values, lag):
+    n = values.shape[0]
+    lagged = [values[lag - j:n - j] for j in range(1, lag + 1)]
+    Z = np.concatenate([np.ones((n - lag, 1))] + lagged, axis=1)
+    return Z, values[lag:]
+
+"""
+rls_update() adds (sign = 1) or removes (sign = -1) one observation from a least-squares fit, in place.
+
+Inputs:
+        - inverse cross-product matrix P = (Z'Z)^-1, shape (k, k)
+        - coefficients B, shape (k, variables)
+        - regressors z (k,) and target y (variables,) of the observation
+        - sign
+"""
+def rls_update(P, B, z, y, sign=1):
+    Pz = P @ z
+    gain = Pz/(sign + z @ Pz)
+    B += np.outer(gain, y - z @ B)
+    P -= np.outer(gain, Pz)
+
+"""
+var_forecast_path() iterates a VAR forward from the last 'lag' observations.
+
+Inputs:
+        - coefficients B, shape (1 + lag*variables, variables)
+        - ndarray of shape (lag, variables) with the last observations, oldest first
+        - horizon
+Outputs:
+        - ndarray of shape (horizon, variables)
+"""
+def var_forecast_path(B, history, horizon):
+    lag = history.shape[0]
+    window = list(history)
+    path = np.zeros((horizon, B.shape[1]))
+    for h in range(horizon):
+        z = np.concatenate([[1]] + window[::-1][:lag])
+        path[h] = z @ B
+        window.append(path[h])
+    return path
+
+"""
+backtest_chunk() forecasts from a contiguous run of origins.
+
+Inputs:
+        - ndarray of shape (n, variables)
+        - lag, horizon
+        - sorted ndarray of consecutive origins (row indices of the last observation the model may use)
+        - window: number of observations to fit on (None for an expanding window)
+Outputs:
+        - ndarray of shape (origins, horizon, variables) with the forecasts
+"""
+def backtest_chunk(values, lag, horizon, origins, window=None):
+    Z, Y = var_regressors(values, lag)
+    # Fitting rows (of Z and Y) for an origin o: observations t <= o, i.e. rows up to o - lag
+    first = lambda o: 0 if window is None else max(0, o - lag + 1 - window)
+    start, stop = first(origins[0]), origins[0] - lag + 1
+    P = np.linalg.pinv(Z[start:stop].T @ Z[start:stop])
+    B = P @ Z[start:stop].T @ Y[start:stop]
+
+    forecasts = np.zeros((len(origins), horizon, values.shape[1]))
+    for i, o in enumerate(origins):
+        if i > 0:
+            # Add the new observation, then drop the oldest one from a rolling window
+            rls_update(P, B, Z[o - lag], Y[o - lag], 1)
+            while start < first(o):
+                rls_update(P, B, Z[start], Y[start], -1)
+                start += 1
+        forecasts[i] = var_forecast_path(B, values[o - lag + 1:o + 1], horizon)
+    return forecasts
+
+"""
+rolling_backtest() forecasts from every origin.
+
+Inputs:
+        - ndarray of shape (n, variables)
+        - lag, horizon
+        - minimum number of observations to fit on (the first origin); at least the number of coefficients of each
+          equation, 1 + lag*variables
+        - window: number of observations to fit on (None for an expanding window)
+Outputs:
+        - ndarray of the origins
+        - ndarray of shape (origins, horizon, variables) with the forecasts
+"""
+def rolling_backtest(values, lag=1, horizon=1, min_train=15, window=None):
+    values = np.asarray(values, dtype=float)
+    if window is not None:
+        min_train = window
+    # Recursive least squares needs an invertible cross-product matrix from the first fit on
+    n_coefs = 1 + lag*values.shape[1]
+    if min_train < n_coefs:
+        raise ValueError("The first fit needs at least " + str(n_coefs) + " observations, got " + str(min_train))
+    # The last origin is the second-to-last observation, so that every origin has at least one actual value
+    origins = np.arange(lag + min_train - 1, values.shape[0] - 1)
+    return origins, backtest_chunk(values, lag, horizon, origins, window)
+
+"""
+forecast_errors() compares backtest forecasts with the actual values.
+
+Inputs:
+        - ndarray of shape (n, variables) with the time series
+        - origins and forecasts from rolling_backtest()
+        - list of the variable names
+        - ndarray of the years of the time series
+Outputs:
+        - DataFrame with one row per forecast (Origin, Year, Horizon, Feature, Forecast, Actual, Error)
+        - DataFrame with the errors per feature and horizon: number of forecasts, mean error, mean absolute error, RMSE
+          and nRMSE (RMSE normalized by the range of the feature)
+"""
+def forecast_errors(values, origins, forecasts, features, years):
+    values = np.asarray(values, dtype=float)
+    n = values.shape[0]
+    n_origins, horizon, n_vars = forecasts.shape
+    targets = origins[:, None] + np.arange(1, horizon + 1)
+    valid = targets < n
+
+    o_idx, h_idx = np.nonzero(valid)
+    t_idx = targets[o_idx, h_idx]
+    predicted = forecasts[o_idx, h_idx]
+    actual = values[t_idx]
+    forecast_df = pd.DataFrame({'Origin': np.repeat(years[origins[o_idx]], n_vars),
+                                'Year': np.repeat(years[t_idx], n_vars), 'Horizon': np.repeat(h_idx + 1, n_vars),
+                                'Feature': np.tile(features, len(o_idx)), 'Forecast': predicted.ravel(),
+                                'Actual': actual.ravel(), 'Error': (predicted - actual).ravel()})
+
+    grouped = forecast_df.groupby(['Feature', 'Horizon'], sort=False)['Error']
+    error_df = pd.DataFrame({'n': grouped.size(), 'Mean Error': grouped.mean(),
+                             'MAE': grouped.apply(lambda e: e.abs().mean()),
+                             'RMSE': grouped.apply(lambda e: np.sqrt((e**2).mean()))}).reset_index()
+    ranges = pd.Series(values.max(axis=0) - values.min(axis=0), index=features)
+    error_df['nRMSE'] = error_df['RMSE']/error_df['Feature'].map(ranges)
+    return forecast_df, error_df
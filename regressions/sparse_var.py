@@ -0,0 +1,145 @@
+# Imports
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import enet_path
+from rolling_var import var_regressors
+
+"""
+sparse_var.py fits penalized (lasso / elastic-net) VARs. With eight features, lags chosen by BIC and only about 20 years
+per era, the OLS VARs of vector_autoregression.py have almost as many coefficients as observations; a penalty shrinks
+most of them to exactly 0, and keeps the estimation feasible with many more features.
+
+Each equation is an elastic net of the feature on the standardized lags of all features (the constant is not
+penalized):
+
+        1/(2n) ||y - Zb||^2 + lambda * (l1_ratio ||b||_1 + (1 - l1_ratio)/2 ||b||^2)
+
+All equations of a VAR share the same regressors, so their Gram matrix Z'Z is computed once and passed to
+scikit-learn's coordinate descent (enet_path()), which fits the whole lambda path of every equation with warm starts.
+
+lambda is chosen per equation by time-series cross-validation: the fits on the first observations forecast the next block
+of observations one step ahead, for a few consecutive blocks (forward chaining), and the lambda with the lowest mean
+squared error wins.
+"""
+
+"""
+standardize() centres the regressors and scales them to unit variance (constant columns are only centred).
+"""
+def standardize(Z):
+    mean = Z.mean(axis=0)
+    scale = Z.std(axis=0)
+    scale[scale == 0] = 1
+    return (Z - mean)/scale, mean, scale
+
+"""
+lambda_grid() gives a decreasing, log-spaced grid of lambdas, from the smallest lambda that sets every coefficient of
+every equation to 0 down to eps times that.
+
+Inputs:
+        - standardized regressors, shape (n, k)
+        - centred targets, shape (n, variables)
+        - l1_ratio, number of lambdas, eps
+"""
+def lambda_grid(Z, Y, l1_ratio=1.0, n_lambdas=50, eps=1e-3):
+    lambda_max = np.abs(Z.T @ Y).max()/(len(Z)*max(l1_ratio, 1e-3))
+    return np.geomspace(lambda_max, lambda_max*eps, n_lambdas)
+
+"""
+elastic_net_paths() fits the lambda paths of all equations on the same regressors.
+
+Inputs:
+        - regressors, shape (n, k) (without the constant)
+        - targets, shape (n, variables)
+        - decreasing ndarray of lambdas
+        - l1_ratio
+Outputs:
+        - ndarray of shape (lambdas, variables) with the constants
+        - ndarray of shape (lambdas, k, variables) with the coefficients, in the units of the regressors
+"""
+def elastic_net_paths(Z, Y, lambdas, l1_ratio=1.0):
+    Zs, z_mean, z_scale = standardize(Z)
+    y_mean = Y.mean(axis=0)
+    Yc = Y - y_mean
+    Zs = np.asfortranarray(Zs)
+    # Shared by every equation and every lambda
+    gram = Zs.T @ Zs
+    Zy = Zs.T @ Yc
+
+    coefs = np.zeros((len(lambdas), Z.shape[1], Y.shape[1]))
+    for j in range(Y.shape[1]):
+        _, path, _ = enet_path(Zs, Yc[:, j], l1_ratio=l1_ratio, alphas=lambdas, precompute=gram, Xy=Zy[:, j],
+                               tol=1e-6, max_iter=10000)
+        coefs[:, :, j] = path.T
+    coefs /= z_scale[:, None]
+    const = y_mean - np.einsum('k,lkv->lv', z_mean, coefs)
+    return const, coefs
+
+"""
+time_series_folds() splits n observations into forward-chaining folds: fold i trains on the observations before its
+test block. The first min_train observations are only used for training, and the rest are split into n_folds blocks.
+
+Outputs:
+        - list of (end of the training observations, end of the test block)
+"""
+def time_series_folds(n, n_folds=5, min_train=None):
+    if min_train is None:
+        min_train = n//2
+    edges = np.linspace(min_train, n, n_folds + 1).round().astype(int)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+"""
+fit_sparse_var() fits a penalized VAR, with lambda chosen per equation by time-series cross-validation.
+
+Inputs:
+        - ndarray of shape (n, variables)
+        - lag
+        - l1_ratio (1 for the lasso)
+        - number of lambdas and number of cross-validation folds
+Outputs:
+        - ndarray of shape (1 + lag*variables, variables) with the coefficients, in the order of statsmodels' VAR params
+          (constant, lag 1 of every variable, lag 2, ...)
+        - ndarray of shape (variables,) with the chosen lambdas
+        - ndarray of shape (lambdas, variables) with the cross-validation mean squared errors
+"""
+def fit_sparse_var(values, lag=1, l1_ratio=1.0, n_lambdas=50, n_folds=5):
+    Z, Y = var_regressors(np.asarray(values, dtype=float), lag)
+    Z = Z[:, 1:]
+    Zs, _, _ = standardize(Z)
+    lambdas = lambda_grid(Zs, Y - Y.mean(axis=0), l1_ratio, n_lambdas)
+
+    # Cross-validation: one-step-ahead errors on each test block
+    squared_errors = np.zeros((n_lambdas, Y.shape[1]))
+    n_test = 0
+    for train_end, test_end in time_series_folds(len(Y), n_folds):
+        const, coefs = elastic_net_paths(Z[:train_end], Y[:train_end], lambdas, l1_ratio)
+        predicted = const[:, None, :] + np.einsum('tk,lkv->ltv', Z[train_end:test_end], coefs)
+        squared_errors += ((predicted - Y[train_end:test_end])**2).sum(axis=1)
+        n_test += test_end - train_end
+    cv_mse = squared_errors/n_test
+
+    # Refit on all observations and keep each equation's best lambda
+    best = np.argmin(cv_mse, axis=0)
+    const, coefs = elastic_net_paths(Z, Y, lambdas, l1_ratio)
+    equations = np.arange(Y.shape[1])
+    params = np.vstack([const[best, equations], coefs[best, :, equations].T])
+    return params, lambdas[best], cv_mse
+
+"""
+sparse_coefficient_table() lists the non-zero coefficients of a penalized VAR, in the schema of the coefficient tables
+of var_coefficients.py (Dependent, Predictor, Lag, Coefficient). There are no p-values for penalized estimates.
+
+Inputs:
+        - coefficients from fit_sparse_var()
+        - list of the variable names
+"""
+def sparse_coefficient_table(params, names):
+    n_vars = len(names)
+    lag = (params.shape[0] - 1)//n_vars
+    lags = np.concatenate([[0], np.repeat(np.arange(1, lag + 1), n_vars)])
+    predictors = np.array(['const'] + list(names)*lag, dtype=object)
+
+    param_idx, dep_idx = np.nonzero(params)
+    order = np.lexsort((param_idx, dep_idx))
+    param_idx, dep_idx = param_idx[order], dep_idx[order]
+    return pd.DataFrame({'Dependent': np.array(names, dtype=object)[dep_idx], 'Predictor': predictors[param_idx],
+                         'Lag': lags[param_idx], 'Coefficient': params[param_idx, dep_idx]})
@@ -0,0 +1,127 @@
+# Imports
+from era_segmentation import era_boundaries
+from batched_autoregression import ar_lag_search
+from rolling_var import var_regressors
+from structural_breaks import chow_scan, sup_f_test, sup_f_null, sup_f_trim, sup_f_bootstrap
+import numpy as np
+import pandas as pd
+import os
+
+"""
+structural_break_tests.py tests whether the coefficients of the feature models actually change at the era boundaries.
+Chow tests are computed at every candidate break year, and Andrews' sup-F test over all of them, with residual-bootstrap
+p-values as well as the asymptotic ones (see structural_breaks.py), for:
+
+        - the autoregression of each feature (lag chosen by nRMSE, as in autoregression_residuals.py)
+        - each equation of a VAR of all features
+
+The models are fitted over the whole (normalized) series, 1952 - 2020. A break year is the first year of the new regime,
+as for the era boundaries.
+
+You need to specify the root directory.
+
+Inputs:
+        - .csv of the (normalized) smoothed time series
+        - .csv with the era boundaries (see tally_changepoints.py)
+Outputs:
+        - .csv with the Chow test of every model at every candidate break year
+        - .csv with the sup-F test of every model, and the Chow tests at the era boundaries
+"""
+
+"""
+DIRECTORIES
+"""
+
+# SPECIFY ROOT DIRECTORY
+base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
+
+# Directory of the (normalized) smoothed time series
+ts_filename = os.path.join(base_dir, "output_data/time_series/norm_time_series.csv")
+
+# Directory of the era boundaries (the changepoints found by the changepoint analysis)
+era_boundaries_filename = os.path.join(base_dir, "output_data/changepoints/era_boundaries.csv")
+
+# Directories for the results
+chow_filename = os.path.join(base_dir, "output_data/reg_results/chow_tests.csv")
+sup_f_filename = os.path.join(base_dir, "output_data/reg_results/sup_f_tests.csv")
+
+# Directory of the cached simulations of the sup-F null distributions
+sup_f_cache_dir = os.path.join(base_dir, "output_data/reg_results/sup_f_null_cache")
+
+"""
+PARAMETERS
+"""
+
+# Maximum autoregressive lag (as in the eras)
+max_lag = 5
+# VAR lag. Each equation has k = 1 + 8*lag coefficients, and both sides of a break need 2k observations. BIC on the
+# whole series picks 6 (the largest order it tries), but then no break can be tested at all (49 coefficients, 63
+# observations). Lag 1 (9 coefficients) is the only lag that leaves any: 33 candidate breaks (27 inside the trimming),
+# against none for lag 2 (17 coefficients, 67 observations)
+var_lag = 1
+# Trimming of the sup-F test
+trim = 0.15
+# Replicates and seed of the bootstrap p-values of the sup-F test (the asymptotic p-values are far too small on these
+# series, see structural_breaks.py)
+n_boot = 999
+bootstrap_seed = 0
+
+"""
+DATA PREPARATION
+"""
+
+ts_df = pd.read_csv(ts_filename).dropna().reset_index(drop=True)
+features = list(ts_df.columns[1:])
+values = ts_df[features].to_numpy()
+years = ts_df['Year'].to_numpy()
+boundaries = era_boundaries(era_boundaries_filename)
+
+"""
+ANALYSIS
+"""
+
+# (model, lag, series, regressors, targets, names of the equations)
+models = []
+ar_lags, _, _ = ar_lag_search(values, max_lag)
+for i in range(len(features)):
+    Z, Y = var_regressors(values[:, [i]], int(ar_lags[i]))
+    models.append(('AR', int(ar_lags[i]), values[:, [i]], Z, Y, [features[i]]))
+Z, Y = var_regressors(values, var_lag)
+models.append(('VAR', var_lag, values, Z, Y, features))
+
+# Simulate the sup-F null distributions of every number of coefficients at once, per trimming (each side of a break
+# needs 2k observations, which raises the trimming of the models with many coefficients; see structural_breaks.py)
+max_ks = {}
+for _, _, _, Z, _, _ in models:
+    model_trim = sup_f_trim(len(Z), Z.shape[1], trim)
+    max_ks[model_trim] = max(max_ks.get(model_trim, 0), Z.shape[1])
+for model_trim, max_k in max_ks.items():
+    sup_f_null(max_k, model_trim, cache_dir=sup_f_cache_dir)
+
+chow_dfs = []
+sup_f_rows = []
+for model, lag, series, Z, Y, names in models:
+    breaks, f_stats, p_values = chow_scan(Z, Y)
+    # Observation b of the regression is row b + lag of the series
+    break_years = years[breaks + lag]
+    chow_dfs.append(pd.DataFrame({'Model': model, 'Lag': lag, 'Feature': np.tile(names, len(breaks)),
+                                  'Break Year': np.repeat(break_years, len(names)), 'F': f_stats.ravel(),
+                                  'p-value': p_values.ravel()}))
+
+    sup, sup_breaks, sup_p, model_trim = sup_f_test(breaks, f_stats, len(Z), Z.shape[1], trim,
+                                                    cache_dir=sup_f_cache_dir)
+    boot_p = sup_f_bootstrap(series, lag, trim, n_boot=n_boot, seed=bootstrap_seed)
+    for j in range(len(names)):
+        row = {'Model': model, 'Lag': lag, 'Feature': names[j], 'Trimming': model_trim, 'sup-F': sup[j],
+               'Break Year': years[sup_breaks[j] + lag], 'p-value': boot_p[j], 'Asymptotic p-value': sup_p[j]}
+        for year in boundaries:
+            at_year = np.flatnonzero(break_years == year)
+            row['Chow p-value (' + str(year) + ')'] = p_values[at_year[0], j] if len(at_year) else np.nan
+        sup_f_rows.append(row)
+
+chow_df = pd.concat(chow_dfs, ignore_index=True)
+sup_f_df = pd.DataFrame(sup_f_rows)
+print(sup_f_df)
+
+chow_df.to_csv(chow_filename, index = False)
+sup_f_df.to_csv(sup_f_filename, index = False)
@@ -0,0 +1,249 @@
+# Imports
+from rolling_var import var_regressors
+from var_irf import simulate_var, refit_var
+import numpy as np
+import scipy.stats
+import os
+
+"""
+structural_breaks.py tests whether the coefficients of a regression (an autoregression, or a VAR equation) change at a
+break: Chow tests at every candidate break, and Andrews' sup-F test over all of them.
+
+For a break at observation b, the model is fitted on observations 0 ... b - 1 and b ... T - 1 separately, and the Chow
+statistic compares the residual sums of squares with the pooled fit:
+
+        F(b) = ((RSS_pooled - RSS_1 - RSS_2)/k) / ((RSS_1 + RSS_2)/(T - 2k))  ~  F(k, T - 2k)
+
+where k is the number of coefficients. The residual sum of squares of any segment follows from its cross-product matrices
+Z'Z, Z'y and y'y, which are differences of cumulative sums, so all candidate breaks take one pass of cumulative sums and
+one batched solve. Equations that share their regressors (the equations of a VAR) are tested together.
+
+Each side of a break needs at least 2k observations by default, so that both segment fits keep as many residual degrees
+of freedom as coefficients (with k + 1, a segment fit can be left with a single residual degree of freedom, and its F
+statistics explode).
+
+The sup-F statistic is the largest k*F(b) over the breaks in the middle of the sample (15% trimming by default, or more
+if the minimum segment size needs it: the trimming is then rounded up to a multiple of 0.05, as in Andrews' tables).
+Its p-value comes from its asymptotic distribution (Andrews, 1993) at that trimming, the supremum of a squared,
+standardized k-dimensional Brownian bridge. This is simulated with random walks of 3600 steps, as in Andrews' tables (coarser walks miss the peaks
+of the bridge and bias the critical values down, e.g. 6.9 instead of 7.17 for the 10% value with k = 1 and 500 steps).
+That takes seconds, so the distributions of every k are simulated together (from the same draws) and cached in memory
+and, optionally, on disk.
+
+The asymptotic distribution needs many observations per coefficient and stationary regressors, and the smoothed series
+have neither: simulating the fitted AR models and VAR(1) without a break, the asymptotic 5% test rejects 13% - 29% of
+the time for the autoregressions and 34% for the VAR equations. sup_f_bootstrap() gives p-values that do not rely on
+it, from a residual bootstrap of the fitted model under the null of no break: every replicate simulates the series from
+the pooled fit with resampled residuals, refits it and recomputes the sup-F statistic.
+"""
+
+# Cache of simulated sup-F null distributions (of every k up to the largest one simulated), keyed by (trimming, number
+# of simulations, steps, seed)
+_sup_f_null_cache = {}
+
+# Number of simulations per chunk, to bound memory
+_sup_f_chunk_size = 200
+
+"""
+cumulative_cross_products() builds the cumulative cross-product matrices of a regression.
+
+Inputs:
+        - ndarray of shape (T, k) with the regressors
+        - ndarray of shape (T, equations) with the targets
+Outputs:
+        - ndarray of shape (T + 1, k, k): row b holds Z'Z over observations 0 ... b - 1
+        - ndarray of shape (T + 1, k, equations): Z'y
+        - ndarray of shape (T + 1, equations): y'y (per equation)
+"""
+def cumulative_cross_products(Z, Y):
+    zz = np.cumsum(Z[:, :, None]*Z[:, None, :], axis=0)
+    zy = np.cumsum(Z[:, :, None]*Y[:, None, :], axis=0)
+    yy = np.cumsum(Y**2, axis=0)
+    pad = lambda a: np.concatenate([np.zeros((1,) + a.shape[1:]), a])
+    return pad(zz), pad(zy), pad(yy)
+
+"""
+segment_rss() gives the residual sums of squares of least-squares fits from their cross-product matrices.
+
+Inputs:
+        - ndarray of shape (..., k, k) with Z'Z
+        - ndarray of shape (..., k, equations) with Z'y
+        - ndarray of shape (..., equations) with y'y
+Outputs:
+        - ndarray of shape (..., equations)
+"""
+def segment_rss(zz, zy, yy):
+    coefs = np.linalg.pinv(zz) @ zy
+    return yy - (zy*coefs).sum(axis=-2)
+
+"""
+chow_scan() computes the Chow test at every candidate break.
+
+Inputs:
+        - ndarray of shape (T, k) with the regressors
+        - ndarray of shape (T, equations) with the targets
+        - minimum number of observations on each side of a break (at least k; None for 2k)
+Outputs:
+        - ndarray of the candidate breaks (index of the first observation after the break)
+        - ndarray of shape (breaks, equations) with the F statistics
+        - ndarray of shape (breaks, equations) with the p-values
+"""
+def chow_scan(Z, Y, min_size=None):
+    T, k = Z.shape
+    if min_size is None:
+        min_size = 2*k
+    zz, zy, yy = cumulative_cross_products(Z, Y)
+    breaks = np.arange(max(min_size, k), T - max(min_size, k) + 1)
+
+    rss_pooled = segment_rss(zz[-1], zy[-1], yy[-1])
+    rss_split = segment_rss(zz[breaks], zy[breaks], yy[breaks]) + \
+        segment_rss(zz[-1] - zz[breaks], zy[-1] - zy[breaks], yy[-1] - yy[breaks])
+    df = T - 2*k
+    f_stats = (rss_pooled - rss_split)/k/(rss_split/df)
+    return breaks, f_stats, scipy.stats.f.sf(f_stats, k, df)
+
+"""
+sup_f_nulls() simulates the asymptotic null distributions of the sup-F (Wald) statistic for k = 1 ... max_k: the
+supremum over the trimmed range of ||W(r) - r W(1)||^2 / (r (1 - r)), with W a Brownian motion (random walks). The
+distribution for k uses the first k components of the same max_k-dimensional walks, so one simulation gives every k.
+Each component has its own random stream, so the distribution for k does not depend on max_k.
+
+Inputs:
+        - largest k, trimming, number of simulations, steps of the random walks and seed
+Outputs:
+        - ndarray of shape (max_k, n_sim): row k - 1 holds the sorted simulated statistics for k
+"""
+def sup_f_nulls(max_k, trim=0.15, n_sim=20000, n_steps=3600, seed=0):
+    rngs = [np.random.default_rng([seed, component]) for component in range(max_k)]
+    r = np.arange(1, n_steps + 1)/n_steps
+    keep = (r >= trim) & (r <= 1 - trim)
+    r_kept = r[keep].astype(np.float32)
+    sup = np.zeros((max_k, n_sim))
+    # In chunks, to bound memory (single precision halves the time; its error is far below the simulation error)
+    steps = np.empty((max_k, _sup_f_chunk_size, n_steps), dtype=np.float32)
+    for start in range(0, n_sim, _sup_f_chunk_size):
+        size = min(_sup_f_chunk_size, n_sim - start)
+        for component in range(max_k):
+            rngs[component].standard_normal(out=steps[component, :size], dtype=np.float32)
+        walks = np.cumsum(steps[:, :size], axis=-1)/np.float32(np.sqrt(n_steps))
+        bridges = walks[:, :, keep] - r_kept*walks[:, :, -1:]
+        # Running sum over the components gives ||B(r)||^2 for every k at once
+        sup[:, start:start + size] = (np.cumsum(bridges**2, axis=0)/(r_kept*(1 - r_kept))).max(axis=-1)
+    return np.sort(sup, axis=1)
+
+"""
+sup_f_null() gives the simulated null distribution of the sup-F statistic for one k (see sup_f_nulls()), from the
+in-memory cache, the disk cache, or a new simulation (of every k up to this one, which is then cached).
+
+Inputs:
+        - k, trimming, number of simulations, steps of the random walks and seed
+        - directory of the disk cache (None for the in-memory cache only)
+Outputs:
+        - sorted ndarray of the simulated statistics
+"""
+def sup_f_null(k, trim=0.15, n_sim=20000, n_steps=3600, seed=0, cache_dir=None):
+    key = (trim, n_sim, n_steps, seed)
+    if cache_dir is not None:
+        cache_filename = os.path.join(cache_dir, "sup_f_null_" + "_".join(map(str, key)) + ".npy")
+    if (key not in _sup_f_null_cache or len(_sup_f_null_cache[key]) < k) and cache_dir is not None and \
+            os.path.exists(cache_filename):
+        _sup_f_null_cache[key] = np.load(cache_filename)
+
+    if key not in _sup_f_null_cache or len(_sup_f_null_cache[key]) < k:
+        _sup_f_null_cache[key] = sup_f_nulls(k, trim, n_sim, n_steps, seed)
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.save(cache_filename, _sup_f_null_cache[key])
+    return _sup_f_null_cache[key][k - 1]
+
+"""
+sup_f_trim() gives the trimming of a sup-F test: the requested trimming, or, if the minimum segment size needs more,
+min_size/T rounded up to a multiple of 0.05.
+
+Inputs:
+        - number of observations T and of coefficients k
+        - requested trimming
+        - minimum number of observations on each side of a break, as in chow_scan() (None for 2k)
+Outputs:
+        - trimming
+"""
+def sup_f_trim(T, k, trim=0.15, min_size=None):
+    if min_size is None:
+        min_size = 2*k
+    if min_size > trim*T:
+        trim = round(np.ceil(min_size/T/0.05 - 1e-9)*0.05, 2)
+    return trim
+
+"""
+sup_f_test() computes Andrews' sup-F test from a Chow scan.
+
+Inputs:
+        - breaks and F statistics from chow_scan()
+        - number of observations T and of coefficients k
+        - trimming: only breaks between trim*T and (1 - trim)*T are considered
+        - minimum number of observations on each side of a break, as in chow_scan() (None for 2k), which can raise the
+          trimming (see sup_f_trim())
+        - number of simulations of the null distribution, seed, and directory of its disk cache (see sup_f_null())
+Outputs:
+        - ndarray of shape (equations,) with the sup-F (Wald) statistics, the largest k*F
+        - ndarray of shape (equations,) with the breaks where they are reached
+        - ndarray of shape (equations,) with the p-values, (1 + simulations at least as large)/(1 + simulations)
+        - the trimming used
+"""
+def sup_f_test(breaks, f_stats, T, k, trim=0.15, min_size=None, n_sim=20000, seed=0, cache_dir=None):
+    trim = sup_f_trim(T, k, trim, min_size)
+    inside = (breaks >= trim*T) & (breaks <= (1 - trim)*T)
+    if not inside.any():
+        raise ValueError("No candidate break between " + str(trim) + " and " + str(1 - trim) + " of the sample")
+    wald = k*f_stats[inside]
+    best = np.argmax(wald, axis=0)
+    sup = wald[best, np.arange(wald.shape[1])]
+    null = sup_f_null(k, trim, n_sim, seed=seed, cache_dir=cache_dir)
+    p_values = (1 + len(null) - np.searchsorted(null, sup, side='left'))/(1 + len(null))
+    return sup, breaks[inside][best], p_values, trim
+
+"""
+sup_f_statistic() computes the sup-F (Wald) statistics of an autoregression or a VAR (an autoregression is a VAR of one
+variable) of a series.
+
+Inputs:
+        - ndarray of shape (n, variables) with the series
+        - lag
+        - trimming and minimum number of observations on each side of a break (see sup_f_test())
+Outputs:
+        - ndarray of shape (variables,) with the statistics
+"""
+def sup_f_statistic(values, lag, trim=0.15, min_size=None):
+    Z, Y = var_regressors(values, lag)
+    breaks, f_stats, _ = chow_scan(Z, Y, min_size)
+    trim = sup_f_trim(len(Z), Z.shape[1], trim, min_size)
+    inside = (breaks >= trim*len(Z)) & (breaks <= (1 - trim)*len(Z))
+    return Z.shape[1]*f_stats[inside].max(axis=0)
+
+"""
+sup_f_bootstrap() gives residual-bootstrap p-values of the sup-F test of an autoregression or a VAR, under the null of
+no break.
+
+Inputs:
+        - ndarray of shape (n, variables) with the series
+        - lag
+        - trimming and minimum number of observations on each side of a break (see sup_f_test())
+        - number of replicates and seed
+Outputs:
+        - ndarray of shape (variables,) with the p-values, (1 + replicates at least as large)/(1 + replicates)
+"""
+def sup_f_bootstrap(values, lag, trim=0.15, min_size=None, n_boot=999, seed=0):
+    values = np.asarray(values, dtype=float)
+    rng = np.random.default_rng(seed)
+
+    # Pooled fit (no break), and series simulated from it with resampled residuals
+    params, _ = refit_var(values[None], lag)
+    Z, Y = var_regressors(values, lag)
+    resid = Y - Z @ params[0]
+    resid = resid - resid.mean(axis=0)
+    shocks = resid[rng.integers(len(resid), size=(n_boot, len(resid)))]
+    replicates = simulate_var(params[0], shocks, values[:lag])
+
+    sup = sup_f_statistic(values, lag, trim, min_size)
+    boot = np.array([sup_f_statistic(series, lag, trim, min_size) for series in replicates])
+    return (1 + (boot >= sup).sum(axis=0))/(1 + n_boot)
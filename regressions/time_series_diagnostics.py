@@ -0,0 +1,95 @@
+# Imports
+from era_segmentation import load_eras
+from var_order_selection import select_var_order
+from diagnostics import era_series, diagnostic_table, flagged_fits
+import pandas as pd
+import os
+
+"""
+time_series_diagnostics.py runs the diagnostic battery of diagnostics.py (ADF, KPSS, Ljung-Box and Jarque-Bera) on every
+feature of every era, for four variants of the series:
+
+        - 'raw': the unsmoothed time series
+        - 'smoothed': the (normalized) smoothed time series
+        - 'AR residual': the autoregression residuals of autoregression_residuals.py
+        - 'VAR residual': the residuals of the VAR of each era (order selected by BIC, as in vector_autoregression.py)
+
+The tests run in a process pool, and the results are cached per series, so re-running after a change only tests the
+series that changed. autoregression_residuals.py and vector_autoregression.py read the same cache to flag invalid fits.
+
+You need to specify the root directory, and run autoregression_residuals.py first. The eras are derived from the
+changepoint analysis (see era_segmentation.py).
+
+Inputs:
+        - .csv's of the unsmoothed and (normalized) smoothed time series
+        - .csv with the era boundaries (see tally_changepoints.py)
+        - .csv's of the autoregression residuals (one per era)
+Outputs:
+        - .csv with the tidy table of the results (one row per variant, era, feature and test)
+"""
+
+"""
+DIRECTORIES
+"""
+
+# SPECIFY ROOT DIRECTORY
+base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
+
+# Directories of the unsmoothed and (normalized) smoothed time series
+raw_filename = os.path.join(base_dir, "output_data/time_series/unsmoothed_time_series.csv")
+ts_filename = os.path.join(base_dir, "output_data/time_series/norm_time_series.csv")
+
+# Directory of the era boundaries (the changepoints found by the changepoint analysis)
+era_boundaries_filename = os.path.join(base_dir, "output_data/changepoints/era_boundaries.csv")
+
+# Directories of the autoregression residuals ({} is the era number)
+resid_dir = os.path.join(base_dir, "output_data/reg_results/residuals/era_{}_residuals.csv")
+
+# Directory of the cached lag order selections (shared with vector_autoregression.py)
+order_cache_dir = os.path.join(base_dir, "output_data/reg_results/VAR/order_cache")
+
+# Directory of the cached diagnostics (shared with autoregression_residuals.py and vector_autoregression.py)
+diagnostics_cache_dir = os.path.join(base_dir, "output_data/reg_results/diagnostics_cache")
+
+# Directory for the results
+diagnostics_filename = os.path.join(base_dir, "output_data/reg_results/time_series_diagnostics.csv")
+
+"""
+PARAMETERS
+"""
+
+# Significance level of the tests
+alpha = 0.05
+# Number of worker processes (None for one per CPU)
+n_jobs = None
+
+"""
+The worker processes import this script on macOS and Windows, so everything runs under the main guard.
+"""
+if __name__ == "__main__":
+
+    """
+    DATA PREPARATION
+    """
+
+    raw_eras, _ = load_eras(raw_filename, era_boundaries_filename)
+    eras, era_years = load_eras(ts_filename, era_boundaries_filename)
+    features = list(eras[0].columns)
+    ar_residuals = [pd.read_csv(resid_dir.format(i+1))[features] for i in range(len(eras))]
+    var_residuals = [pd.DataFrame(select_var_order(era[features].to_numpy(), 'bic', cache_dir=order_cache_dir)['resid'],
+                                  columns=features) for era in eras]
+
+    """
+    ANALYSIS
+    """
+
+    labels, series = [], []
+    for variant, variant_eras in [('raw', raw_eras), ('smoothed', eras), ('AR residual', ar_residuals),
+                                  ('VAR residual', var_residuals)]:
+        variant_labels, variant_series = era_series(variant_eras, variant)
+        labels += variant_labels
+        series += variant_series
+
+    diagnostics_df = diagnostic_table(labels, series, alpha, n_jobs, diagnostics_cache_dir)
+    print(flagged_fits(diagnostics_df))
+    diagnostics_df.to_csv(diagnostics_filename, index = False)
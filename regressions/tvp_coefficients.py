@@ -0,0 +1,134 @@
+# Imports
+from rolling_var import var_regressors
+from tvp_regression import fit_tvp
+import numpy as np
+import pandas as pd
+import os
+
+"""
+tvp_coefficients.py fits time-varying-parameter (TVP) models over the whole (normalized) time series, as an alternative to
+the hard eras: the coefficients drift from year to year as random walks, estimated by the Kalman filter and smoother
+(see tvp_regression.py). Two models are fitted:
+
+        - 'AR': the autoregression of each feature (constant and its own lags)
+        - 'VAR': each equation of a VAR of all features
+
+The ratio of the drift variance of the fitted values to the noise variance sigma2 is estimated per equation (sigma2 is
+profiled out of the likelihood), with an exponential prior that keeps the coefficients from absorbing the noise. The
+plain maximum-likelihood ratio (without the prior) is estimated too and saved next to it, to show how much the prior
+decides; the coefficients are smoothed with the ratio under the prior. The estimation starts from a grid of ratios
+whose log-likelihoods are saved too, so the sensitivity to the ratio (and to the prior) can be checked without
+refitting. A small ratio means the coefficients barely change, i.e. a single model
+fits the whole series. Ratios on the bounds of the search are flagged in the hyperparameter table.
+
+The series are 1952 - 2020 (the smoothing leaves the first and last two years N/A). You need to specify the root
+directory.
+
+Inputs:
+        - .csv of the (normalized) smoothed time series
+Outputs:
+        - .csv with the smoothed coefficients (and their standard errors) of every model, equation and year
+        - .csv with the estimated hyperparameters and log-likelihood of every equation, under the prior and without it
+        - .npz with the log-likelihood grids (ratio x equation) of each model
+"""
+
+"""
+DIRECTORIES
+"""
+
+# SPECIFY ROOT DIRECTORY
+base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
+
+# Directory of the (normalized) smoothed time series
+ts_filename = os.path.join(base_dir, "output_data/time_series/norm_time_series.csv")
+
+# Directories for the results
+coefficients_filename = os.path.join(base_dir, "output_data/reg_results/tvp_coefficients.csv")
+hyperparameters_filename = os.path.join(base_dir, "output_data/reg_results/tvp_hyperparameters.csv")
+grid_filename = os.path.join(base_dir, "output_data/reg_results/tvp_likelihood_grid.npz")
+
+"""
+PARAMETERS
+"""
+
+# Lags of the autoregressions and of the VAR. Every coefficient drifts, and the first k observations (k coefficients)
+# only identify the starting coefficients, so the lag is kept short rather than selected: on the full series BIC picks
+# a VAR lag of 6 (see var_order_selection.py), i.e. 49 coefficients per equation for 63 observations. At lag 1 the
+# likelihood has 59 observations per VAR equation, at lag 2 50. The AR models use the same lag, so their own-lag
+# coefficients can be compared with those of the VAR equations.
+ar_lag = 1
+var_lag = 1
+# Mean of the prior of the ratio (drift variance of the fitted values / sigma2): a priori, the fitted values drift by
+# less than the noise from one year to the next. Without it, the likelihood is highest where the coefficients follow
+# the data year by year (ratios of about 1e3). Set to None to smooth with the maximum-likelihood ratios instead
+prior_mean = 1.0
+# Bounds of the ratio and number of grid points between them (wide enough for the maximum-likelihood ratios)
+ratio_bounds = (1e-6, 1e4)
+n_grid = 21
+
+"""
+DATA PREPARATION
+"""
+
+ts_df = pd.read_csv(ts_filename).dropna().reset_index(drop=True)
+features = list(ts_df.columns[1:])
+values = ts_df[features].to_numpy()
+years = ts_df['Year'].to_numpy()
+
+"""
+ANALYSIS
+"""
+
+"""
+The autoregressions have different regressors per feature, stacked as (year, feature, coefficient); the VAR equations
+share theirs. Either way, all equations are filtered together.
+"""
+
+ar_regressors = [var_regressors(values[:, [i]], ar_lag) for i in range(len(features))]
+ar_Z = np.stack([Z for Z, _ in ar_regressors], axis=1)
+ar_Y = np.concatenate([Y for _, Y in ar_regressors], axis=1)
+ar_predictors = [['const'] + [feature + '_lag_' + str(l) for l in range(1, ar_lag + 1)] for feature in features]
+
+var_Z, var_Y = var_regressors(values, var_lag)
+var_predictor_names = ['const'] + [feature + '_lag_' + str(l) for l in range(1, var_lag + 1) for feature in features]
+var_predictors = [var_predictor_names]*len(features)
+
+coefficient_dfs = []
+hyperparameter_dfs = []
+grids = {}
+for model, lag, Z, Y, predictors in [('AR', ar_lag, ar_Z, ar_Y, ar_predictors),
+                                     ('VAR', var_lag, var_Z, var_Y, var_predictors)]:
+    fit = fit_tvp(Z, Y, prior_mean, ratio_bounds, n_grid)
+    mle_fit = fit_tvp(Z, Y, None, ratio_bounds, n_grid)
+    grids[model] = fit['grid']
+    ratio_grid = fit['ratio_grid']
+
+    # Observation t of the regression is row t + lag of the series
+    fit_years = years[lag:]
+    for j in range(len(features)):
+        n_coefs = len(predictors[j])
+        coefficient_dfs.append(pd.DataFrame({'Model': model, 'Dependent': features[j],
+                                             'Predictor': np.tile(predictors[j], len(fit_years)),
+                                             'Year': np.repeat(fit_years, n_coefs),
+                                             'Coefficient': fit['coefficients'][:, j].ravel(),
+                                             'Std Error': fit['std_errors'][:, j].ravel()}))
+    hyperparameter_dfs.append(pd.DataFrame({'Model': model, 'Dependent': features, 'sigma2': fit['sigma2'],
+                                            'Ratio': fit['ratio'], 'At Bound': fit['at_bound'],
+                                            'Log-Likelihood': fit['loglik'], 'MLE Ratio': mle_fit['ratio'],
+                                            'MLE At Bound': mle_fit['at_bound'],
+                                            'MLE Log-Likelihood': mle_fit['loglik']}))
+
+coefficients_df = pd.concat(coefficient_dfs, ignore_index=True)
+hyperparameters_df = pd.concat(hyperparameter_dfs, ignore_index=True)
+print(hyperparameters_df)
+
+# A ratio on the upper bound means the prior does not keep the coefficients from absorbing the noise; on the lower
+# bound, the coefficients are constant
+bound_df = hyperparameters_df[hyperparameters_df['At Bound'] != '']
+if len(bound_df):
+    print("Ratio estimates on a bound of the search:")
+    print(bound_df)
+
+coefficients_df.to_csv(coefficients_filename, index = False)
+hyperparameters_df.to_csv(hyperparameters_filename, index = False)
+np.savez(grid_filename, ar_grid=grids['AR'], var_grid=grids['VAR'], ratio_grid=ratio_grid, features=np.array(features))
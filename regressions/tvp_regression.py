@@ -0,0 +1,197 @@
+# Imports
+import numpy as np
+import scipy.optimize
+
+"""
+tvp_regression.py fits time-varying-parameter (TVP) regressions with the Kalman filter and smoother, as an alternative to
+fitting separate models on hard eras. Each coefficient follows a random walk:
+
+        y_t = z_t' b_t + e_t,          e_t ~ N(0, sigma2)
+        b_t = b_(t-1) + u_t,           u_t ~ N(0, sigma2 ratio D)
+
+so the coefficients can drift (ratio > 0) instead of jumping at the era boundaries. ratio = 0 gives a regression with
+constant coefficients. D is diagonal, with D_jj = 1/(k mean(z_j^2)), so every coefficient (the constant included) moves
+the fitted values by the same amount, and ratio is the yearly drift variance of the fitted values relative to the noise
+variance. sigma2 is profiled out of the likelihood, so only ratio is estimated per equation, by maximum a posteriori
+with an exponential prior, between bounds that are reported when an estimate reaches them.
+
+Many regressions are filtered at once: the equations of a VAR (which share their regressors), the autoregressions of all
+features, or one equation under a grid of ratios. The states and covariance matrices of all of them are stacked, so each
+year is one batched update. The filter starts from a diffuse prior (b_0 = 0 with a large variance), and the likelihood
+leaves out the first k observations (k coefficients), which only identify the starting coefficients.
+
+Batches are indexed (..., equation): the regressors are an ndarray of shape (T, k) shared by all equations, or
+(T, equations, k), and the targets an ndarray of shape (T, equations).
+"""
+
+"""
+kalman_filter() runs the Kalman filter of a batch of TVP regressions.
+
+Inputs:
+        - ndarray of shape (T, k) or (T, equations, k) with the regressors
+        - ndarray of shape (T, equations) with the targets
+        - ndarray of shape (equations,) with sigma2, and of shape (equations,) or (equations, k) with the variances q of
+          the coefficient drifts
+        - variance of the diffuse prior of the coefficients
+Outputs:
+        - dictionary with 'states' (T, equations, k) and 'covariances' (T, equations, k, k) of the filtered coefficients,
+          'predicted_covariances' (T, equations, k, k), and 'loglik', 'sum_log_f' and 'sum_scaled_sq' (equations,),
+          the sums of log F_t and v_t^2/F_t over the observations in the likelihood (v_t the innovations, F_t their
+          variances)
+"""
+def kalman_filter(Z, Y, sigma2, q, init_var=1e4):
+    T, n_eq = Y.shape
+    Z = np.broadcast_to(Z[:, None, :] if Z.ndim == 2 else Z, (T, n_eq, Z.shape[-1]))
+    k = Z.shape[-1]
+    sigma2 = np.broadcast_to(np.asarray(sigma2, dtype=float), (n_eq,))
+    q = np.asarray(q, dtype=float)
+    q_eye = np.broadcast_to(q if q.ndim == 2 else q[..., None], (n_eq, k))[..., None]*np.eye(k)
+
+    b = np.zeros((n_eq, k))
+    P = np.broadcast_to(init_var*np.eye(k), (n_eq, k, k))
+    states = np.empty((T, n_eq, k))
+    covariances = np.empty((T, n_eq, k, k))
+    predicted = np.empty((T, n_eq, k, k))
+    sum_log_f = np.zeros(n_eq)
+    sum_scaled_sq = np.zeros(n_eq)
+    for t in range(T):
+        # Predict: the coefficients are a random walk, so only their covariance changes
+        P_pred = P + q_eye if t > 0 else P
+        z = Z[t]
+        Pz = np.einsum('eij,ej->ei', P_pred, z)
+        F = (Pz*z).sum(axis=-1) + sigma2
+        v = Y[t] - (b*z).sum(axis=-1)
+
+        # Update all equations at once
+        K = Pz/F[:, None]
+        b = b + K*v[:, None]
+        P = P_pred - K[:, :, None]*Pz[:, None, :]
+        if t >= k:
+            sum_log_f += np.log(F)
+            sum_scaled_sq += v**2/F
+
+        states[t], covariances[t], predicted[t] = b, P, P_pred
+    loglik = -0.5*((T - k)*np.log(2*np.pi) + sum_log_f + sum_scaled_sq)
+    return {'states': states, 'covariances': covariances, 'predicted_covariances': predicted, 'loglik': loglik,
+            'sum_log_f': sum_log_f, 'sum_scaled_sq': sum_scaled_sq}
+
+"""
+kalman_smoother() runs the Rauch-Tung-Striebel smoother on the output of kalman_filter().
+
+Inputs:
+        - dictionary from kalman_filter()
+Outputs:
+        - ndarray of shape (T, equations, k) with the smoothed coefficients
+        - ndarray of shape (T, equations, k, k) with their covariance matrices
+"""
+def kalman_smoother(filtered):
+    states = filtered['states'].copy()
+    covariances = filtered['covariances'].copy()
+    predicted = filtered['predicted_covariances']
+    for t in range(len(states) - 2, -1, -1):
+        # J = P_t P_pred(t+1)^-1, from a batched solve (both matrices are symmetric)
+        J = np.linalg.solve(predicted[t + 1], filtered['covariances'][t]).transpose(0, 2, 1)
+        states[t] = states[t] + np.einsum('eij,ej->ei', J, states[t + 1] - filtered['states'][t])
+        covariances[t] = covariances[t] + J @ (covariances[t + 1] - predicted[t + 1]) @ J.transpose(0, 2, 1)
+    return states, covariances
+
+"""
+drift_scales() computes the relative drift variances D_jj = 1/(k mean(z_j^2)) of the coefficients, so that each of them
+moves the fitted values by the same amount.
+
+Inputs:
+        - regressors (see kalman_filter())
+Outputs:
+        - ndarray of shape (k,) or (equations, k) with the scales
+"""
+def drift_scales(Z):
+    return 1/(Z.shape[-1]*np.mean(Z**2, axis=0))
+
+"""
+profile_loglik() filters a batch of TVP regressions with sigma2 profiled out: with sigma2 = 1 and drift variances
+ratio D, the innovation variances F_t are in units of sigma2, whose maximum-likelihood estimate is the mean of
+v_t^2/F_t. The prior variance is in units of sigma2 too.
+
+Inputs:
+        - regressors and targets (see kalman_filter())
+        - ndarray of shape (equations,) with the ratios
+        - variance of the diffuse prior, in units of sigma2
+Outputs:
+        - ndarray of shape (equations,) with the profile log-likelihoods
+        - ndarray of shape (equations,) with the estimates of sigma2
+        - dictionary from kalman_filter(), in units of sigma2
+"""
+def profile_loglik(Z, Y, ratio, init_var=1e4):
+    n_eq = Y.shape[1]
+    n_obs = Y.shape[0] - Z.shape[-1]
+    q = np.asarray(ratio, dtype=float)[:, None]*np.broadcast_to(drift_scales(Z), (n_eq, Z.shape[-1]))
+    filtered = kalman_filter(Z, Y, np.ones(n_eq), q, init_var)
+    sigma2 = filtered['sum_scaled_sq']/n_obs
+    loglik = -0.5*(n_obs*(np.log(2*np.pi*sigma2) + 1) + filtered['sum_log_f'])
+    return loglik, sigma2, filtered
+
+"""
+likelihood_grid() computes the profile log-likelihood of every equation under every ratio, with all ratios filtered as
+one batch.
+
+Inputs:
+        - regressors and targets (see kalman_filter())
+        - 1D ndarray of the ratios to try
+        - variance of the diffuse prior, in units of sigma2
+Outputs:
+        - ndarray of shape (ratios, equations) with the log-likelihoods
+"""
+def likelihood_grid(Z, Y, ratio_grid, init_var=1e4):
+    n_eq = Y.shape[1]
+    n_grid = len(ratio_grid)
+    # Tile the equations over the grid: batch index is grid point * equations + equation
+    Z_tiled = np.tile(np.broadcast_to(Z[:, None, :], Y.shape + Z.shape[-1:]) if Z.ndim == 2 else Z, (1, n_grid, 1))
+    Y_tiled = np.tile(Y, (1, n_grid))
+    ratio = np.repeat(ratio_grid, n_eq)
+    loglik, _, _ = profile_loglik(Z_tiled, Y_tiled, ratio, init_var)
+    return loglik.reshape(n_grid, n_eq)
+
+"""
+fit_tvp() estimates the ratio of every equation, and smooths the coefficients. On smoothed series the likelihood keeps
+increasing up to ratios of the order of 1e3, where the coefficients follow the data year by year and sigma2 goes to 0,
+so the ratio can have an exponential prior, and the estimate then maximizes the profile log-likelihood minus
+ratio/prior_mean (with prior_mean=None, it is the plain maximum of the profile likelihood). This is maximized from
+the best point of a grid (see likelihood_grid()) with L-BFGS-B over the log ratios of all equations at once (the
+objective is a sum over the equations, so this is the same as fitting them separately).
+
+Estimates on a bound of the search are flagged in 'at_bound' ('lower' or 'upper', '' otherwise): at the lower bound the
+coefficients are constant, at the upper bound they absorb the noise (the prior, if any, is too weak).
+
+Inputs:
+        - regressors and targets (see kalman_filter())
+        - mean of the exponential prior of the ratio (None for no prior)
+        - lower and upper bounds of the ratio
+        - number of points of the (log-spaced) grid of ratios between the bounds
+        - variance of the diffuse prior, in units of sigma2
+Outputs:
+        - dictionary with 'ratio', 'sigma2', 'at_bound' and 'loglik' (without the prior) (equations,), the drift
+          variances 'q' of the coefficients (equations, k), the smoothed 'coefficients' (T, equations, k) and their
+          'std_errors' (T, equations, k), the 'ratio_grid' and the 'grid' of log-likelihoods (ratios, equations)
+"""
+def fit_tvp(Z, Y, prior_mean=1.0, ratio_bounds=(1e-6, 1e4), n_grid=21, init_var=1e4):
+    n_eq = Y.shape[1]
+    log_bounds = np.log(ratio_bounds)
+    ratio_grid = np.exp(np.linspace(log_bounds[0], log_bounds[1], n_grid))
+
+    # Log-density of the prior of the ratio, up to a constant
+    penalty = (lambda ratio: 0*ratio) if prior_mean is None else (lambda ratio: ratio/prior_mean)
+
+    grid = likelihood_grid(Z, Y, ratio_grid, init_var)
+    start = np.log(ratio_grid[np.argmax(grid - penalty(ratio_grid[:, None]), axis=0)])
+    negative_posterior = lambda theta: (penalty(np.exp(theta)) - profile_loglik(Z, Y, np.exp(theta), init_var)[0]).sum()
+    result = scipy.optimize.minimize(negative_posterior, start, method='L-BFGS-B', bounds=[tuple(log_bounds)]*n_eq)
+    ratio = np.exp(result.x)
+    at_bound = np.where(np.isclose(result.x, log_bounds[0], atol=1e-3), 'lower',
+                        np.where(np.isclose(result.x, log_bounds[1], atol=1e-3), 'upper', ''))
+
+    loglik, sigma2, filtered = profile_loglik(Z, Y, ratio, init_var)
+    coefficients, covariances = kalman_smoother(filtered)
+    std_errors = np.sqrt(sigma2[:, None]*np.diagonal(covariances, axis1=-2, axis2=-1))
+    q = (sigma2*ratio)[:, None]*np.broadcast_to(drift_scales(Z), (n_eq, Z.shape[-1]))
+    return {'ratio': ratio, 'sigma2': sigma2, 'at_bound': at_bound, 'loglik': loglik, 'q': q,
+            'coefficients': coefficients, 'std_errors': std_errors, 'ratio_grid': ratio_grid, 'grid': grid}
@@ -0,0 +1,68 @@
+# Imports
+from rolling_var import rolling_backtest, forecast_errors
+import pandas as pd
+import os
+
+"""
+var_backtest.py backtests VAR forecasts over the whole (normalized) smoothed time series. The only out-of-sample check in
+var_forecasts.py is the 2023 forecast of the Era 3 VAR; here, every year from 1967 onwards is forecast from the years
+before it, 1 ... horizon years ahead, with an expanding or a rolling window (see rolling_var.py). The VAR fits are
+updated by recursive least squares as the origin moves forward, in one pass over the origins.
+
+You need to specify the root directory.
+
+Inputs:
+        - .csv of the (normalized) smoothed time series
+Outputs:
+        - .csv with every backtest forecast and its error
+        - .csv with the forecast errors per feature and horizon
+"""
+
+"""
+DIRECTORIES
+"""
+
+# SPECIFY ROOT DIRECTORY
+base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
+
+# Directory of the (normalized) smoothed time series
+ts_filename = os.path.join(base_dir, "output_data/time_series/norm_time_series.csv")
+
+# Directories for the backtest results
+backtest_forecasts_filename = os.path.join(base_dir, "output_data/reg_results/VAR/var_backtest_forecasts.csv")
+backtest_errors_filename = os.path.join(base_dir, "output_data/reg_results/VAR/var_backtest_errors.csv")
+
+"""
+PARAMETERS
+"""
+
+# VAR lag. Each equation has 1 + 8*lag coefficients, and the first fits only have min_train observations, so only lag 1
+# leaves enough degrees of freedom (lag 2 needs at least 17)
+lag = 1
+# Forecast horizons 1 ... horizon years
+horizon = 3
+# Expanding window: the first origin uses this many observations
+min_train = 15
+# Rolling window: number of observations each fit uses (None for an expanding window)
+window = None
+
+"""
+DATA PREPARATION
+"""
+
+ts_df = pd.read_csv(ts_filename).dropna().reset_index(drop=True)
+features = list(ts_df.columns[1:])
+values = ts_df[features].to_numpy()
+years = ts_df['Year'].to_numpy()
+
+"""
+ANALYSIS
+"""
+
+origins, forecasts = rolling_backtest(values, lag, horizon, min_train, window)
+forecast_df, error_df = forecast_errors(values, origins, forecasts, features, years)
+
+print(error_df.sort_values(['Feature', 'Horizon']))
+
+forecast_df.to_csv(backtest_forecasts_filename, index = False)
+error_df.to_csv(backtest_errors_filename, index = False)
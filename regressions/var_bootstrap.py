@@ -0,0 +1,67 @@
+# Imports
+from var_irf import simulate_var, refit_var
+import numpy as np
+
+"""
+var_bootstrap.py simulates bootstrap forecast paths from a fitted VAR, for forecast intervals. The intervals include the
+uncertainty of the coefficients as well as that of the future shocks: every replicate simulates a series from the fitted
+VAR with resampled residuals, refits the VAR on it (see var_irf.py), and iterates its own coefficients forward from the
+last observations, adding a residual drawn (with replacement) at every step. Residual vectors are drawn whole, so the
+correlation between the equations' errors is kept.
+
+The residuals are centred and scaled by sqrt(T/(T - k)) (T residuals per equation, k coefficients per equation), since
+least-squares residuals are smaller than the errors, by a lot when an era has few observations per coefficient.
+
+All paths are simulated together: each step is one stacked (paths x regressors) @ (regressors x variables) product, so
+there is no loop over paths. The intervals are percentiles of the simulated values.
+"""
+
+"""
+bootstrap_paths() simulates forecast paths.
+
+Inputs:
+        - ndarray of shape (observations, variables) with the time series the VAR was fitted on
+        - coefficients of shape (1 + lag*variables, variables), in the order of statsmodels' VAR params (constant, lag 1
+          of every variable, lag 2, ...)
+        - ndarray of shape (observations - lag, variables) with the model residuals
+        - horizon
+        - number of paths
+        - seed or numpy Generator
+Outputs:
+        - ndarray of shape (paths, horizon, variables)
+"""
+def bootstrap_paths(values, coefs, residuals, horizon, n_paths=5000, seed=0):
+    values = np.asarray(values, dtype=float)
+    coefs = np.asarray(coefs, dtype=float)
+    residuals = np.asarray(residuals, dtype=float)
+    n_obs, n_vars = residuals.shape
+    residuals = (residuals - residuals.mean(axis=0))*np.sqrt(n_obs/(n_obs - coefs.shape[0]))
+    lag = (coefs.shape[0] - 1)//n_vars
+    rng = np.random.default_rng(seed)
+
+    # Re-estimate the coefficients on a simulated series per path
+    shocks = residuals[rng.integers(n_obs, size=(n_paths, n_obs))]
+    path_coefs, _ = refit_var(simulate_var(coefs, shocks, values[:lag]), lag)
+
+    draws = residuals[rng.integers(n_obs, size=(n_paths, horizon))]
+    # Regressors of every path: [1, y_{t-1}, ..., y_{t-lag}]
+    state = np.tile(values[len(values) - lag:][::-1].ravel(), (n_paths, 1))
+    paths = np.zeros((n_paths, horizon, n_vars))
+    for h in range(horizon):
+        paths[:, h] = path_coefs[:, 0] + (state[:, None, :] @ path_coefs[:, 1:])[:, 0] + draws[:, h]
+        state = np.concatenate([paths[:, h], state], axis=1)[:, :lag*n_vars]
+    return paths
+
+"""
+forecast_intervals() gives the percentile intervals of simulated paths.
+
+Inputs:
+        - ndarray of shape (paths, horizon, variables)
+        - coverage of the intervals (e.g. 0.95 for the 2.5th - 97.5th percentiles)
+Outputs:
+        - ndarray of shape (horizon, variables) with the lower bounds
+        - ndarray of shape (horizon, variables) with the upper bounds
+"""
+def forecast_intervals(paths, level=0.95):
+    lower, upper = np.quantile(paths, [(1 - level)/2, (1 + level)/2], axis=0)
+    return lower, upper
@@ -0,0 +1,136 @@
+# Imports
+import numpy as np
+import pandas as pd
+
+"""
+var_coefficients.py extracts the significant coefficients of a fitted VAR and computes VAR fitted values from a table of
+coefficients.
+
+coefficient_table() reads the coefficients straight from the parameter and p-value arrays of a fitted VAR (e.g. the fit
+of select_var_order() in var_order_selection.py, or a statsmodels VARResults' params and pvalues), replacing the
+hand-copying of coefficients from the printed summary. The table has one row per coefficient:
+Dependent, Predictor, Lag (0 for the constant), Coefficient and p-value, the schema of the era_*_var_coefficients.csv
+files.
+
+For the fitted values, a coefficient table is turned into a constant vector and a (lag, dependent, predictor) coefficient
+tensor, and all equations are evaluated at once as one product of the tensor with the lagged data. As in the original
+compute_model_values(), only the listed coefficients are used, and the first values of an equation (as many as its
+largest lag) are filled in with the original values.
+"""
+
+"""
+coefficient_table() lists the coefficients of a fitted VAR.
+
+Inputs:
+        - ndarray of shape (1 + lag*variables, variables) with the coefficients, in the order of statsmodels' VAR params
+        - ndarray of the same shape with the p-values
+        - list of the variable names
+        - significance level: only coefficients with a p-value below it are kept (None keeps all of them)
+Outputs:
+        - DataFrame with columns Dependent, Predictor, Lag, Coefficient and p-value, ordered by dependent, then as in the
+          statsmodels parameter table (constant first, then lag 1 of every variable, lag 2, ...)
+"""
+def coefficient_table(params, p_values, names, alpha=0.05):
+    params = np.asarray(params)
+    p_values = np.asarray(p_values)
+    names = list(names)
+    n_vars = len(names)
+    k_ar = (params.shape[0] - 1)//n_vars
+
+    # Parameter rows: 'const', then 'L<lag>.<variable>' for lags 1 ... k_ar
+    lags = np.concatenate([[0], np.repeat(np.arange(1, k_ar + 1), n_vars)])
+    predictors = np.array(['const'] + names*k_ar, dtype=object)
+
+    # One row per (dependent, parameter): dependents vary slowest
+    dep_idx, param_idx = np.meshgrid(np.arange(n_vars), np.arange(len(lags)), indexing='ij')
+    table = pd.DataFrame({'Dependent': np.array(names, dtype=object)[dep_idx.ravel()],
+                          'Predictor': predictors[param_idx.ravel()], 'Lag': lags[param_idx.ravel()],
+                          'Coefficient': params.T.ravel(), 'p-value': p_values.T.ravel()})
+    if alpha is not None:
+        table = table[table['p-value'] < alpha].reset_index(drop=True)
+    return table
+
+"""
+coefficient_tensor() turns a coefficient table into arrays.
+
+Inputs:
+        - DataFrame of coefficients (Dependent, Predictor, Lag, Coefficient)
+        - list of the variables (the columns of the time series)
+Outputs:
+        - list of the dependents in the table, in order of appearance
+        - ndarray of shape (dependents,) with the constants
+        - ndarray of shape (max lag, dependents, variables) with the lag coefficients
+        - ndarray of shape (dependents,) with the largest lag of each equation
+Raises ValueError if a dependent or predictor is not one of the variables.
+"""
+def coefficient_tensor(coef_data, variables):
+    dependents = list(coef_data['Dependent'].unique())
+    unknown = [name for name in dependents if name not in list(variables)]
+    dep_idx = pd.Index(dependents).get_indexer(coef_data['Dependent'])
+    lags = coef_data['Lag'].to_numpy(dtype=int)
+    values = coef_data['Coefficient'].to_numpy(dtype=float)
+    is_const = lags == 0
+
+    const = np.zeros(len(dependents))
+    np.add.at(const, dep_idx[is_const], values[is_const])
+
+    max_lag = max(int(lags.max()), 1)
+    pred_idx = pd.Index(list(variables)).get_indexer(coef_data.loc[~is_const, 'Predictor'])
+    # get_indexer gives -1 for unknown names, which would silently index the last variable
+    unknown += list(coef_data.loc[~is_const, 'Predictor'][pred_idx < 0].unique())
+    if unknown:
+        raise ValueError("Unknown variables in the coefficient table: " + ", ".join(map(str, unknown)))
+    coefs = np.zeros((max_lag, len(dependents), len(variables)))
+    np.add.at(coefs, (lags[~is_const] - 1, dep_idx[~is_const], pred_idx), values[~is_const])
+
+    heads = np.zeros(len(dependents), dtype=int)
+    np.maximum.at(heads, dep_idx, lags)
+    return dependents, const, coefs, heads
+
+"""
+lagged_data() stacks the lags 1 ... max_lag of a time series (the first 'lag' rows of lag 'lag' are 0; they are never
+used).
+
+Inputs:
+        - ndarray of shape (n, variables)
+        - maximum lag
+Outputs:
+        - ndarray of shape (max_lag, n, variables)
+"""
+def lagged_data(values, max_lag):
+    n = values.shape[0]
+    lagged = np.zeros((max_lag,) + values.shape)
+    for lag in range(1, max_lag + 1):
+        lagged[lag-1, lag:] = values[:n - lag]
+    return lagged
+
+"""
+var_fitted_values() computes the fitted values of every equation in a coefficient table, and their nRMSEs (see
+nrmse_range() in regression_helper.py).
+
+Inputs:
+        - DataFrame with the original (normalized) time series
+        - DataFrame with the VAR coefficients
+Outputs:
+        - list of the dependents
+        - ndarray of shape (n, dependents) with the original values
+        - ndarray of shape (n, dependents) with the fitted values (the first values of each equation, as many as its
+          largest lag, are the original values)
+        - ndarray of shape (dependents,) with the nRMSEs
+"""
+def var_fitted_values(ts_data, coef_data):
+    variables = list(ts_data.columns)
+    values = ts_data.to_numpy(dtype=float)
+    dependents, const, coefs, heads = coefficient_tensor(coef_data, variables)
+
+    # All equations at once: sum over lags and predictors of coefficient x lagged value
+    fitted = const + np.einsum('lnv,ldv->nd', lagged_data(values, coefs.shape[0]), coefs)
+
+    original = ts_data[dependents].to_numpy(dtype=float)
+    head = np.arange(len(values))[:, None] < heads
+    fitted = np.where(head, original, fitted)
+
+    # nRMSE over observations 1 ... n - 1, normalized by the range of the original values
+    rmse = np.sqrt(((original[1:] - fitted[1:])**2).mean(axis=0))
+    nrmses = rmse/(original.max(axis=0) - original.min(axis=0))
+    return dependents, original, fitted, nrmses
@@ -1,5 +1,6 @@
 # Imports
 from regression_helper import normalize, nrmse_range, compute_model_values
+from era_segmentation import load_eras
 from matplotlib.gridspec import GridSpec
 import matplotlib.pyplot as plt
 import pandas as pd
@@ -12,10 +13,10 @@ VAR fitted values and their nRMSEs are computed, the 3 best fits are selected, a
 
 Note: there is some manual editing here. A table of the VAR equations with their nRMSE values is printed, and then
 I picked the fits I wanted to visualize based on the nRMSE values I saw. Because of this, I'd recommend commenting out everything below the printing
-of the table when first running the code, and then editing that code to reflect the fits you want to visualize.
+of the table when first running the code, and then editing figure_fits to reflect the fits you want to visualize. The
+panels' years come from the eras, so only the choice of fits depends on the changepoint results.
 
-You need to specify the root directory. If you get changepoint results that indicate different eras, you will need to
-segment the time series manually.
+You need to specify the root directory. The eras are derived from the changepoint analysis (see era_segmentation.py).
 
 Inputs:
         - .csv with the (normalized) smoothed time series (the original values, against which the VAR fitted values will be compared)
@@ -30,10 +31,16 @@ base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
 # Directory for smoothed time series
 ts_filename = os.path.join(base_dir, "output_data/time_series/norm_time_series.csv")
 
-# Directory for the model coefficients
-era_1_model_filename = os.path.join(base_dir, "output_data/reg_results/VAR/era_1_var_coefficients.csv")
-era_2_model_filename = os.path.join(base_dir, "output_data/reg_results/VAR/era_2_var_coefficients.csv")
-era_3_model_filename = os.path.join(base_dir, "output_data/reg_results/VAR/era_3_var_coefficients.csv")
+# Directory of the era boundaries (the changepoints found by the changepoint analysis)
+era_boundaries_filename = os.path.join(base_dir, "output_data/changepoints/era_boundaries.csv")
+
+# Which VAR coefficients to use: 'ols' (significant OLS coefficients) or 'sparse' (penalized VARs)
+var_estimator = 'ols'
+
+# Directory for the model coefficients ({} is the era number)
+model_filenames = {'ols': os.path.join(base_dir, "output_data/reg_results/VAR/era_{}_var_coefficients.csv"),
+                   'sparse': os.path.join(base_dir, "output_data/reg_results/VAR/era_{}_sparse_var_coefficients.csv")}
+model_filename = model_filenames[var_estimator]
 
 # Directory for Fig 2.
 figure_2_filename = os.path.join(base_dir, "output_data/visualizations/var_best_fits.png")
@@ -41,20 +48,15 @@ figure_2_filename = os.path.join(base_dir, "output_data/visualizations/var_best_
 """
 DATA PREPARATION
 """
-# Read in the time series
-ts_df = pd.read_csv(ts_filename)
-# Drop the 'Year column'
-ts_df = ts_df.drop('Year', axis=1)
-
 # Segment the data into its eras
-era_1 = ts_df.iloc[0:25].dropna().reset_index(drop=True)
-era_2 = ts_df.iloc[25:50].dropna().reset_index(drop=True)
-era_3 = ts_df.iloc[50:].dropna().reset_index(drop=True)
+eras, era_years = load_eras(ts_filename, era_boundaries_filename)
+
+# Years of each era with values (the smoothing leaves the first and last two years of the series N/A)
+ts_years = pd.read_csv(ts_filename).dropna()['Year'].to_numpy()
+era_value_years = [[int(year) for year in ts_years if first <= year <= last] for first, last in era_years]
 
 # Model coefficients
-var_1_info = pd.read_csv(era_1_model_filename)
-var_2_info = pd.read_csv(era_2_model_filename)
-var_3_info = pd.read_csv(era_3_model_filename)
+var_infos = [pd.read_csv(model_filename.format(i+1)) for i in range(len(eras))]
 
 """
 ANALYSIS
@@ -65,76 +67,33 @@ Determine the best fits to display for Figure 2 by creating tables which list th
 VAR fitted values for each feature.
 """
 
-era_1_model = compute_model_values(era_1, var_1_info)
-era_2_model = compute_model_values(era_2, var_2_info)
-era_3_model = compute_model_values(era_3, var_3_info)
-
-nrmses_1 = []
-for item in era_1_model.items():
-    era = 1
-    feature_name = item[0]
-    error = item[1][2]
-    nrmses_1.append([era, feature_name, error])
-
-nrmses_1_df = pd.DataFrame(nrmses_1, columns = ['Era', 'Feature', 'nRMSE'])
-
-nrmses_2 = []
-for item in era_2_model.items():
-    era = 2
-    feature_name = item[0]
-    error = item[1][2]
-    nrmses_2.append([era, feature_name, error])
-
-nrmses_2_df = pd.DataFrame(nrmses_2, columns = ['Era', 'Feature', 'nRMSE'])
-
-nrmses_3 = []
-for item in era_3_model.items():
-    era = 3
-    feature_name = item[0]
-    error = item[1][2]
-    nrmses_3.append([era, feature_name, error])
-
-nrmses_3_df = pd.DataFrame(nrmses_3, columns = ['Era', 'Feature', 'nRMSE'])
-nrmses_2_df = nrmses_2_df.append(nrmses_3_df)
-nrmses_1_df = nrmses_1_df.append(nrmses_2_df)
-nrmses_1_df = nrmses_1_df.sort_values('nRMSE')
-print(nrmses_1_df)
+era_models = [compute_model_values(eras[i], var_infos[i]) for i in range(len(eras))]
 
-"""
-It looks like Era 1 PIC, Era 2 TI-OD, and Era 3 ISO give the best fits (nRMSE = 0.11, 0.17, 0.19, respectively)
+# One row per equation of each era
+nrmse_dfs = []
+for i in range(len(era_models)):
+    nrmse_dfs.append(pd.DataFrame({'Era': i+1, 'Feature': list(era_models[i].keys()),
+                                   'nRMSE': [item[2] for item in era_models[i].values()]}))
+nrmses_df = pd.concat(nrmse_dfs, ignore_index=True).sort_values('nRMSE')
+print(nrmses_df)
 
-We need to visualize these to produce Figure 2 in the paper.
 """
+It looks like Era 1 PIC, Era 2 TI-OD, and Era 3 ISO give the best fits (nRMSE = 0.11, 0.17, 0.19, respectively)
 
+We need to visualize these to produce Figure 2 in the paper. Each panel is given by its era number and feature, with
+the y ticks and the position of the nRMSE box.
 """
-Get the original and fitted values for the three features
-"""
-
-# PIC Era 1
-pic_era_1_original = era_1_model['PIC'][0]
-pic_era_1_fitted = era_1_model['PIC'][1]
 
-# ISO Era 2
-iso_era_2_original = era_2_model['ISO'][0]
-iso_era_2_fitted = era_2_model['ISO'][1]
-
-# TI-OD Era 3
-ti_od_era_3_original = era_3_model['TI_OD'][0]
-ti_od_era_3_fitted = era_3_model['TI_OD'][1]
+figure_fits = [{'era': 1, 'feature': 'PIC', 'title': 'PIC', 'yticks': [0.55, 0.70, 0.85, 1.0], 'text_xy': (0.3, 0.95)},
+               {'era': 2, 'feature': 'ISO', 'title': 'ISO', 'yticks': [0.25, 0.35, 0.45, 0.55, 0.65],
+                'text_xy': (0.10, 0.88)},
+               {'era': 3, 'feature': 'TI_OD', 'title': 'TI-OD', 'yticks': [0.35, 0.6, 0.85, 1.10],
+                'text_xy': (0.37, 0.93)}]
 
 """
 Figure preparation
 """
 
-# Get the 3 nRMSE values and make strings for the figures
-pic_nrmse = round(era_1_model['PIC'][2], 2)
-ti_od_nrmse = round(era_3_model['TI_OD'][2], 2)
-iso_nrmse = round(era_2_model['ISO'][2], 2)
-
-pic_nrmse_string = 'nRMSE = ' + str(pic_nrmse)
-ti_od_nrmse_string = 'nRMSE = ' + str(ti_od_nrmse)
-iso_nrmse_string = 'nRMSE = ' + str(iso_nrmse)
-
 # Matplotlib settings
 plt.style.use('default')
 plt.rcParams['figure.dpi'] = 800
@@ -147,56 +106,31 @@ plt.rcParams['figure.constrained_layout.use'] = True
 
 # Initialize figure
 fig = plt.figure(constrained_layout=True, figsize=(6.5, 3.0))
-gs = GridSpec(2, 3, figure=fig)
-
-# X axis values and ticks for the plots
-# Era 1
-years_seg1 = list(range(1952, 1975))
-years_seg1_string = '1952-1974'
-years_seg1_ticks = [1955, 1965, 1975]
-# Era 2
-years_seg2 = list(range(1975, 2000))
-years_seg2_string = '1975-1999'
-years_seg2_ticks = [1975, 1985, 1995]
-# Era 3
-years_seg3 = list(range(2000, 2021))
-years_seg3_string = '2000-2020'
-years_seg3_ticks = years_seg3[0::5]
-
-# PIC Era 1
-title_string =  'PIC' + " " + years_seg1_string
-ax0 = fig.add_subplot(gs[0, :1])
-ax0.plot(years_seg1, pic_era_1_original, label = 'Feature Values')
-ax0.plot(years_seg1, pic_era_1_fitted, label = 'Model Values')
-ax0.set_xticks(years_seg1_ticks)
-ax0.set_yticks([0.55, 0.70, 0.85, 1.0])
-ax0.set_ylabel('Normalized Feature Value')
-props = dict(boxstyle='round', facecolor='wheat', alpha=0.5)
-ax0.text(0.3, 0.95, pic_nrmse_string, transform=ax0.transAxes, fontsize=9, bbox=props, verticalalignment='top')
-ax0.title.set_text(title_string)
-
-# ISO Era 2
-title_string =  'ISO' + " " + years_seg2_string
-ax1 = fig.add_subplot(gs[0, 1:2])
-ax1.plot(years_seg2, iso_era_2_original, label = 'Feature Values')
-ax1.plot(years_seg2, iso_era_2_fitted, label = 'Model Values')
-ax1.set_xticks(years_seg2_ticks)
-ax1.set_yticks([0.25, 0.35, 0.45, 0.55, 0.65])
-props = dict(boxstyle='round', facecolor='wheat', alpha=0.5)
-ax1.text(0.10, 0.88, iso_nrmse_string, transform=ax1.transAxes, fontsize=9, bbox=props, verticalalignment='top')
-ax1.title.set_text(title_string)
-
-# TI-OD Era 3
-title_string =  'TI-OD' + " " + years_seg3_string
-ax2 = fig.add_subplot(gs[0, 2:3])
-ax2.plot(years_seg3, ti_od_era_3_original, label = 'Feature Values')
-ax2.plot(years_seg3, ti_od_era_3_fitted, label = 'Model Values')
-ax2.set_xticks(years_seg3_ticks)
-ax2.set_yticks([0.35, 0.6, 0.85, 1.10])
-props = dict(boxstyle='round', facecolor='wheat', alpha=0.5)
-ax2.text(0.37, 0.93, ti_od_nrmse_string, transform=ax2.transAxes, fontsize=9, bbox=props, verticalalignment='top')
-ax2.legend(loc='center left', bbox_to_anchor=(1, 0.5))
-ax2.title.set_text(title_string)
+gs = GridSpec(2, len(figure_fits), figure=fig)
+
+for j in range(len(figure_fits)):
+    fit = figure_fits[j]
+    original, fitted, nrmse = era_models[fit['era'] - 1][fit['feature']]
+
+    # X axis values and ticks: the years of the era, with a tick every 10 years
+    years = era_value_years[fit['era'] - 1]
+    years_string = str(years[0]) + '-' + str(years[-1])
+    years_ticks = list(range(-(-years[0]//5)*5, years[-1] + 2, 10))
+
+    title_string = fit['title'] + " " + years_string
+    nrmse_string = 'nRMSE = ' + str(round(nrmse, 2))
+    ax = fig.add_subplot(gs[0, j:j+1])
+    ax.plot(years, original, label = 'Feature Values')
+    ax.plot(years, fitted, label = 'Model Values')
+    ax.set_xticks(years_ticks)
+    ax.set_yticks(fit['yticks'])
+    if j == 0:
+        ax.set_ylabel('Normalized Feature Value')
+    props = dict(boxstyle='round', facecolor='wheat', alpha=0.5)
+    ax.text(*fit['text_xy'], nrmse_string, transform=ax.transAxes, fontsize=9, bbox=props, verticalalignment='top')
+    if j == len(figure_fits) - 1:
+        ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+    ax.title.set_text(title_string)
 
 # Save plot
 plt.savefig(figure_2_filename, bbox_inches='tight')
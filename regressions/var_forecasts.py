@@ -1,6 +1,7 @@
 # Imports
 from regression_helper import un_normalize
 from time_series_smoothing import smoothing
+from era_segmentation import era_boundaries
 from matplotlib.gridspec import GridSpec
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -12,19 +13,23 @@ pd.set_option('display.max_rows', 500)
 
 """
 var_forecasts.py produces Figure S2 in the supplementary materials, which visualizes the 2023 forecasts produced by the Era 3 VAR
-along with the Era 3 time series to contextualize them. Here, we also compare the forecast values with the
+(the VAR of the last era) along with the Era 3 time series to contextualize them. Here, we also compare the forecast values with the
 actual 2023 feature values.
 
-You need to specify the root directory.
+You need to specify the root directory. The first year of the last era is read from the changepoint analysis (see
+era_segmentation.py).
 
 Inputs:
         - .csv of the smoothed time series
+        - .csv of the era boundaries
         - .csv of the unsmoothed time series
         - .csv of the feature values, not averaged by year (for the 2023 values)
         - .csv of VAR forecasts
+        - .csv of VAR forecast intervals
 Outputs:
         - .png containing Figure 3
-        - .csv of percent errors between the VAR forecasts for 2023 and the actual 2023 feature values
+        - .csv of percent errors between the VAR forecasts for 2023 and the actual 2023 feature values, and whether the
+          actual (backward-smoothed) values fall inside the forecast intervals
 """
 
 """
@@ -40,9 +45,15 @@ ts_filename = os.path.join(base_dir, "output_data/time_series/smoothed_time_seri
 # Directory for unsmoothed time series
 ts_unsmoothed_filename = os.path.join(base_dir, "output_data/time_series/unsmoothed_time_series.csv")
 
+# Directory of the era boundaries (the changepoints found by the changepoint analysis)
+era_boundaries_filename = os.path.join(base_dir, "output_data/changepoints/era_boundaries.csv")
+
 # Directory for the VAR forecasts
 var_forecast_filename = os.path.join(base_dir, "output_data/reg_results/VAR/era_3_var_forecasts.csv")
 
+# Directory for the VAR forecast intervals
+var_interval_filename = os.path.join(base_dir, "output_data/reg_results/VAR/era_3_var_forecast_intervals.csv")
+
 # Directory of feature dataset
 feature_df_dir = os.path.join(base_dir, "output_data/features/all_features.csv")
 
@@ -59,12 +70,18 @@ DATA PREPARATION
 # Read in the smoothed and unsmoothed time series
 ts_df = pd.read_csv(ts_filename).dropna().reset_index(drop=True)
 ts_unsmoothed_df = pd.read_csv(ts_unsmoothed_filename)
+# First year of Era 3, and its first row in the smoothed time series
+era_3_start = era_boundaries(era_boundaries_filename)[-1]
+era_3_row = int((ts_df['Year'] < era_3_start).sum())
 # Read in the VAR forecasts
 forecast_df = pd.read_csv(var_forecast_filename)
+# Read in the VAR forecast intervals, only for 2023 (the third forecast step)
+interval_df = pd.read_csv(var_interval_filename)
+interval_df = interval_df[interval_df['Horizon'] == 3].set_index('Feature')
 # Read in the feature dataset, get only the 2023 feature values, average by year
 feature_df = pd.read_csv(feature_df_dir)
 actual_vals_df = feature_df.loc[feature_df['Year'].isin([2023])]
-actual_vals_df = actual_vals_df.groupby('Year').mean()
+actual_vals_df = actual_vals_df.drop(columns=['ID']).groupby('Year').mean()
 actual_vals_df = actual_vals_df.reset_index(level=0)
 
 
@@ -83,8 +100,16 @@ for feat in features:
 
 forecast_df = pd.DataFrame.from_dict(un_normalized_forecasts)
 
+# The interval bounds are de-normalized the same way
+intervals = {}
+for feat in features:
+    orig = list(ts_df[feat])
+    bounds = [interval_df.loc[feat, 'Lower'], interval_df.loc[feat, 'Upper']]
+    intervals[feat] = un_normalize(orig, bounds)
+
 """
-Figure 3 visualizes all eight features for 2000 - 2023. 2000 - 2020 values will come from the smoothed time series.
+Figure 3 visualizes all eight features for 2000 - 2023 (from the first year of Era 3). 2000 - 2020 values will come
+from the smoothed time series.
 2021 - 2022 values will be 2-backward smoothed (1/3((year - 2) + (year - 1) + year))). 2023 values will come from the
 actual 2023 DataFrame and will also be backward-smoothed. The 2023 forecast values do not need to be smoothed,
 because the VAR uses smoothed time series already (therefore the forecast is the smoothed value prediction)
@@ -93,7 +118,7 @@ Concatenate the time series accordingly.
 """
 
 # We need three DataFrames: historic DataFrame, historic + actual 2023 and historic + var_forecasts
-ts_unsmoothed_actual = ts_unsmoothed_df.append(actual_vals_df).reset_index(level=0).drop(columns=['index'])
+ts_unsmoothed_actual = pd.concat([ts_unsmoothed_df, actual_vals_df]).reset_index(level=0).drop(columns=['index'])
 
 # List of lists to pass to the smoothing function
 last_years = ts_unsmoothed_actual.tail(5)[features].values.tolist()
@@ -110,23 +135,22 @@ last_years_df = pd.DataFrame(smoothed_lists, columns = features)
 last_years_minus_df = last_years_df.drop(last_years_df.tail(1).index)
 
 # Historic DF
-historic_df = ts_df.append(last_years_minus_df)
+historic_df = pd.concat([ts_df, last_years_minus_df])
 historic_df = historic_df.reset_index(drop=True)
-historic_df = historic_df[48:]
+historic_df = historic_df[era_3_row:]
 
 # Historic + actual 2023
-all_df = ts_df.append(last_years_df)
+all_df = pd.concat([ts_df, last_years_df])
 all_df = all_df.reset_index(drop=True)
-all_df = all_df[48:]
+all_df = all_df[era_3_row:]
 
 # Historic + forecasted 2023
-hist_plus_forecasted = ts_df.append(last_years_minus_df)
-hist_plus_forecasted = hist_plus_forecasted.append(forecast_df)
+hist_plus_forecasted = pd.concat([ts_df, last_years_minus_df, forecast_df])
 hist_plus_forecasted = hist_plus_forecasted.reset_index(drop=True)
-hist_plus_forecasted = hist_plus_forecasted[48:]
+hist_plus_forecasted = hist_plus_forecasted[era_3_row:]
 
 """
-Create and save Figure 3.
+Create and save Figure 3. The forecast intervals for 2023 are drawn as vertical lines.
 """
 
 # Matplotlib settings
@@ -140,10 +164,10 @@ sns.set_context('paper', font_scale=0.9)
 plt.rcParams['figure.constrained_layout.use'] = True
 
 # X axis values and ticks
-years = list(range(2000, 2023))
-years_forecast = list(range(2000, 2024))
+years = list(range(era_3_start, 2023))
+years_forecast = list(range(era_3_start, 2024))
 
-years_for_ticks = list(range(2000, 2023))
+years_for_ticks = list(range(era_3_start, 2023))
 years_ticks = years_for_ticks[0::10]
 
 # Initialize figure
@@ -156,6 +180,7 @@ ax0 = fig.add_subplot(gs[0, :1])
 ax0.plot(years, list(historic_df[title_string]), label = 'Historic Values', zorder = 10)
 ax0.plot(years_forecast, list(hist_plus_forecasted[title_string]), label = 'Forecast 2023 Value', zorder = 0)
 ax0.plot(years_forecast, list(all_df[title_string]), label = 'Actual 2023 Value', zorder = 0)
+ax0.vlines(2023, *intervals[title_string], label = 'Forecast Interval', color = 'grey', zorder = 0)
 ax0.set_xticks(years_ticks)
 ax0.set_yticks([0.68, 0.70, 0.72, 0.74])
 ax0.set_ylabel('correlation coef.')
@@ -167,6 +192,7 @@ ax1 = fig.add_subplot(gs[0, 1:2])
 ax1.plot(years, list(historic_df[title_string]), label = 'Historic Values', zorder = 10)
 ax1.plot(years_forecast, list(hist_plus_forecasted[title_string]), label = 'Forecast 2023 Value', zorder = 0)
 ax1.plot(years_forecast, list(all_df[title_string]), label = 'Actual 2023 Value', zorder = 0)
+ax1.vlines(2023, *intervals[title_string], label = 'Forecast Interval', color = 'grey', zorder = 0)
 ax1.set_xticks(years_ticks)
 ax1.set_yticks([2.75, 3.0, 3.25])
 ax1.set_ylabel('bits')
@@ -178,6 +204,7 @@ ax2 = fig.add_subplot(gs[0, 2:3])
 ax2.plot(years, list(historic_df[title_string]), label = 'Historic Values', zorder = 10)
 ax2.plot(years_forecast, list(hist_plus_forecasted[title_string]), label = 'Forecast 2023 Value', zorder = 0)
 ax2.plot(years_forecast, list(all_df[title_string]), label = 'Actual 2023 Value', zorder = 0)
+ax2.vlines(2023, *intervals[title_string], label = 'Forecast Interval', color = 'grey', zorder = 0)
 ax2.set_xticks(years_ticks)
 ax2.set_yticks([2.45,2.6,2.75,2.9])
 ax2.set_ylabel('MIDI note #s')
@@ -189,6 +216,7 @@ ax3 = fig.add_subplot(gs[0, 3:4])
 ax3.plot(years, list(historic_df[title_string]), label = 'Historic Values', zorder = 10)
 ax3.plot(years_forecast, list(hist_plus_forecasted[title_string]), label = 'Forecast 2023 Value', zorder = 0)
 ax3.plot(years_forecast, list(all_df[title_string]), label = 'Actual 2023 Value', zorder = 0)
+ax3.vlines(2023, *intervals[title_string], label = 'Forecast Interval', color = 'grey', zorder = 0)
 ax3.set_xticks(years_ticks)
 ax3.set_ylabel('MIDI note #s')
 ax3.title.set_text(title_string)
@@ -199,6 +227,7 @@ ax4 = fig.add_subplot(gs[1, :1])
 ax4.plot(years, list(historic_df[title_string]), label = 'Historic Values', zorder = 10)
 ax4.plot(years_forecast, list(hist_plus_forecasted[title_string]), label = 'Forecast 2023 Value', zorder = 0)
 ax4.plot(years_forecast, list(all_df[title_string]), label = 'Actual 2023 Value', zorder = 0)
+ax4.vlines(2023, *intervals[title_string], label = 'Forecast Interval', color = 'grey', zorder = 0)
 ax4.set_xticks(years_ticks)
 ax4.set_yticks([2.4, 2.7, 3.0])
 ax4.set_xlabel('Year')
@@ -211,6 +240,7 @@ ax5 = fig.add_subplot(gs[1, 1:2])
 ax5.plot(years, list(historic_df[title_string]), label = 'Historic Values', zorder = 10)
 ax5.plot(years_forecast, list(hist_plus_forecasted[title_string]), label = 'Forecast 2023 Value', zorder = 0)
 ax5.plot(years_forecast, list(all_df[title_string]), label = 'Actual 2023 Value', zorder = 0)
+ax5.vlines(2023, *intervals[title_string], label = 'Forecast Interval', color = 'grey', zorder = 0)
 ax5.set_xticks(years_ticks)
 ax5.set_xlabel('Year')
 ax5.set_yticks([5.0, 5.75, 6.5, 7.25])
@@ -223,6 +253,7 @@ ax6 = fig.add_subplot(gs[1, 2:3])
 ax6.plot(years, list(historic_df[title_string]), label = 'Historic Values', zorder = 10)
 ax6.plot(years_forecast, list(hist_plus_forecasted[title_string]), label = 'Forecast 2023 Value', zorder = 0)
 ax6.plot(years_forecast, list(all_df[title_string]), label = 'Actual 2023 Value', zorder = 0)
+ax6.vlines(2023, *intervals[title_string], label = 'Forecast Interval', color = 'grey', zorder = 0)
 ax6.set_xticks(years_ticks)
 ax6.set_xlabel('Year')
 ax6.set_yticks([0.45, 0.5, 0.55, 0.6])
@@ -235,6 +266,7 @@ ax7 = fig.add_subplot(gs[1, 3:4])
 ax7.plot(years, list(historic_df[title_string]), label = 'Historic Values', zorder = 10)
 ax7.plot(years_forecast, list(hist_plus_forecasted[title_string]), label = 'Forecast 2023 Value', zorder = 0)
 ax7.plot(years_forecast, list(all_df[title_string]), label = 'Actual 2023 Value', zorder = 0)
+ax7.vlines(2023, *intervals[title_string], label = 'Forecast Interval', color = 'grey', zorder = 0)
 ax7.set_xticks(years_ticks)
 ax7.set_xlabel('Year')
 ax7.set_ylabel('bits')
@@ -252,6 +284,7 @@ COMPARE WITH ACTUAL 2023 VALUES
 feats = list(actual_vals_df.columns[1:])
 errors = []
 nrmses = []
+in_interval = []
 
 # Iterate through the feature list
 for feat in feats:
@@ -261,11 +294,16 @@ for feat in feats:
     error = 100*(forecast_val - actual_val) / actual_val
     errors.append(round(error,4))
     # Normalized root mean squared error
-    # We normalize by the standard deviation of the relevant time series, from 2000 onwards
-    smoothed_feat = list(ts_df[feat][48:])
+    # We normalize by the standard deviation of the relevant time series, from the start of Era 3 onwards
+    smoothed_feat = list(ts_df[feat][era_3_row:])
     feat_sd = np.std(smoothed_feat)
     nrmse = np.sqrt((forecast_val - actual_val)**2) / feat_sd
     nrmses.append(round(nrmse, 4))
+    # Does the actual value fall inside the forecast interval? The VAR is fitted on the smoothed time series, so its
+    # intervals are for smoothed values: compare them with the backward-smoothed 2023 value plotted in Figure 3, not the
+    # raw 2023 average
+    smoothed_actual_val = last_years_df[feat].iloc[-1]
+    in_interval.append(bool(intervals[feat][0] <= smoothed_actual_val <= intervals[feat][1]))
 
 # Average percent error
 mean_error = sum(errors) / len(errors)
@@ -275,6 +313,10 @@ print("Average percent error between actual and predicted 2023 features values:"
 mean_nrmse = sum(nrmses) / len(nrmses)
 print("Average nRMSE between actual and predicted 2023 features values:", round(mean_nrmse, 2))
 
-df_cols = ['Feature', 'Percent Error', 'nRMSE']
-df = pd.DataFrame(list(zip(feats, errors, nrmses)), columns = df_cols)
+print("Actual (smoothed) 2023 values inside the forecast intervals:", sum(in_interval), "of", len(in_interval))
+
+df_cols = ['Feature', 'Percent Error', 'nRMSE', 'Lower', 'Upper', 'In Interval']
+lowers = [intervals[feat][0] for feat in feats]
+uppers = [intervals[feat][1] for feat in feats]
+df = pd.DataFrame(list(zip(feats, errors, nrmses, lowers, uppers, in_interval)), columns = df_cols)
 df.to_csv(error_table_filename, index=False)
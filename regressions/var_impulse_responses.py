@@ -0,0 +1,102 @@
+# Imports
+from era_segmentation import load_eras
+from var_order_selection import select_var_order
+from var_irf import orthogonal_irfs, bootstrap_irfs
+import numpy as np
+import pandas as pd
+import os
+
+"""
+var_impulse_responses.py computes the orthogonalized impulse responses (IRFs) and forecast error variance decompositions
+(FEVDs) of the VAR of every era, with residual-bootstrap confidence bands (see var_irf.py), e.g. to see how a PIC shock
+propagates to ISO in each era. The VAR orders are selected by BIC as in vector_autoregression.py (and share its cache).
+
+The shocks are orthogonalized by the Cholesky decomposition of the residual covariance matrix, so the order of the
+features matters: a shock to a feature can affect the features after it in the same year, but not the ones before it.
+
+You need to specify the root directory. The eras are derived from the changepoint analysis (see era_segmentation.py).
+
+Inputs:
+        - .csv of the (normalized) smoothed time series
+        - .csv with the era boundaries (see tally_changepoints.py)
+Outputs:
+        - .npz with the IRFs and FEVDs as arrays: point estimates (era x impulse x response x horizon) and bootstrap
+          quantiles (era x impulse x response x horizon x quantile)
+        - .csv with the same results in long format
+"""
+
+"""
+DIRECTORIES
+"""
+
+# SPECIFY ROOT DIRECTORY
+base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
+
+# Directory of the (normalized) smoothed time series
+ts_filename = os.path.join(base_dir, "output_data/time_series/norm_time_series.csv")
+
+# Directory of the era boundaries (the changepoints found by the changepoint analysis)
+era_boundaries_filename = os.path.join(base_dir, "output_data/changepoints/era_boundaries.csv")
+
+# Directory of the cached lag order selections (shared with vector_autoregression.py)
+order_cache_dir = os.path.join(base_dir, "output_data/reg_results/VAR/order_cache")
+
+# Directories for the results
+irf_array_filename = os.path.join(base_dir, "output_data/reg_results/VAR/var_irfs.npz")
+irf_table_filename = os.path.join(base_dir, "output_data/reg_results/VAR/var_irfs.csv")
+
+"""
+PARAMETERS
+"""
+
+# Largest horizon (years after the shock)
+horizon = 10
+# Number of bootstrap replicates, quantiles of the bands and seed
+n_bootstrap = 2000
+quantiles = [0.025, 0.5, 0.975]
+bootstrap_seed = 0
+
+"""
+DATA PREPARATION
+"""
+
+eras, era_years = load_eras(ts_filename, era_boundaries_filename)
+features = list(eras[0].columns)
+
+"""
+ANALYSIS
+"""
+
+irfs, fevds, irf_bands, fevd_bands = [], [], [], []
+for i in range(len(eras)):
+    values = eras[i][features].to_numpy()
+    fit = select_var_order(values, 'bic', cache_dir=order_cache_dir)
+    print("Era", i+1, "VAR order:", fit['order'])
+
+    irf, fevd = orthogonal_irfs(fit['params'], fit['sigma_u'], horizon)
+    irf_band, fevd_band = bootstrap_irfs(values, fit['params'], fit['resid'], horizon, n_bootstrap, quantiles,
+                                         bootstrap_seed)
+    irfs.append(irf)
+    fevds.append(fevd)
+    irf_bands.append(irf_band)
+    fevd_bands.append(fevd_band)
+
+# era x impulse x response x horizon (x quantile)
+irfs = np.stack(irfs)
+fevds = np.stack(fevds)
+irf_bands = np.stack(irf_bands)
+fevd_bands = np.stack(fevd_bands)
+
+np.savez(irf_array_filename, irf=irfs, fevd=fevds, irf_bands=irf_bands, fevd_bands=fevd_bands,
+         features=np.array(features), quantiles=np.array(quantiles), horizons=np.arange(horizon + 1))
+
+# Long format: one row per era, impulse, response and horizon
+era_idx, impulse_idx, response_idx, horizon_idx = np.indices(irfs.shape).reshape(4, -1)
+irf_df = pd.DataFrame({'Era': era_idx + 1, 'Impulse': np.array(features)[impulse_idx],
+                       'Response': np.array(features)[response_idx], 'Horizon': horizon_idx,
+                       'IRF': irfs.ravel(), 'FEVD': fevds.ravel()})
+for q in range(len(quantiles)):
+    irf_df['IRF ' + str(quantiles[q])] = irf_bands[..., q].ravel()
+for q in range(len(quantiles)):
+    irf_df['FEVD ' + str(quantiles[q])] = fevd_bands[..., q].ravel()
+irf_df.to_csv(irf_table_filename, index = False)
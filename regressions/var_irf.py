@@ -0,0 +1,148 @@
+# Imports
+import numpy as np
+
+"""
+var_irf.py computes orthogonalized impulse responses (IRFs) and forecast error variance decompositions (FEVDs) of VARs,
+with residual-bootstrap confidence bands.
+
+The moving-average coefficients Phi_h of a VAR are the top-left block of the powers of its companion matrix, and the
+orthogonalized responses are Theta_h = Phi_h P, where P is the Cholesky factor of the residual covariance matrix (a shock
+of one standard deviation to the impulse, ordered as the columns of the time series). The FEVD of a response at horizon h
+is the share of its h-step forecast error variance due to each impulse, the cumulative sum of the squared responses over
+the sum over impulses. These are the same as statsmodels' irf().orth_irfs and fevd().decomp.
+
+For the bands, every bootstrap replicate simulates a series from the fitted VAR with resampled residuals, refits the VAR
+and recomputes the IRFs and FEVDs. All replicates go through each step together, as stacked arrays: the simulations are
+one batched recursion over time, the refits one stacked least-squares solve, and the IRFs batched companion-matrix
+powers. Replicates are processed in chunks to bound memory.
+
+All arrays are indexed (..., impulse, response, horizon).
+"""
+
+"""
+companion_matrix() builds the companion matrices of (stacks of) VAR coefficients.
+
+Inputs:
+        - ndarray of shape (..., 1 + lag*variables, variables) with the coefficients, in the order of statsmodels' VAR
+          params (constant, lag 1 of every variable, lag 2, ...)
+Outputs:
+        - ndarray of shape (..., lag*variables, lag*variables)
+"""
+def companion_matrix(params):
+    params = np.asarray(params, dtype=float)
+    n_vars = params.shape[-1]
+    size = params.shape[-2] - 1
+    companion = np.zeros(params.shape[:-2] + (size, size))
+    # First block row: [A_1 ... A_lag]; A_j[response, impulse] is the transpose of the params block of lag j
+    companion[..., :n_vars, :] = np.swapaxes(params[..., 1:, :], -1, -2)
+    companion[..., n_vars:, :-n_vars] = np.eye(size - n_vars)
+    return companion
+
+"""
+orthogonal_irfs() computes the orthogonalized impulse responses and the FEVDs.
+
+Inputs:
+        - ndarray of shape (..., 1 + lag*variables, variables) with the coefficients
+        - ndarray of shape (..., variables, variables) with the residual covariance matrices
+        - largest horizon
+Outputs:
+        - ndarray of shape (..., impulse, response, horizon + 1) with the responses at horizons 0 ... horizon
+        - ndarray of shape (..., impulse, response, horizon + 1) with the FEVDs (shares of the response's forecast error
+          variance, horizon h being the (h + 1)-step forecast)
+"""
+def orthogonal_irfs(params, sigma_u, horizon=10):
+    companion = companion_matrix(params)
+    n_vars = np.shape(params)[-1]
+    chol = np.linalg.cholesky(sigma_u)
+
+    power = np.broadcast_to(np.eye(companion.shape[-1]), companion.shape).copy()
+    theta = np.zeros(companion.shape[:-2] + (horizon + 1, n_vars, n_vars))
+    for h in range(horizon + 1):
+        # theta[..., h, response, impulse] = Phi_h P
+        theta[..., h, :, :] = power[..., :n_vars, :n_vars] @ chol
+        power = power @ companion
+
+    cumulative = np.cumsum(theta**2, axis=-3)
+    fevd = cumulative/cumulative.sum(axis=-1, keepdims=True)
+    # (..., horizon, response, impulse) -> (..., impulse, response, horizon)
+    order = tuple(range(theta.ndim - 3)) + (theta.ndim - 1, theta.ndim - 2, theta.ndim - 3)
+    return theta.transpose(order), fevd.transpose(order)
+
+"""
+simulate_var() simulates series from a VAR for a stack of replicates, starting from the first 'lag' observations.
+
+Inputs:
+        - ndarray of shape (1 + lag*variables, variables) with the coefficients
+        - ndarray of shape (replicates, n - lag, variables) with the shocks
+        - ndarray of shape (lag, variables) with the initial observations
+Outputs:
+        - ndarray of shape (replicates, n, variables)
+"""
+def simulate_var(params, shocks, initial):
+    lag, n_vars = initial.shape
+    n_reps, n_steps, _ = shocks.shape
+    series = np.zeros((n_reps, lag + n_steps, n_vars))
+    series[:, :lag] = initial
+    for t in range(lag, lag + n_steps):
+        lagged = series[:, t - lag:t][:, ::-1].reshape(n_reps, -1)
+        series[:, t] = params[0] + lagged @ params[1:] + shocks[:, t - lag]
+    return series
+
+"""
+refit_var() fits a VAR of the given lag to a stack of series with one stacked least-squares solve.
+
+Inputs:
+        - ndarray of shape (replicates, n, variables)
+        - lag
+Outputs:
+        - ndarray of shape (replicates, 1 + lag*variables, variables) with the coefficients
+        - ndarray of shape (replicates, variables, variables) with the residual covariance matrices (degrees-of-freedom
+          adjusted)
+"""
+def refit_var(series, lag):
+    n_reps, n, n_vars = series.shape
+    lagged = [series[:, lag - j:n - j] for j in range(1, lag + 1)]
+    Z = np.concatenate([np.ones((n_reps, n - lag, 1))] + lagged, axis=-1)
+    Y = series[:, lag:]
+    params = np.linalg.pinv(Z) @ Y
+    resid = Y - Z @ params
+    sigma_u = np.swapaxes(resid, -1, -2) @ resid/(n - lag - Z.shape[-1])
+    return params, sigma_u
+
+"""
+bootstrap_irfs() computes residual-bootstrap quantiles of the orthogonalized IRFs and FEVDs of a VAR.
+
+Inputs:
+        - ndarray of shape (n, variables) with the time series the VAR was fitted on
+        - ndarray of shape (1 + lag*variables, variables) with the coefficients
+        - ndarray of shape (n - lag, variables) with the residuals
+        - largest horizon
+        - number of replicates
+        - quantiles
+        - seed, and number of replicates per chunk
+Outputs:
+        - ndarray of shape (impulse, response, horizon + 1, quantiles) with the IRF quantiles
+        - ndarray of shape (impulse, response, horizon + 1, quantiles) with the FEVD quantiles
+"""
+def bootstrap_irfs(values, params, resid, horizon=10, n_reps=2000, quantiles=(0.025, 0.5, 0.975), seed=0,
+                   chunk_size=1000):
+    values = np.asarray(values, dtype=float)
+    params = np.asarray(params, dtype=float)
+    resid = np.asarray(resid, dtype=float)
+    resid = resid - resid.mean(axis=0)
+    n_vars = values.shape[1]
+    lag = (params.shape[0] - 1)//n_vars
+    rng = np.random.default_rng(seed)
+
+    irfs, fevds = [], []
+    for start in range(0, n_reps, chunk_size):
+        size = min(chunk_size, n_reps - start)
+        shocks = resid[rng.integers(len(resid), size=(size, len(resid)))]
+        series = simulate_var(params, shocks, values[:lag])
+        rep_params, rep_sigma = refit_var(series, lag)
+        irf, fevd = orthogonal_irfs(rep_params, rep_sigma, horizon)
+        irfs.append(irf)
+        fevds.append(fevd)
+    irfs = np.concatenate(irfs)
+    fevds = np.concatenate(fevds)
+    return np.moveaxis(np.quantile(irfs, quantiles, axis=0), 0, -1), np.moveaxis(np.quantile(fevds, quantiles, axis=0), 0, -1)
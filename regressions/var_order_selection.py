@@ -0,0 +1,166 @@
+# Imports
+import numpy as np
+import scipy.stats
+import hashlib
+import os
+
+"""
+var_order_selection.py selects the lag order of a VAR (with a constant) and fits the selected order, without refitting
+every candidate order.
+
+The lag matrix of the largest order is built once per time series: column block j holds lag j of every variable. The
+regressors of order p are its first 1 + p*variables columns, so one QR decomposition of the lag matrix gives the fits of
+all orders at once: the first m columns of Q span the regressors of the first m columns, and the residual cross-product
+matrix of order p is Y'Y minus the cross-products of the first 1 + p*variables rows of Q'Y (nested QR).
+
+As in statsmodels' VAR.select_order(), every order is compared on the same observations (those after the largest
+order), and the criteria are those of statsmodels (Lütkepohl pp. 146-150):
+
+        AIC  = log|Sigma| + 2/T * free parameters
+        BIC  = log|Sigma| + log(T)/T * free parameters
+        HQIC = log|Sigma| + 2 log(log(T))/T * free parameters
+        FPE  = ((T + df_model)/df_resid)^variables * |Sigma|
+
+where Sigma is the maximum-likelihood residual covariance matrix and T the number of observations. The selected order is
+then fitted on all the observations it can use (as VAR.fit(order) does), from the same lag matrix.
+
+The fit of the selected order includes the standard errors and p-values of the coefficients (as statsmodels' VARResults
+stderr and pvalues), so the scripts can use it directly instead of refitting. The results can be cached on disk, keyed by
+a hash of the time series and the settings, so re-running a script does not re-estimate anything.
+"""
+
+"""
+lag_matrix() builds the lag matrix of a time series.
+
+Inputs:
+        - ndarray of shape (n, variables)
+        - largest lag
+Outputs:
+        - ndarray of shape (n, 1 + max_lag*variables): column 0 is the constant, columns 1 + (j - 1)*variables ... are
+          lag j. Lags before the start of the series are 0 (rows t < lag are never used for order lag)
+"""
+def lag_matrix(values, max_lag):
+    n, n_vars = values.shape
+    Z = np.zeros((n, 1 + max_lag*n_vars))
+    Z[:, 0] = 1
+    for j in range(1, max_lag + 1):
+        Z[j:, 1 + (j - 1)*n_vars:1 + j*n_vars] = values[:n - j]
+    return Z
+
+"""
+default_max_lag() gives statsmodels' default largest order: 12 * (n/100)^(1/4), but no more than can be estimated.
+"""
+def default_max_lag(n, n_vars):
+    max_estimable = (n - n_vars - 1)//(1 + n_vars)
+    return min(round(12*(n/100.0)**(1/4.0)), max_estimable)
+
+"""
+information_criteria() computes the AIC, BIC, HQIC and FPE of every order 0 ... max_lag from one QR decomposition.
+
+Inputs:
+        - ndarray of shape (n, variables)
+        - largest order
+        - lag matrix of at least max_lag lags (built if not given)
+Outputs:
+        - dictionary {criterion: ndarray of the values for orders 0 ... max_lag}
+"""
+def information_criteria(values, max_lag, Z=None):
+    n, n_vars = values.shape
+    if Z is None:
+        Z = lag_matrix(values, max_lag)
+    Z = Z[max_lag:, :1 + max_lag*n_vars]
+    Y = values[max_lag:]
+    nobs = len(Y)
+
+    Q, _ = np.linalg.qr(Z)
+    C = Q.T @ Y
+    # Residual cross-products of every prefix of the columns: Y'Y - sum of the outer products of the first rows of Q'Y
+    explained = np.cumsum(C[:, :, None]*C[:, None, :], axis=0)
+    orders = np.arange(max_lag + 1)
+    sizes = 1 + orders*n_vars
+    sigma = (Y.T @ Y - explained[sizes - 1])/nobs
+
+    sign, ld = np.linalg.slogdet(sigma)
+    df_resid = nobs - sizes
+    # Orders with a singular residual covariance (or no degrees of freedom left) are degenerate: they must never win
+    ld = np.where((sign > 0) & (df_resid > 0), ld, np.inf)
+    free_params = orders*n_vars**2 + n_vars
+    with np.errstate(divide='ignore'):
+        fpe = np.where(df_resid > 0, ((nobs + sizes)/np.maximum(df_resid, 1))**n_vars*np.exp(ld), np.inf)
+    return {'aic': ld + 2.0/nobs*free_params, 'bic': ld + np.log(nobs)/nobs*free_params,
+            'hqic': ld + 2.0*np.log(np.log(nobs))/nobs*free_params, 'fpe': fpe}
+
+"""
+fit_order() fits a VAR of the given order by least squares, on observations order ... n - 1.
+
+Inputs:
+        - ndarray of shape (n, variables)
+        - order
+        - lag matrix of at least 'order' lags (built if not given)
+Outputs:
+        - ndarray of shape (1 + order*variables, variables) with the coefficients, in the order of statsmodels' VAR params
+        - ndarray of shape (n - order, variables) with the residuals
+        - ndarray of shape (variables, variables) with the residual covariance matrix (degrees-of-freedom adjusted, as
+          statsmodels' sigma_u)
+        - ndarray of the shape of the coefficients with their standard errors, from sigma_u and (Z'Z)^-1
+"""
+def fit_order(values, order, Z=None):
+    n_vars = values.shape[1]
+    if Z is None:
+        Z = lag_matrix(values, order)
+    Z = Z[order:, :1 + order*n_vars]
+    Y = values[order:]
+    params = np.linalg.lstsq(Z, Y, rcond=None)[0]
+    resid = Y - Z @ params
+    sigma_u = resid.T @ resid/(len(Y) - Z.shape[1])
+    # Var(vec(params)) = sigma_u (x) (Z'Z)^-1, of which only the diagonal is needed
+    stderr = np.sqrt(np.outer(np.diag(np.linalg.pinv(Z.T @ Z)), np.diag(sigma_u)))
+    return params, resid, sigma_u, stderr
+
+"""
+series_hash() gives a hash of a time series and the settings, to key the cache.
+"""
+def series_hash(values, *settings):
+    digest = hashlib.sha256(np.ascontiguousarray(values, dtype=float).tobytes())
+    digest.update(repr((values.shape,) + settings).encode())
+    return digest.hexdigest()[:16]
+
+"""
+select_var_order() selects the order of a VAR by an information criterion and fits it, with an optional disk cache.
+
+Inputs:
+        - ndarray or DataFrame of shape (n, variables)
+        - criterion: 'aic', 'bic', 'hqic' or 'fpe'
+        - largest order (None for statsmodels' default)
+        - directory of the cache (None for no cache)
+Outputs:
+        - dictionary with 'order', the criteria of every order ('aic', 'bic', 'hqic', 'fpe'), and the fit of the selected
+          order ('params', 'resid', 'sigma_u', 'stderr', see fit_order(), and 'pvalues', two-sided from the normal
+          distribution as in statsmodels)
+"""
+def select_var_order(values, criterion='bic', max_lag=None, cache_dir=None):
+    values = np.asarray(values, dtype=float)
+    n, n_vars = values.shape
+    if max_lag is None:
+        max_lag = default_max_lag(n, n_vars)
+
+    if cache_dir is not None:
+        cache_filename = os.path.join(cache_dir, "var_order_" + series_hash(values, criterion, max_lag) + ".npz")
+        if os.path.exists(cache_filename):
+            with np.load(cache_filename) as cached:
+                # Caches written before the standard errors were added are refitted
+                if 'stderr' in cached.files:
+                    return {key: cached[key] if cached[key].ndim else cached[key].item() for key in cached.files}
+
+    # One lag matrix for the criteria of every order and the fit of the selected one
+    Z = lag_matrix(values, max_lag)
+    results = information_criteria(values, max_lag, Z)
+    order = int(np.argmin(results[criterion]))
+    params, resid, sigma_u, stderr = fit_order(values, order, Z)
+    results.update({'order': order, 'params': params, 'resid': resid, 'sigma_u': sigma_u, 'stderr': stderr,
+                    'pvalues': 2*scipy.stats.norm.sf(np.abs(params/stderr))})
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(cache_filename, **results)
+    return results
@@ -1,7 +1,13 @@
 # Imports
 from regression_helper import normalize, nrmse_range
-from statsmodels.tsa.stattools import grangercausalitytests
-from statsmodels.tsa.api import VAR
+from era_segmentation import load_eras
+from batched_granger import granger_matrix
+from var_coefficients import coefficient_table
+from var_bootstrap import bootstrap_paths, forecast_intervals
+from sparse_var import fit_sparse_var, sparse_coefficient_table
+from var_order_selection import select_var_order
+from rolling_var import var_forecast_path
+from diagnostics import era_series, diagnostic_table, flagged_fits
 import os
 import pandas as pd
 import numpy as np
@@ -14,26 +20,15 @@ into segments per the results of changepoint analysis, and VAR models are fit se
 Inputs: .csv containing the (normalized) smoothed time series
 Outputs:
         - .csv's with model coefficients for each era
-        - .csv with 2023 forecasts generated by the Era 3 VAR
+        - .csv's with penalized (sparse) VAR coefficients for each era
+        - .csv with 2023 forecasts generated by the VAR of the last era (Era 3)
+        - .csv with bootstrap forecast intervals of the last era's VAR (2021 - 2023)
 
-You need to specify the root directory. If you get changepoint results that indicate different eras, you will need to
-segment the time series manually.
+You need to specify the root directory. The eras are derived from the changepoint analysis (see era_segmentation.py).
 
-Note: there is a manual aspect to this script. Here's how I recommend going through it:
-
-      1. Comment out everything below the saving of the model coeffients (below the comment 'Finally, save the forecasts and model coefficients.')
-
-      2. Run the script with that portion of the script commented out. A bunch of equations will be printed, which give the
-         VAR coefficients for each of the three models.
-
-      3. Uncomment the previously commented out portion of the code. Use the printed coefficients to manually edit the
-         lists at the bottom (era_1_ys, era_1_predictors, era_1_lags, era_1_coefficients, etc.).
-         I take out the statistically insignificant coefficients.
-
-      4. Run the script again to save the coefficients.
-
-I apologize about the manual insertion of the coefficients. I couldn't figure out how to extract significant
-coefficients automatically from the statsmodel object that is returned when you fit the model; I only know how to print the coefficients out.
+The significant coefficients (p < 0.05) of each model are extracted from the fitted models (see var_coefficients.py)
+and saved with their lags and p-values. Eras whose series are not stationary (ADF or KPSS), and models whose residuals
+are autocorrelated (Ljung-Box), are flagged (see diagnostics.py).
 """
 
 # SPECIFY ROOT DIRECTORY
@@ -42,14 +37,40 @@ base_dir = "/Users/madelinehamilton/Documents/python_stuff/tar_repo/"
 # Directory of the smoothed time series
 ts_filename = os.path.join(base_dir, "output_data/time_series/norm_time_series.csv")
 
+# Directory of the era boundaries (the changepoints found by the changepoint analysis)
+era_boundaries_filename = os.path.join(base_dir, "output_data/changepoints/era_boundaries.csv")
+
 # Directories to save models (for Figure 2 in another script)
-era_1_model_filename = os.path.join(base_dir, "output_data/reg_results/VAR/era_1_var_coefficients.csv")
-era_2_model_filename = os.path.join(base_dir, "output_data/reg_results/VAR/era_2_var_coefficients.csv")
-era_3_model_filename = os.path.join(base_dir, "output_data/reg_results/VAR/era_3_var_coefficients.csv")
+# ({} is the era number)
+model_filename = os.path.join(base_dir, "output_data/reg_results/VAR/era_{}_var_coefficients.csv")
+sparse_model_filename = os.path.join(base_dir, "output_data/reg_results/VAR/era_{}_sparse_var_coefficients.csv")
 
-# Directory to save the Era 3 VAR forecasts (for Figure S2 in another script)
+# Directory to save the last era's VAR forecasts (for Figure S2 in another script)
 forecasts_filename = os.path.join(base_dir, "output_data/reg_results/VAR/era_3_var_forecasts.csv")
 
+# Directory of the cached lag order selections
+order_cache_dir = os.path.join(base_dir, "output_data/reg_results/VAR/order_cache")
+
+# Directory of the cached diagnostics (shared with time_series_diagnostics.py)
+diagnostics_cache_dir = os.path.join(base_dir, "output_data/reg_results/diagnostics_cache")
+
+# Directory to save the last era's VAR forecast intervals
+intervals_filename = os.path.join(base_dir, "output_data/reg_results/VAR/era_3_var_forecast_intervals.csv")
+
+# Coefficients with p-values below this are saved
+significance_level = 0.05
+
+# Forecast intervals: number of bootstrap paths, coverage and seed
+n_bootstrap = 5000
+interval_level = 0.95
+bootstrap_seed = 0
+
+# Penalized VARs: whether to fit them, l1_ratio (1 for the lasso), number of lambdas and of cross-validation folds
+fit_sparse = True
+l1_ratio = 1.0
+n_lambdas = 50
+n_cv_folds = 5
+
 # Pandas display settings
 pd.set_option('display.max_rows', 500)
 pd.set_option('display.max_columns', 200)
@@ -58,21 +79,8 @@ pd.set_option('display.max_columns', 200)
 DATA PREPARATION
 """
 
-# Read in the time series
-ts_df = pd.read_csv(ts_filename)
-# Drop the 'Year column'
-ts_df = ts_df.drop('Year', axis=1)
-
-# Era 1: 1950 - 1974
-# Era 2: 1975 - 1999
-# Era 3: 2000 - 2022
-
 # Segment the data into its eras
-era_1 = ts_df.iloc[0:25].dropna().reset_index(drop=True)
-era_2 = ts_df.iloc[25:50].dropna().reset_index(drop=True)
-era_3 = ts_df.iloc[50:].dropna().reset_index(drop=True)
-
-eras = [era_1, era_2, era_3]
+eras, era_years = load_eras(ts_filename, era_boundaries_filename)
 
 """
 ANALYSIS
@@ -85,29 +93,15 @@ for VAR.
 grangers_causation_matrix() computes the Granger causality of all possible combinations of the time series. The rows
 are the response variable, columns are predictors. The values in the table are the p-values. p-values lesser than the
 significance level (0.05) implies the null hypothesis that the coefficients of the corresponding past values is zero,
-that is, the hypothesis that X does not cause Y can be rejected.
+that is, the hypothesis that X does not cause Y can be rejected. The p-values are those of statsmodels'
+grangercausalitytests() ('ssr_chi2test', lowest over lags 1 - 3), computed for all pairs at once.
 """
 
 def grangers_causation_matrix(data, variables, test='ssr_chi2test'):
 
     maxlag=3
-    test = 'ssr_chi2test'
-    # Initialize matrix
-    df = pd.DataFrame(np.zeros((len(variables), len(variables))), columns=variables, index=variables)
-    # Iterate through all combinations of time series
-    for c in df.columns:
-        for r in df.index:
-            # Grangers causality test from statsmodels
-            test_result = grangercausalitytests(data[[r, c]], maxlag=maxlag, verbose=False)
-            # Get best p value
-            p_values = [round(test_result[i+1][0][test][1],4) for i in range(maxlag)]
-            min_p_value = np.min(p_values)
-            # Store p value
-            df.loc[r, c] = min_p_value
-    # Label rows and columns of matrix
-    df.columns = [var + '_x' for var in variables]
-    df.index = [var + '_y' for var in variables]
-    return df
+    # The lag blocks are built once per lag, and all pairs are tested together (see batched_granger.py)
+    return granger_matrix(data, variables, max_lag=maxlag, decimals=4)
 
 # Instantiate list of features suitable for VAR for each era
 suit_feat_list = []
@@ -149,77 +143,102 @@ for i in range(len(eras)):
 Here, features not suitable for VAR are dropped. In this case, all features in all eras meet the criteria.
 """
 
-era_1_columns = suit_feat_list[0]
-era_2_columns = suit_feat_list[1]
-era_3_columns = suit_feat_list[2]
-
-era_1 = era_1[era_1_columns]
-era_2 = era_2[era_2_columns]
-era_3 = era_3[era_3_columns]
-
-eras = [era_1, era_2, era_3]
+eras = [eras[i][suit_feat_list[i]] for i in range(len(eras))]
 
 """
 Next we need to find the optimal lag for each VAR. We don't care so much about parsimony here, so I don't impose
-a maximum lag.
+a maximum lag (statsmodels' default largest order is used). The criteria of all orders come from one lag matrix per era
+(see var_order_selection.py). The fit of the selected order (coefficients, residuals, residual covariance, standard errors
+and p-values, the same as statsmodels' VAR.fit()) comes with the selection, and both are cached on disk, keyed by the
+era's time series, so re-running never re-estimates a model.
 """
 
-models = []
+models_fitted = []
 lags = []
-# For each era, create a model and call select_order()
+var_residuals = []
+# For each era, select the order and keep its fit
 for i in range(len(eras)):
     era = eras[i]
-    model = VAR(era)
-    models.append(model)
-    results = model.select_order()
-    best_lag = results.selected_orders['bic']
+    results = select_var_order(era, 'bic', cache_dir=order_cache_dir)
+    best_lag = results['order']
+    models_fitted.append(results)
     lags.append(best_lag)
+    var_residuals.append(pd.DataFrame(results['resid'], columns=era.columns))
 
 """
-Fit the models with the optimal lags.
+Flag invalid fits: a VAR assumes stationary series, and a well-specified VAR leaves no autocorrelation in its residuals
+(see diagnostics.py; run here without a process pool, and cached with time_series_diagnostics.py).
 """
 
-models_fitted = []
-for i in range(len(models)):
-    model_fitted = models[i].fit(lags[i])
-    models_fitted.append(model_fitted)
-    print(model_fitted.summary())
+series_labels, series = era_series(eras, 'smoothed')
+resid_labels, resid_series = era_series(var_residuals, 'VAR residual')
+diagnostics_df = diagnostic_table(series_labels + resid_labels, series + resid_series, n_jobs=1,
+                                  cache_dir=diagnostics_cache_dir)
+is_residual = diagnostics_df['Variant'] == 'VAR residual'
+flagged_df = pd.concat([flagged_fits(diagnostics_df[~is_residual], ['ADF', 'KPSS']),
+                        flagged_fits(diagnostics_df[is_residual], ['Ljung-Box'])], ignore_index=True)
+if len(flagged_df):
+    print("VAR fits flagged by the diagnostics:")
+    print(flagged_df)
 
 """
-For the Era 3 model, produce the 2023 forecasts.
+The significant coefficients of each model.
 """
 
-era_3_model = models_fitted[2]
-era_3_lag = lags[2]
-initial_values = era_3.values[1:]
-forecast_vals = [era_3_model.forecast(initial_values, 3)[2]]
-forecast_df = pd.DataFrame(forecast_vals, columns = eras[1].columns)
+coef_dfs = []
+for i in range(len(models_fitted)):
+    coef_df = coefficient_table(models_fitted[i]['params'], models_fitted[i]['pvalues'], list(eras[i].columns),
+                                alpha=significance_level)
+    coef_dfs.append(coef_df)
+    print("Era", i+1, "VAR order:", lags[i])
+    print(coef_df)
 
 """
-Finally, save the forecasts and model coefficients.
+For the model of the last era (Era 3), produce the 2023 forecasts.
 """
 
-era_1_ys = ['Pitch_SD', 'Pitch_SD', 'MIS', 'MIS', 'MIS', 'MIS', 'MIS', 'Onset_Density', 'TI_OD', 'TI_OD', 'ISO', 'PIC','PIC','PIC','PIC','PIC','RIC', 'RIC']
-era_1_predictors = ['Pitch_SD', 'ISO', 'const', 'Tonal_S', 'MIS', 'ISO', 'RIC', 'Tonal_S', 'TI_OD', 'RIC', 'ISO', 'const', 'Pitch_SD', 'TI_OD', 'ISO', 'RIC', 'MIS', 'RIC']
-era_1_lags = [1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1]
-era_1_coefs = [0.8539, -0.7826, 1.090, -0.5670, 0.4396, -0.8982, -0.4619, 0.1514, 0.6848, 0.2624, 0.6710, 1.113, 0.3946, -0.7923, -0.5435, -0.4549, 0.6774, 0.7408]
+last_era = eras[-1]
+last_era_model = models_fitted[-1]
+last_era_lag = lags[-1]
+point_forecasts = var_forecast_path(last_era_model['params'], last_era.values[len(last_era) - last_era_lag:], 3)
+forecast_vals = [point_forecasts[2]]
+forecast_df = pd.DataFrame(forecast_vals, columns = last_era.columns)
 
-era_2_ys = ['Tonal_S', 'Tonal_S', 'Pitch_SD', 'MIS', 'MIS', 'Onset_Density', 'Onset_Density', 'Onset_Density', 'TI_OD', 'TI_OD', 'TI_OD', 'ISO', 'ISO', 'RIC', 'RIC', 'RIC']
-era_2_predictors = ['Tonal_S', 'PIC', 'Pitch_SD', 'Tonal_S', 'ISO', 'Tonal_S', 'MIS', 'ISO', 'TI_OD', 'ISO', 'PIC', 'TI_OD', 'ISO', 'MIS', 'TI_OD', 'PIC']
-era_2_lags = [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
-era_2_coefs = [0.5096, -1.587, 0.6115, -0.3369, 0.6748, 0.1421, -0.2947, -0.4856, 1.202, -0.3435, 0.4266, 0.5204, 0.5856, 0.5257, -1.035, -1.088]
+"""
+Forecast intervals: simulate bootstrap paths from the last era's VAR, each with coefficients re-estimated on a simulated
+series (see var_bootstrap.py), and take the percentile intervals of each forecast step (2021 - 2023).
+"""
 
-era_3_ys = ['Tonal_S', 'Tonal_S', 'Pitch_SD','Pitch_SD','Pitch_SD', 'MIS', 'MIS', 'TI_OD', 'ISO','ISO','ISO','ISO','ISO','ISO', 'PIC', 'PIC', 'RIC', 'RIC', 'RIC', 'RIC', 'RIC', 'RIC']
-era_3_predictors = ['MIS', 'PIC', 'MIS', 'TI_OD', 'RIC', 'Onset_Density', 'TI_OD', 'TI_OD', 'const', 'Tonal_S', 'Pitch_SD', 'Onset_Density', 'ISO', 'RIC', 'MIS', 'PIC', 'const', 'Tonal_S', 'Pitch_SD', 'Onset_Density', 'ISO', 'RIC']
-era_3_lags = [1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1]
-era_3_coefs = [-2.000, 2.426, -1.049, 0.3737, 1.670, -0.9762, 0.9454, 1.041, -2.376, -0.8600, -2.046, 1.274, 2.254, 3.054, -0.4502, 0.9063, 2.276, -0.5322, 1.149, -0.9176, -1.461, -2.026]
+paths = bootstrap_paths(last_era.values, last_era_model['params'], last_era_model['resid'], 3, n_bootstrap,
+                        bootstrap_seed)
+lower, upper = forecast_intervals(paths, interval_level)
+interval_df = pd.DataFrame({'Horizon': np.repeat(np.arange(1, 4), len(last_era.columns)),
+                            'Feature': np.tile(last_era.columns, 3), 'Forecast': point_forecasts.ravel(),
+                            'Lower': lower.ravel(), 'Upper': upper.ravel(), 'Level': interval_level})
 
-era_1_df = pd.DataFrame(list(zip(era_1_ys, era_1_predictors, era_1_lags, era_1_coefs)), columns =['Dependent', 'Predictor', 'Lag', 'Coefficient'])
-era_2_df = pd.DataFrame(list(zip(era_2_ys, era_2_predictors, era_2_lags, era_2_coefs)), columns =['Dependent', 'Predictor', 'Lag', 'Coefficient'])
-era_3_df = pd.DataFrame(list(zip(era_3_ys, era_3_predictors, era_3_lags, era_3_coefs)), columns =['Dependent', 'Predictor', 'Lag', 'Coefficient'])
+"""
+Finally, save the forecasts and the significant model coefficients.
+"""
+
+for i in range(len(coef_dfs)):
+    coef_dfs[i].to_csv(model_filename.format(i+1), index = False)
+
+"""
+Penalized (lasso / elastic-net) VARs with the same lags, as a sparser alternative to keeping the significant OLS
+coefficients (see sparse_var.py). lambda is chosen per equation by time-series cross-validation. The coefficient tables
+have the same columns (without p-values), so var_fits.py can use them instead.
+"""
 
-era_1_df.to_csv(era_1_model_filename, index = False)
-era_2_df.to_csv(era_2_model_filename, index = False)
-era_3_df.to_csv(era_3_model_filename, index = False)
+if fit_sparse:
+    for i in range(len(eras)):
+        # A VAR of order 0 has only its constants (the means), so there is nothing to penalize
+        if lags[i] == 0:
+            params = eras[i].to_numpy().mean(axis=0)[None, :]
+        else:
+            params, chosen_lambdas, _ = fit_sparse_var(eras[i].to_numpy(), lags[i], l1_ratio, n_lambdas, n_cv_folds)
+        sparse_df = sparse_coefficient_table(params, list(eras[i].columns))
+        print("Era", i+1, "sparse VAR:", len(sparse_df), "non-zero coefficients")
+        sparse_df.to_csv(sparse_model_filename.format(i+1), index = False)
 
 forecast_df.to_csv(forecasts_filename, index = False)
+interval_df.to_csv(intervals_filename, index = False)